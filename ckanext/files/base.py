@@ -12,6 +12,7 @@ cycles.
 from __future__ import annotations
 
 import dataclasses
+from collections.abc import Sequence
 from time import time
 from typing import Any, ClassVar, cast
 
@@ -150,6 +151,60 @@ class Storage(fk.Storage):
 
         return super().multipart_start(location, size, **kwargs)
 
+    def copy_from(self, location: fk.Location, data: FileData, source: fk.Storage, /, **kwargs: Any) -> FileData:
+        """Copy file from a different storage without streaming it through CKAN.
+
+        Storages that can transfer files between instances of the same adapter
+        on the backend side(copy between buckets, directories, etc.) override
+        this method. `source` is always a storage of the same type as the
+        current one.
+
+        Args:
+            location: location of the copy inside the current storage
+            data: details of the file inside the source storage
+            source: storage that contains the original file
+            **kwargs: ...
+
+        Returns:
+            details of the copied file
+
+        Raises:
+            UnsupportedOperationError: backend-side copy is not supported
+        """
+        raise fk.exc.UnsupportedOperationError("copy_from", self)
+
+    def remove_many(self, items: Sequence[FileData], /, **kwargs: Any) -> list[Exception | None]:
+        """Remove multiple files from the storage.
+
+        Default implementation removes files one by one. Storages that can
+        remove objects in batches override this method. Failure to remove
+        one file does not stop removal of other files.
+
+        Args:
+            items: details of removed files
+            **kwargs: ...
+
+        Returns:
+            error for every item in the same order as `items`. `None` means
+            that file was removed or did not exist.
+
+        Raises:
+            UnsupportedOperationError: storage does not support removal
+        """
+        if not self.supports(fk.Capability.REMOVE):
+            raise fk.exc.UnsupportedOperationError("remove", self)
+
+        errors: list[Exception | None] = []
+        for data in items:
+            try:
+                self.remove(data, **kwargs)
+            except Exception as err:  # noqa: BLE001, PERF203
+                errors.append(err)
+            else:
+                errors.append(None)
+
+        return errors
+
     @classmethod
     def declare_config_options(cls, declaration: Declaration, key: Key):
         declaration.declare(key.max_size, -1).append_validators(
@@ -303,3 +358,15 @@ class Storage(fk.Storage):
                 location=data.location,
                 _external=True,
             )
+
+
+def remove_many(storage: fk.Storage, items: Sequence[FileData], /, **kwargs: Any) -> list[Exception | None]:
+    """Remove multiple files from the storage.
+
+    Storages based on :py:class:`Storage` use their batched implementation,
+    other file-keeper storages remove files one by one.
+    """
+    if isinstance(storage, Storage):
+        return storage.remove_many(items, **kwargs)
+
+    return Storage.remove_many(storage, items, **kwargs)  # pyright: ignore[reportArgumentType]
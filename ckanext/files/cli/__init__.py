@@ -9,7 +9,7 @@ from ckan.config.declaration import Declaration, Key
 
 from ckanext.files import base, config
 
-from . import dev, file, maintain, migrate, stats, storage
+from . import dev, file, maintain, migrate, search_index, stats, storage
 
 try:
     import ckan.cli.files  # type: ignore # noqa
@@ -35,6 +35,7 @@ files.add_command(stats.group, "stats")
 files.add_command(storage.group, "storage")
 files.add_command(maintain.group, "maintain")
 files.add_command(file.group, "file")
+files.add_command(search_index.group, "search-index")
 
 
 @files.command()
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import json
 import os
 import sys
 from typing import IO
@@ -9,7 +10,7 @@ import click
 import ckan.plugins.toolkit as tk
 from ckan import model
 
-from ckanext.files import shared
+from ckanext.files import export, shared
 
 
 @click.group()
@@ -57,3 +58,48 @@ def stream(file_id: str, output: str | None, start: int, end: int | None):
 
     for chunk in content_stream:
         click.echo(chunk, nl=False, file=dest)
+
+
+@group.command("export")
+@click.option(
+    "-f",
+    "--format",
+    "fmt",
+    type=click.Choice(list(export.FORMATS)),
+    default="ndjson",
+    help="Format of the output",
+)
+@click.option("-o", "--output", type=click.File("w", encoding="utf-8"), default="-", help="Write into specified file")
+@click.option("--filters", default="{}", help="Search filters as JSON object")
+@click.option("--fields", help="Comma-separated list of exported fields")
+@click.option("-p", "--plugin-data", is_flag=True, help="Allow export of plugin_data")
+@click.option("-b", "--batch-size", type=int, default=export.DEFAULT_BATCH_SIZE, help="Number of rows fetched at once")
+def export_files(  # noqa: PLR0913, PLR0917
+    fmt: str,
+    output: IO[str],
+    filters: str,
+    fields: str | None,
+    plugin_data: bool,
+    batch_size: int,
+):
+    """Export records of files matching search filters."""
+    try:
+        parsed = json.loads(filters)
+    except ValueError as err:
+        tk.error_shout("Filters must be a JSON object")
+        raise click.Abort from err
+
+    if not isinstance(parsed, dict):
+        tk.error_shout("Filters must be a JSON object")
+        raise click.Abort
+
+    names = [f for f in fields.split(",") if f] if fields else list(export.DEFAULT_FIELDS)
+
+    try:
+        records = export.rows(model.Session, export.statement(parsed, names, plugin_data), batch_size)
+    except tk.ValidationError as err:
+        tk.error_shout(err.error_summary)
+        raise click.Abort from err
+
+    for chunk in export.serialize(fmt, names, records):
+        output.write(chunk)
@@ -1,13 +1,19 @@
 from __future__ import annotations
 
+from contextlib import closing
+from datetime import timedelta
+from typing import Any
+
 import click
 import file_keeper as fk
 import sqlalchemy as sa
+from sqlalchemy.orm import contains_eager
 
 import ckan.plugins.toolkit as tk
 from ckan import model
 
-from ckanext.files import shared
+from ckanext.files import export, jobs, shared
+from ckanext.files.model import compact
 
 
 @click.group()
@@ -41,7 +47,11 @@ def empty_owner(storage_name: str | None, remove: bool):
     stmt = (
         sa.select(shared.File)
         .outerjoin(shared.File.owner)
-        .where(shared.File.storage == storage_name, shared.Owner.owner_id.is_(None))
+        .where(
+            shared.File.storage == storage_name,
+            shared.File.deleted_at.is_(None),
+            shared.Owner.owner_id.is_(None),
+        )
     )
 
     total = model.Session.scalar(stmt.with_only_columns(sa.func.count()))
@@ -55,11 +65,7 @@ def empty_owner(storage_name: str | None, remove: bool):
         click.echo(f"\t{file.id}: {file.name} [{file.content_type}, {size}]")
 
     if remove and click.confirm("Do you want to delete these files?"):
-        action = tk.get_action("files_file_delete")
-
-        with click.progressbar(model.Session.scalars(stmt), length=total) as bar:
-            for file in bar:
-                action({"ignore_auth": True}, {"id": file.id})
+        _delete_files(list(model.Session.scalars(stmt.with_only_columns(shared.File.id))))
 
 
 @group.command()
@@ -78,7 +84,12 @@ def invalid_owner(storage_name: str | None, remove: bool):
         tk.error_shout(f"Storage {storage_name} does not support file removal")
         raise click.Abort
 
-    stmt = sa.select(shared.File).join(shared.File.owner).where(shared.File.storage == storage_name)
+    stmt = (
+        sa.select(shared.File)
+        .join(shared.File.owner)
+        .where(shared.File.storage == storage_name, shared.File.deleted_at.is_(None))
+        .options(contains_eager(shared.File.owner))
+    )
 
     files = [f for f in model.Session.scalars(stmt) if f.owner is None]
 
@@ -98,11 +109,7 @@ def invalid_owner(storage_name: str | None, remove: bool):
             )
 
     if remove and click.confirm("Do you want to delete these files?"):
-        action = tk.get_action("files_file_delete")
-
-        with click.progressbar(files) as bar:
-            for file in bar:
-                action({"ignore_auth": True}, {"id": file.id})
+        _delete_files([file.id for file in files])
 
 
 @group.command()
@@ -127,7 +134,7 @@ def missing_files(storage_name: str | None, remove: bool):
         tk.error_shout(f"Storage {storage_name} does not support file removal")
         raise click.Abort
 
-    stmt = sa.select(shared.File).where(shared.File.storage == storage_name)
+    stmt = sa.select(shared.File).where(shared.File.storage == storage_name, shared.File.deleted_at.is_(None))
     total = model.Session.scalar(stmt.with_only_columns(sa.func.count()))
     missing: list[shared.File] = []
     with click.progressbar(model.Session.scalars(stmt), length=total) as bar:
@@ -150,8 +157,137 @@ def missing_files(storage_name: str | None, remove: bool):
         )
 
     if remove and click.confirm("Do you want to delete these files from registry?"):
-        action = tk.get_action("files_file_delete")
+        _delete_files([file.id for file in missing])
+
+
+@group.command("collect-garbage")
+@click.option("-b", "--batch-size", type=int, default=1000, help="Number of files processed at once")
+@click.option("-a", "--attempts", type=int, default=3, help="Number of removal attempts for every file")
+@click.option("--older-than", type=int, default=0, help="Skip files deleted less than N seconds ago")
+@click.option("--enqueue", is_flag=True, help="Schedule background job instead of immediate collection")
+def collect_garbage(batch_size: int, attempts: int, older_than: int, enqueue: bool):
+    """Remove soft-deleted files from storages and purge their records."""
+    if enqueue:
+        job = tk.enqueue_job(
+            jobs.collect_garbage,
+            [],
+            {"batch_size": batch_size, "attempts": attempts, "older_than": older_than},
+            title="Collect deleted files",
+        )
+        click.echo(f"Job {job.id} scheduled")
+        return
+
+    total = model.Session.scalar(
+        sa.select(sa.func.count(shared.File.id)).where(shared.File.deleted_at.is_not(None)),
+    )
+    purged = failed = 0
+    with click.progressbar(length=total) as bar:
+        for batch_purged, batch_failed in jobs.iter_garbage_collection(
+            batch_size,
+            attempts,
+            older_than=older_than,
+        ):
+            purged += batch_purged
+            failed += batch_failed
+            bar.update(batch_purged + batch_failed)
+
+    click.secho(f"Purged {purged} files", fg="green")
+    if failed:
+        tk.error_shout(f"Cannot remove {failed} files. They will be retried by the next run")
+
+
+@group.command("compact-history")
+@click.option("-r", "--retention-days", type=int, default=365, help="Keep records created during last N days")
+@click.option("-b", "--batch-size", type=int, default=1000, help="Number of records removed at once")
+@click.option("--keep-latest", is_flag=True, help="Keep the most recent record of every file")
+@click.option(
+    "--archive",
+    type=click.File("a", encoding="utf-8", lazy=True),
+    help="Append removed records to NDJSON file",
+)
+@click.option("--enqueue", is_flag=True, help="Schedule background job instead of immediate compaction")
+def compact_history(retention_days: int, batch_size: int, keep_latest: bool, archive: Any, enqueue: bool):
+    """Remove records of ownership history older than retention window."""
+    older_than = int(timedelta(days=retention_days).total_seconds())
+    if enqueue:
+        if archive is not None:
+            tk.error_shout("Background job cannot archive removed records")
+            raise click.Abort
+
+        job = tk.enqueue_job(
+            jobs.compact_history,
+            [older_than],
+            {"batch_size": batch_size, "keep_latest": keep_latest},
+            title="Compact ownership history",
+        )
+        click.echo(f"Job {job.id} scheduled")
+        return
+
+    table: Any = shared.TransferHistory.__table__
+    total = model.Session.scalar(
+        sa.select(sa.func.count()).select_from(jobs.expired_history(older_than, keep_latest).subquery())
+    )
+
+    removed = 0
+    with (
+        click.progressbar(length=total) as bar,
+        closing(jobs.iter_history_compaction(older_than, batch_size, keep_latest)) as batches,
+    ):
+        # records are archived before their removal is committed
+        for rows in batches:
+            if archive is not None:
+                archive.writelines(export.as_ndjson(table.c.keys(), rows))
+                archive.flush()
+            removed += len(rows)
+            bar.update(len(rows))
+
+    click.secho(f"Removed {removed} records", fg="green")
+
+
+@group.command("compact-schema")
+@click.option("--revert", is_flag=True, help="Convert compact columns back into text")
+@click.option("--uuid/--no-uuid", "native_uuid", default=True, help="Convert IDs of files")
+@click.option("--storage/--no-storage", "storage_dictionary", default=True, help="Convert storage names")
+@click.option("-y", "--yes", help="Do not ask for confirmation", is_flag=True)
+def compact_schema(revert: bool, native_uuid: bool, storage_dictionary: bool, yes: bool):
+    """Store IDs of files as UUIDs and storage names as dictionary references.
+
+    Tables are rewritten under exclusive lock. Stop the portal before the
+    conversion and restart it afterwards.
+    """
+    if not isinstance(shared.File.__table__.c["id"].type, compact.FileId):
+        tk.error_shout("Files are managed by CKAN core and their schema cannot be changed by extension")
+        raise click.Abort
+
+    if not yes and not click.confirm("Files tables will be locked during conversion. Proceed?"):
+        return
 
-        with click.progressbar(missing) as bar:
-            for file in bar:
-                action({"ignore_auth": True}, {"id": file.id})
+    with model.meta.engine.begin() as conn:  # pyright: ignore[reportOptionalMemberAccess]
+        try:
+            if revert:
+                compact.downgrade(conn, native_uuid, storage_dictionary)
+            else:
+                compact.upgrade(conn, native_uuid, storage_dictionary)
+        except ValueError as err:
+            tk.error_shout(err)
+            raise click.Abort from err
+
+        if not revert and storage_dictionary:
+            compact.register_storages(conn, shared.config.storages())
+
+        mode = compact.detect(conn)
+
+    compact.set_mode(*mode)
+    click.secho(f"Native UUIDs: {mode[0]}, storage dictionary: {mode[1]}", fg="green")
+
+
+def _delete_files(ids: list[str], batch_size: int = 1000):
+    """Remove files in batches, reporting failures."""
+    action = tk.get_action("files_file_delete_many")
+    with click.progressbar(length=len(ids)) as bar:
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start : start + batch_size]
+            result = action({"ignore_auth": True}, {"ids": batch})
+            for file_id, error in result["errors"].items():
+                tk.error_shout(f"Cannot remove {file_id}: {error}")
+            bar.update(len(batch))
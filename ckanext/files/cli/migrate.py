@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from collections.abc import Iterable
+from collections.abc import Iterable, Iterator
 from typing import Any
 
 import click
@@ -18,13 +18,32 @@ def group():
     """Migrate from original CKAN implementation."""
 
 
+def _iter_files(storage_name: str, batch_size: int = 1000) -> Iterator[dict[str, Any]]:
+    """Iterate over all files from the storage page by page."""
+    search = tk.get_action("files_file_search")
+    cursor = ""
+    while cursor is not None:
+        result = search(
+            {"ignore_auth": True},
+            {
+                "filters": {"storage": storage_name},
+                "sort": "id",
+                "rows": batch_size,
+                "cursor": cursor,
+                "count": "none",
+            },
+        )
+        yield from result["results"]
+        cursor = result["next_cursor"]
+
+
 @group.command("groups")
 @click.argument("storage_name")
 def migrate_groups(storage_name: str):
     """Migrate group images to specified storage."""
     content = tk.get_action("files_file_search")(
         {"ignore_auth": True},
-        {"storage": storage_name, "rows": 0},
+        {"filters": {"storage": storage_name}, "rows": 0},
     )
     if not content["count"]:
         tk.error_shout(f"Storage {storage_name} contains 0 files.")
@@ -34,16 +53,13 @@ def migrate_groups(storage_name: str):
 
     click.echo(f"Found {content['count']} files. Searching file owners...")
 
-    files = tk.get_action("files_file_search")(
-        {"ignore_auth": True},
-        {"storage": storage_name, "rows": content["count"]},
-    )["results"]
+    files = _iter_files(storage_name)
 
     unowned: list[dict[str, Any]] = []
     owned: dict[tuple[str, bool], dict[str, Any]] = {}
 
     bar: Iterable[Any]
-    with click.progressbar(files) as bar:
+    with click.progressbar(files, length=content["count"]) as bar:
         for info in bar:
             group = model.Session.scalar(
                 sa.select(model.Group).where(model.Group.image_url == info["location"]),
@@ -86,7 +102,7 @@ def migrate_users(storage_name: str):
     """Migrate user avatars to specified storage."""
     content = tk.get_action("files_file_search")(
         {"ignore_auth": True},
-        {"storage": storage_name, "rows": 0},
+        {"filters": {"storage": storage_name}, "rows": 0},
     )
     if not content["count"]:
         tk.error_shout(f"Storage {storage_name} contains 0 files.")
@@ -96,16 +112,13 @@ def migrate_users(storage_name: str):
 
     click.echo(f"Found {content['count']} files. Searching file owners...")
 
-    files = tk.get_action("files_file_search")(
-        {"ignore_auth": True},
-        {"storage": storage_name, "rows": content["count"]},
-    )["results"]
+    files = _iter_files(storage_name)
 
     unowned: list[dict[str, Any]] = []
     owned: dict[str, dict[str, Any]] = {}
 
     bar: Iterable[Any]
-    with click.progressbar(files) as bar:
+    with click.progressbar(files, length=content["count"]) as bar:
         for info in bar:
             user = model.Session.scalar(
                 sa.select(model.User).where(model.User.image_url == info["location"]),
@@ -148,7 +161,7 @@ def migrate_local_resources(storage_name: str):  # noqa: C901, PLR0915, PLR0912
     """Migrate resources uploaded via original ResourceUploader."""
     content = tk.get_action("files_file_search")(
         {"ignore_auth": True},
-        {"storage": storage_name, "rows": 0},
+        {"filters": {"storage": storage_name}, "rows": 0},
     )
     if not content["count"]:
         tk.error_shout(f"Storage {storage_name} contains 0 files.")
@@ -158,16 +171,13 @@ def migrate_local_resources(storage_name: str):  # noqa: C901, PLR0915, PLR0912
 
     click.echo(f"Found {content['count']} files. Searching file owners...")
 
-    files = tk.get_action("files_file_search")(
-        {"ignore_auth": True},
-        {"storage": storage_name, "rows": content["count"]},
-    )["results"]
+    files = _iter_files(storage_name)
 
     unowned: list[dict[str, Any]] = []
     owned: dict[str, dict[str, Any]] = {}
 
     bar: Iterable[Any]
-    with click.progressbar(files) as bar:
+    with click.progressbar(files, length=content["count"]) as bar:
         for info in bar:
             resource = model.Session.scalar(
                 sa.select(model.Resource).where(
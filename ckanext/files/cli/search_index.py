@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import click
+import sqlalchemy as sa
+from sqlalchemy.orm import selectinload
+
+import ckan.plugins.toolkit as tk
+from ckan import model
+
+from ckanext.files import search_index, shared
+
+
+@click.group()
+def group():
+    """Solr index of files."""
+
+
+@group.command()
+@click.option("-b", "--batch-size", type=int, default=1000, help="Number of files indexed at once")
+@click.option("-c", "--clear", is_flag=True, help="Remove all files from index before indexation")
+@click.option("-s", "--storage-name", help="Index only files from the specified storage")
+def rebuild(batch_size: int, clear: bool, storage_name: str | None):
+    """Add all files to the search index."""
+    if not search_index.is_enabled():
+        tk.error_shout(f"Search index is disabled. Enable it via {shared.config.SEARCH_INDEX_ENABLED}")
+        raise click.Abort
+
+    if clear:
+        search_index.clear()
+
+    stmt = (
+        sa.select(shared.File)
+        .where(shared.File.deleted_at.is_(None))
+        .order_by(shared.File.id)
+        .options(selectinload(shared.File.owner))
+    )
+    if storage_name:
+        stmt = stmt.where(shared.File.storage == storage_name)
+
+    total = model.Session.scalar(stmt.with_only_columns(sa.func.count()).order_by(None))
+    result = model.Session.scalars(stmt.execution_options(yield_per=batch_size))
+
+    with click.progressbar(length=total or 0, label="Indexing files") as bar:
+        for batch in result.partitions():
+            search_index.index(batch, defer_commit=True)
+            # indexed files are not needed anymore
+            model.Session.expunge_all()
+            bar.update(len(batch))
+
+    search_index.commit()
+    click.secho(f"Indexed {total} files", fg="green")
+
+
+@group.command()
+def clear():
+    """Remove all files from the search index."""
+    search_index.clear()
+    click.secho("Files removed from the search index", fg="green")
@@ -11,6 +11,7 @@ import ckan.plugins.toolkit as tk
 from ckan import model
 
 from ckanext.files import shared
+from ckanext.files.model import StorageUsage
 
 
 def _now():
@@ -40,18 +41,19 @@ def overview(storage_name: str | None):
         tk.error_shout(f"Storage {storage_name} is not configured")
         raise click.Abort from err
 
+    usage = tk.get_action("files_storage_stats")({"ignore_auth": True}, {"storage": storage_name})
+    size, count = usage["size"], usage["count"]
+
+    if not count:
+        tk.error_shout(f"Storage {storage_name} is empty")
+        raise click.Abort
+
     stmt = sa.select(
-        sa.func.sum(shared.File.size),
-        sa.func.count(shared.File.id),
         sa.func.max(shared.File.created),
         sa.func.min(shared.File.created),
     ).where(shared.File.storage == storage_name)
     row = model.Session.execute(stmt).fetchone()
-    size, count, newest, oldest = row if row else (0, 0, _now(), _now())
-
-    if not count:
-        tk.error_shout(f"Storage {storage_name} is empty")
-        raise click.Abort
+    newest, oldest = row if row else (_now(), _now())
 
     click.secho(f"Number of files: {click.style(count, bold=True)}")
     click.secho(
@@ -71,9 +73,23 @@ def overview(storage_name: str | None):
 
 @group.command()
 @storage_option
-def types(storage_name: str | None):
+@click.option("-f", "--family", is_flag=True, help="Group by family(image, text, etc.) using usage summary")
+def types(storage_name: str | None, family: bool):
     """Files distribution by MIMEtype."""
     storage_name = storage_name or shared.config.default_storage()
+    if family:
+        usage = tk.get_action("files_storage_stats")(
+            {"ignore_auth": True},
+            {"storage": storage_name, "group_by": ["family"]},
+        )
+        click.secho(
+            f"Storage {click.style(storage_name, bold=True)} contains "
+            + f"{click.style(usage['count'], bold=True)} files",
+        )
+        for group in usage["groups"]:
+            click.secho(f"\t{group['family']}/*: {click.style(group['count'], bold=True)}")
+        return
+
     stmt = (
         sa.select(
             shared.File.content_type,
@@ -103,32 +119,20 @@ def types(storage_name: str | None):
 def owner(storage_name: str | None, verbose: bool):
     """Files distribution by owner."""
     storage_name = storage_name or shared.config.default_storage()
-    owner_col = (
-        sa.func.concat(shared.Owner.owner_type, " ", shared.Owner.owner_id)
-        if verbose
-        else sa.func.concat(shared.Owner.owner_type, "")
+    usage = tk.get_action("files_storage_stats")(
+        {"ignore_auth": True},
+        {
+            "storage": storage_name,
+            "group_by": ["owner_type", "owner_id"] if verbose else ["owner_type"],
+        },
     )
 
-    stmt = (
-        sa.select(
-            owner_col.label("owner"),
-            sa.func.count(shared.File.id),
-        )
-        .where(shared.File.storage == storage_name)
-        .outerjoin(
-            shared.Owner,
-            sa.and_(
-                shared.Owner.file_id == shared.File.id,
-            ),
-        )
-        .group_by(owner_col)
-    ).order_by(owner_col)
-
-    total = model.Session.scalar(sa.select(sa.func.sum(stmt.c.count)))
     click.secho(
-        f"Storage {click.style(storage_name, bold=True)} contains " + f"{click.style(total, bold=True)} files",
+        f"Storage {click.style(storage_name, bold=True)} contains " + f"{click.style(usage['count'], bold=True)} files",
     )
-    for owner, count in model.Session.execute(stmt):
+    for group in usage["groups"]:
+        owner = f"{group['owner_type']} {group.get('owner_id', '')}"
+        count = group["count"]
         clean_owner = owner.strip() or click.style(
             "has no owner",
             underline=True,
@@ -137,3 +141,17 @@ def owner(storage_name: str | None, verbose: bool):
         click.secho(
             f"\t{clean_owner}: {click.style(count, bold=True)}",
         )
+
+
+@group.command()
+def rebuild():
+    """Recompute storage usage summary from files."""
+    for stmt in StorageUsage.rebuild(shared.File.__table__, shared.Owner.__table__):
+        model.Session.execute(stmt)
+    model.Session.commit()
+
+    usage = tk.get_action("files_storage_stats")({"ignore_auth": True}, {})
+    click.secho(
+        f"Summary contains {click.style(usage['count'], bold=True)} files "
+        + f"with total size {click.style(fk.humanize_filesize(usage['size']), bold=True)}",
+    )
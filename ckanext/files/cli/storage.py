@@ -9,9 +9,10 @@ import sqlalchemy as sa
 import ckan.plugins.toolkit as tk
 from ckan import model
 
-from ckanext.files import config, shared
+from ckanext.files import config, jobs, shared
 from ckanext.files.base import get_storage
 from ckanext.files.model import File, Owner
+from ckanext.files.transfer import Checkpoint, TransferEngine
 
 
 @click.group()
@@ -120,35 +121,113 @@ def scan(
     help="Remove file from the source after transfer",
     is_flag=True,
 )
-def transfer(src: str, dest: str, id: tuple[str, ...], remove: bool):
+@click.option("-w", "--workers", type=int, default=4, help="Number of concurrent transfers")
+@click.option("-b", "--batch-size", type=int, default=100, help="Number of files committed at once")
+@click.option(
+    "-c",
+    "--checkpoint",
+    type=click.Path(dir_okay=False),
+    help="File with transfer progress. Interrupted transfer continues from the last checkpoint",
+)
+@click.option("--retry-failed", is_flag=True, help="Transfer files that failed during previous run")
+def transfer(  # noqa: PLR0913, PLR0917
+    src: str,
+    dest: str,
+    id: tuple[str, ...],
+    remove: bool,
+    workers: int,
+    batch_size: int,
+    checkpoint: str | None,
+    retry_failed: bool,
+):
     """Move files between storages."""
-    from_storage = shared.get_storage(src)
-    to_storage = shared.get_storage(dest)
-
-    is_supported = from_storage.supports_synthetic(
-        shared.Capability.MOVE if remove else shared.Capability.COPY, to_storage
-    )
+    try:
+        engine = TransferEngine(
+            src,
+            dest,
+            remove=remove,
+            workers=workers,
+            batch_size=batch_size,
+            checkpoint=Checkpoint.load(checkpoint),
+        )
+    except (shared.exc.UnknownStorageError, ValueError) as err:
+        tk.error_shout(err)
+        raise click.Abort from err
 
-    if not is_supported:
+    if not engine.is_supported():
         tk.error_shout("Operation is not supported")
         raise click.Abort
 
-    op = from_storage.move_synthetic if remove else from_storage.copy_synthetic
+    total = engine.count(id, retry_failed)
+    stats = None
+    with click.progressbar(length=total) as bar:
+        for stats in engine.run(id, retry_failed):
+            bar.update(stats.processed - bar.pos)
+            eta = f"{stats.eta:.0f}s" if stats.eta is not None else "-"
+            bar.label = f"{stats.rate:.1f} files/s, ETA {eta}"
 
-    stmt = sa.select(shared.File).where(shared.File.storage == src)
-    if id:
-        stmt = stmt.where(shared.File.id.in_(id))
+    if not stats:
+        click.secho("Nothing to transfer", fg="green")
+        return
+
+    click.secho(
+        f"Transferred {stats.transferred} files({stats.bytes} bytes)"
+        + f" in {stats.elapsed:.1f}s, {stats.rate:.1f} files/s",
+        fg="green",
+    )
+    for file_id, error in engine.checkpoint.failed.items():
+        tk.error_shout(f"{file_id}: {error}")
 
-    total = model.Session.scalar(stmt.with_only_columns(sa.func.count()))
-    files = model.Session.scalars(stmt)
+    for file_id, error in engine.checkpoint.leftovers.items():
+        tk.error_shout(f"{file_id} is transferred, but remains in {src}: {error}")
 
-    with click.progressbar(files, length=total) as bar:
-        for item in bar:
-            data = shared.FileData.from_object(item)
-            new_data = op(data.location, data, to_storage)
-            new_data.into_object(item)
-            item.storage = dest
-            model.Session.commit()
+    if engine.checkpoint.failed and checkpoint:
+        click.echo("Use --retry-failed with the same checkpoint to transfer failed files again")
+
+
+@group.command("revalidate-links")
+@click.option("-s", "--storage-name", help="Name of the configured storage")
+@click.option("-b", "--batch-size", type=int, default=1000, help="Number of files processed at once")
+@click.option("-w", "--workers", type=int, default=10, help="Number of concurrent requests")
+@click.option("--enqueue", is_flag=True, help="Schedule background job instead of immediate revalidation")
+def revalidate_links(storage_name: str | None, batch_size: int, workers: int, enqueue: bool):
+    """Refresh details of link files that changed since registration."""
+    storage_name = storage_name or config.default_storage()
+
+    if enqueue:
+        job = tk.enqueue_job(
+            jobs.revalidate_links,
+            [storage_name],
+            {"batch_size": batch_size, "workers": workers},
+            title=f"Revalidate links from {storage_name}",
+        )
+        click.echo(f"Job {job.id} scheduled")
+        return
+
+    # the same files that are walked by revalidation
+    total = model.Session.scalar(
+        sa.select(sa.func.count(shared.File.id)).where(
+            shared.File.storage == storage_name,
+            shared.File.deleted_at.is_(None),
+        ),
+    )
+    updated = 0
+
+    try:
+        with click.progressbar(length=total) as bar:
+            for batch_checked, batch_updated in jobs.iter_link_revalidation(storage_name, batch_size, workers):
+                updated += batch_updated
+                bar.update(batch_checked)
+
+    except shared.exc.UnknownStorageError as err:
+        tk.error_shout(err)
+        raise click.Abort from err
+
+    except shared.exc.UnsupportedOperationError as err:
+        tk.error_shout(f"Storage {storage_name} is not a link storage")
+        raise click.Abort from err
+
+    click.secho(f"Updated {updated} files", fg="green")
 
 
 @group.command()
@@ -167,7 +246,8 @@ def clean(storage_name: str | None, yes: bool):
         raise click.Abort
 
     search = tk.get_action("files_file_search")
-    overview = search({"user": user["name"]}, {"storage": storage_name, "rows": 0})
+    filters = {"storage": storage_name}
+    overview = search({"user": user["name"]}, {"filters": filters, "rows": 0})
 
     click.echo(f"Storage {storage_name} contains {overview['count']} files.")
 
@@ -178,15 +258,23 @@ def clean(storage_name: str | None, yes: bool):
         return
 
     bar: Any = click.progressbar(length=overview["count"])
+    cursor = ""
+    failed: dict[str, str] = {}
     with bar:
-        while True:
-            result = search({"user": user["name"]}, {"storage": storage_name})
-            if not result["count"]:
-                break
-
-            for item in result["results"]:
-                bar.label = f"Removing {item['id']}"
-                tk.get_action("files_file_delete")({"user": user["name"]}, {"id": item["id"]})
-                bar.update(1)
+        while cursor is not None:
+            result = search(
+                {"user": user["name"]},
+                {"filters": filters, "sort": "id", "rows": 1000, "cursor": cursor, "count": "none", "fields": ["id"]},
+            )
+            ids = [item["id"] for item in result["results"]]
+            if ids:
+                outcome = tk.get_action("files_file_delete_many")({"user": user["name"]}, {"ids": ids})
+                failed.update(outcome["errors"])
+                bar.update(len(ids))
+
+            cursor = result["next_cursor"]
+
+    for file_id, error in failed.items():
+        tk.error_shout(f"{file_id}: {error}")
 
     click.secho("Done", fg="green")
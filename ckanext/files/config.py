@@ -46,6 +46,17 @@ else:
     INLINE_TYPES = "ckanext.files.inline_content_types"
 
 ENABLE_RESOURCE_HACK = "ckanext.files.enable_resource_migration_template_patch"
+EARLY_UPLOAD_VALIDATION = "ckanext.files.early_upload_validation"
+SPOOL_THRESHOLD = "ckanext.files.upload.spool_threshold"
+SPOOL_DIR = "ckanext.files.upload.spool_dir"
+DERIVATIVES_STORAGE = "ckanext.files.derivatives.storage"
+DERIVATIVES_PRESETS = "ckanext.files.derivatives.presets"
+DERIVATIVES_WORKERS = "ckanext.files.derivatives.workers"
+DERIVATIVES_MAX_AGE = "ckanext.files.derivatives.max_age"
+SEARCH_INDEX_ENABLED = "ckanext.files.search_index.enabled"
+SOFT_DELETE = "ckanext.files.soft_delete"
+REPLICA_URL = "ckanext.files.replica.url"
+REPLICA_PIN_DURATION = "ckanext.files.replica.pin_duration"
 
 
 def default_storage() -> str:
@@ -131,5 +142,60 @@ def override_resource_form() -> bool:
     return tk.config[ENABLE_RESOURCE_HACK]
 
 
+def early_upload_validation() -> bool:
+    """Reject oversized and unsupported uploads before reading request body."""
+    return tk.config[EARLY_UPLOAD_VALIDATION]
+
+
+def spool_threshold() -> int:
+    """Size of upload kept in memory before it's moved to a temporary file."""
+    return tk.config[SPOOL_THRESHOLD]
+
+
+def spool_dir() -> str | None:
+    """Directory for temporary files with uploads."""
+    return tk.config[SPOOL_DIR] or None
+
+
+def derivatives_storage() -> str:
+    """Storage for image derivatives. Empty value disables derivatives."""
+    return tk.config[DERIVATIVES_STORAGE]
+
+
+def derivatives_presets() -> list[str]:
+    """Definitions of image derivatives."""
+    return tk.config[DERIVATIVES_PRESETS]
+
+
+def derivatives_workers() -> int:
+    """Max number of derivatives generated simultaneously by the process."""
+    return tk.config[DERIVATIVES_WORKERS]
+
+
+def derivatives_max_age() -> int:
+    """Cache lifetime of the derivative in seconds."""
+    return tk.config[DERIVATIVES_MAX_AGE]
+
+
 def inline_types() -> list[str]:
     return tk.config[INLINE_TYPES]
+
+
+def search_index_enabled() -> bool:
+    """Keep files in Solr index and allow searching via index."""
+    return tk.config[SEARCH_INDEX_ENABLED]
+
+
+def soft_delete() -> bool:
+    """Mark files as deleted and remove them from storage in background."""
+    return tk.config[SOFT_DELETE]
+
+
+def replica_url() -> str | None:
+    """SQLAlchemy URL of DB replica used by read-only actions."""
+    return tk.config[REPLICA_URL]
+
+
+def replica_pin_duration() -> int:
+    """Number of seconds user's reads are sent to primary DB after a write."""
+    return tk.config[REPLICA_PIN_DURATION]
@@ -0,0 +1,207 @@
+"""Image derivatives.
+
+Derivative is a resized copy of the image file, produced using one of the
+configured presets. Derivatives are generated on the first request and stored
+in the dedicated storage, so subsequent requests are served without touching
+the original file.
+
+Location of the derivative depends on the hash of the original file and the
+parameters of the preset, so replacing the original or changing the preset
+automatically invalidates derivatives.
+
+Generation requires Pillow. Without it, derivatives are disabled.
+
+"""
+
+from __future__ import annotations
+
+import contextlib
+import dataclasses
+import hashlib
+import logging
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+from typing import Any
+
+from ckanext.files import config, shared
+
+log = logging.getLogger(__name__)
+
+Image: Any = None
+ImageOps: Any = None
+with contextlib.suppress(ImportError):
+    from PIL import Image, ImageOps
+
+
+_pool: ThreadPoolExecutor | None = None
+_pending: dict[str, Future[shared.FileData]] = {}
+_lock = threading.Lock()
+
+
+@dataclasses.dataclass(frozen=True)
+class Preset:
+    """Parameters of the derivative."""
+
+    name: str
+    width: int
+    height: int
+    format: str = "webp"
+    quality: int = 80
+
+    @classmethod
+    def parse(cls, value: str) -> Preset:
+        """Parse preset from `NAME:WIDTHxHEIGHT[:FORMAT[:QUALITY]]` string.
+
+        Raises:
+            ValueError: string has wrong format
+        """
+        name, size, *rest = value.split(":")
+        width, height = size.lower().split("x")
+        preset = cls(name, int(width), int(height))
+
+        if rest:
+            fmt = rest.pop(0).lower()
+            preset = dataclasses.replace(preset, format="jpeg" if fmt == "jpg" else fmt)
+
+        if rest:
+            preset = dataclasses.replace(preset, quality=int(rest.pop(0)))
+
+        return preset
+
+    @property
+    def content_type(self) -> str:
+        return f"image/{self.format}"
+
+    @property
+    def variant(self) -> str:
+        """Identifier of the preset's parameters."""
+        return f"{self.name}-{self.width}x{self.height}-q{self.quality}"
+
+
+def is_enabled() -> bool:
+    """Check if derivatives can be generated."""
+    return Image is not None and bool(config.derivatives_storage())
+
+
+def presets() -> dict[str, Preset]:
+    """Configured presets."""
+    result: dict[str, Preset] = {}
+    for value in config.derivatives_presets():
+        try:
+            preset = Preset.parse(value)
+        except ValueError:
+            log.warning("Ignore invalid derivative preset %s", value)
+            continue
+
+        result[preset.name] = preset
+
+    return result
+
+
+def get_storage() -> shared.Storage:
+    """Storage for derivatives."""
+    return shared.get_storage(config.derivatives_storage())
+
+
+def location(source: shared.FileData, preset: Preset) -> shared.Location:
+    """Location of the derivative inside the derivatives storage."""
+    prefix = re.sub(r"[^\w.-]", "", source.hash)
+    return shared.Location(f"{prefix}/{preset.variant}.{preset.format}")
+
+
+def version(source_hash: str, preset: Preset) -> str:
+    """Value of `v` parameter in the URL of the derivative.
+
+    It changes when the original file is replaced or parameters of the preset
+    are modified.
+    """
+    key = f"{source_hash}:{preset.variant}.{preset.format}"
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def is_supported(content_type: str) -> bool:
+    """Check if derivatives can be generated from the given file type."""
+    return content_type.startswith("image/") and content_type != "image/svg+xml"
+
+
+def ensure(storage: shared.Storage, source: shared.FileData, preset: Preset) -> shared.FileData:
+    """Return existing derivative or generate a new one.
+
+    Generation happens in the bounded pool of workers. Concurrent requests for
+    the same derivative wait for the single generation task.
+
+    Args:
+        storage: storage of the original file
+        source: details of the original file
+        preset: parameters of the derivative
+
+    Returns:
+        details of the derivative
+
+    Raises:
+        UnsupportedOperationError: derivatives are disabled
+    """
+    if not is_enabled() or not source.hash:
+        raise shared.exc.UnsupportedOperationError("derivative", storage)
+
+    dest = get_storage()
+    loc = location(source, preset)
+
+    with contextlib.suppress(shared.exc.MissingFileError):
+        return dest.analyze(loc)
+
+    with _lock:
+        future = _pending.get(loc)
+        if not future:
+            future = _executor().submit(generate, storage, source, dest, loc, preset)
+            _pending[loc] = future
+            future.add_done_callback(lambda _f: _pending.pop(loc, None))
+
+    return future.result()
+
+
+def generate(
+    storage: shared.Storage,
+    source: shared.FileData,
+    dest: shared.Storage,
+    location: shared.Location,
+    preset: Preset,
+) -> shared.FileData:
+    """Produce derivative and upload it into destination storage.
+
+    Raises:
+        UnsupportedOperationError: Pillow is not installed
+        ContentError: original is not a valid image or the format of the
+            preset is not supported by Pillow
+    """
+    if Image is None or ImageOps is None:
+        raise shared.exc.UnsupportedOperationError("derivative", storage)
+
+    content = storage.content(source)
+    buff = BytesIO()
+    try:
+        with Image.open(BytesIO(content)) as original:
+            image = ImageOps.exif_transpose(original) or original
+            image.thumbnail((preset.width, preset.height))
+
+            if preset.format == "jpeg" and image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+
+            image.save(buff, format=preset.format, quality=preset.quality)
+
+    # UnidentifiedImageError is a subclass of OSError, unknown formats raise
+    # KeyError and broken parameters raise ValueError
+    except (OSError, KeyError, ValueError, Image.DecompressionBombError) as err:
+        raise shared.exc.ContentError(storage, f"cannot produce {preset.name} derivative: {err}") from err
+
+    return dest.upload(location, shared.make_upload(buff.getvalue()))
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool  # noqa: PLW0603
+    if _pool is None:
+        _pool = ThreadPoolExecutor(config.derivatives_workers(), "files-derivative")
+
+    return _pool
@@ -0,0 +1,151 @@
+"""Export of file records.
+
+Export uses the same filters as `files_file_search`, but reads matching rows
+via server-side cursor and serializes them one by one, so memory consumption
+does not depend on the number of exported files.
+
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import itertools
+import json
+import logging
+from collections.abc import Iterable, Iterator, Sequence
+from datetime import datetime
+from typing import Any
+
+import sqlalchemy as sa
+from sqlalchemy.exc import DataError, ProgrammingError
+
+import ckan.plugins.toolkit as tk
+
+from ckanext.files.logic import query
+from ckanext.files.shared import File, Owner
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+DEFAULT_FIELDS = (
+    "id",
+    "name",
+    "location",
+    "content_type",
+    "size",
+    "hash",
+    "algorithm",
+    "storage",
+    "created",
+    "storage_data",
+    "owner_type",
+    "owner_id",
+    "pinned",
+)
+
+DEFAULT_BATCH_SIZE = 1000
+
+log = logging.getLogger(__name__)
+
+
+def statement(filters: dict[str, Any], fields: Sequence[str], include_plugin_data: bool = False) -> Any:
+    """Build select statement for export.
+
+    Args:
+        filters: filters in the format accepted by `files_file_search`
+        fields: exported columns
+        include_plugin_data: allow export of `plugin_data`
+
+    Returns:
+        select statement ordered by file ID
+
+    Raises:
+        ValidationError: filters or fields are not valid
+    """
+    columns = dict(**File.__table__.c, **Owner.__table__.c)
+    projection = query.projection(list(fields), include_plugin_data)
+
+    return (
+        sa.select(*projection.values())
+        .select_from(File)
+        .outerjoin(Owner, sa.and_(File.id == Owner.file_id))
+        .where(File.deleted_at.is_(None), query.process_filters(filters, columns))
+        .order_by(File.id)
+    )
+
+
+def rows(sess: Any, stmt: Any, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[Sequence[Any]]:
+    """Fetch rows in batches via server-side cursor.
+
+    Statement is executed and the first batch is fetched immediately, so that
+    filters rejected by DB are reported before the response is started.
+
+    Raises:
+        ValidationError: DB cannot apply filters
+    """
+    try:
+        partitions = sess.execute(stmt.execution_options(yield_per=batch_size)).partitions()
+        first = next(partitions, [])
+    except (ProgrammingError, DataError) as err:
+        sess.rollback()
+        msg = "Invalid file search request"
+        log.exception(msg)
+        raise tk.ValidationError({"filters": [msg]}) from err
+
+    return itertools.chain(first, itertools.chain.from_iterable(partitions))
+
+
+def serialize(fmt: str, fields: Sequence[str], records: Iterable[Sequence[Any]]) -> Iterator[str]:
+    """Serialize rows into chunks of the export file.
+
+    Raises:
+        ValidationError: unsupported format
+    """
+    if fmt == "ndjson":
+        return as_ndjson(fields, records)
+
+    if fmt == "csv":
+        return as_csv(fields, records)
+
+    raise tk.ValidationError({"format": [f"Unsupported format: {fmt}"]})
+
+
+def as_ndjson(fields: Sequence[str], records: Iterable[Sequence[Any]]) -> Iterator[str]:
+    """Produce one JSON object per line."""
+    for record in records:
+        yield json.dumps(dict(zip(fields, record)), default=_default) + "\n"
+
+
+def as_csv(fields: Sequence[str], records: Iterable[Sequence[Any]]) -> Iterator[str]:
+    """Produce CSV with header. Nested values are stored as JSON."""
+    buff = io.StringIO()
+    writer = csv.writer(buff)
+    writer.writerow(fields)
+
+    for record in records:
+        writer.writerow([_cell(value) for value in record])
+        yield buff.getvalue()
+        buff.seek(0)
+        buff.truncate()
+
+    yield buff.getvalue()
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+
+    raise TypeError(value)
+
+
+def _cell(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=_default)
+
+    if isinstance(value, datetime):
+        return value.isoformat()
+
+    return value
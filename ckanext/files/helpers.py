@@ -8,7 +8,7 @@ from typing import Any, TypedDict
 import ckan.plugins.toolkit as tk
 from ckan import model
 
-from . import shared
+from . import derivative, shared
 
 HERE = os.path.dirname(__file__)
 
@@ -64,7 +64,12 @@ def files_content_type_icon(
 def files_get_file(file_id: str | None) -> shared.File | None:
     if not file_id:
         return None
-    return model.Session.get(shared.File, file_id)
+
+    file = model.Session.get(shared.File, file_id)
+    if file and file.is_deleted:
+        return None
+
+    return file
 
 
 def files_link_details(
@@ -72,7 +77,7 @@ def files_link_details(
     *types: Iterable[str],
     **kwargs: Any,
 ) -> LinkDetails | None:
-    file = model.Session.get(shared.File, file_id)
+    file = files_get_file(file_id)
 
     if not file:
         return None
@@ -92,6 +97,34 @@ def files_link_details(
             }
 
 
+def files_derivative_url(file: str | dict[str, Any], preset: str) -> str | None:
+    """URL of the image derivative or None if it cannot be produced.
+
+    Args:
+        file: ID or dictized file
+        preset: name of the derivative preset
+    """
+    options = derivative.presets().get(preset)
+    if not derivative.is_enabled() or not options:
+        return None
+
+    if isinstance(file, str):
+        fileobj = files_get_file(file)
+        if not fileobj:
+            return None
+        file = {"id": fileobj.id, "hash": fileobj.hash, "content_type": fileobj.content_type}
+
+    if not file.get("hash") or not derivative.is_supported(file["content_type"]):
+        return None
+
+    return tk.url_for(
+        "files.derivative_download",
+        file_id=file["id"],
+        preset=preset,
+        v=derivative.version(file["hash"], options),
+    )
+
+
 def _is_storage_configured(name: str) -> bool:
     try:
         return bool(shared.get_storage(name))
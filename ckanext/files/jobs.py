@@ -0,0 +1,375 @@
+"""Background jobs of the extension.
+
+Functions from this module are designed for `tk.enqueue_job`, but they can be
+called synchronously as well, e.g. from CLI commands.
+
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import requests
+import sqlalchemy as sa
+
+from ckan import model
+
+from ckanext.files import shared
+from ckanext.files.base import remove_many
+from ckanext.files.storage import LinkStorage
+
+log = logging.getLogger(__name__)
+
+
+def iter_link_revalidation(
+    storage_name: str,
+    batch_size: int = 1000,
+    workers: int = 10,
+) -> Iterator[tuple[int, int]]:
+    """Refresh details of link files in batches.
+
+    Files are processed in the order of their IDs, so that every batch is
+    fetched using the index instead of offset. Links from the same batch are
+    checked concurrently and only modified files are updated in DB, using
+    single UPDATE statement per batch.
+
+    Args:
+        storage_name: name of the link storage
+        batch_size: number of files processed at once
+        workers: number of concurrent HTTP requests
+
+    Yields:
+        number of checked and number of updated files for every batch
+
+    Raises:
+        UnsupportedOperationError: storage is not a link storage
+    """
+    storage = shared.get_storage(storage_name)
+    if not isinstance(storage, LinkStorage):
+        raise shared.exc.UnsupportedOperationError("revalidate", storage)
+
+    table: Any = shared.File.__table__
+    stmt = (
+        sa.select(
+            table.c.id,
+            table.c.location,
+            table.c.size,
+            table.c.content_type,
+            table.c.hash,
+            table.c.storage_data,
+        )
+        .where(table.c.storage == storage_name, table.c.deleted_at.is_(None))
+        .order_by(table.c.id)
+        .limit(batch_size)
+    )
+    update = (
+        sa.update(table)
+        .where(table.c.id == sa.bindparam("_id"))
+        .values(
+            size=sa.bindparam("_size"),
+            content_type=sa.bindparam("_content_type"),
+            hash=sa.bindparam("_hash"),
+            storage_data=sa.bindparam("_storage_data"),
+        )
+    )
+
+    # requests.Session is not thread-safe, so every worker uses its own
+    # session, that keeps connections to hosts from the previous batches
+    local = threading.local()
+    sessions: list[requests.Session] = []
+
+    def revalidate(data: shared.FileData) -> shared.FileData | None:
+        http: requests.Session | None = getattr(local, "http", None)
+        if http is None:
+            http = local.http = requests.Session()
+            sessions.append(http)
+
+        return storage.revalidate(data, http)
+
+    last_id = ""
+    try:
+        with ThreadPoolExecutor(workers) as pool:
+            while rows := model.Session.execute(stmt.where(table.c.id > last_id)).fetchall():
+                last_id = rows[-1].id
+                items = [
+                    shared.FileData(
+                        row.location,
+                        size=row.size,
+                        content_type=row.content_type,
+                        hash=row.hash,
+                        storage_data=row.storage_data or {},
+                    )
+                    for row in rows
+                ]
+
+                changes = [
+                    {
+                        "_id": row.id,
+                        "_size": fresh.size,
+                        "_content_type": fresh.content_type,
+                        "_hash": fresh.hash,
+                        "_storage_data": fresh.storage_data,
+                    }
+                    for row, fresh in zip(rows, pool.map(revalidate, items))
+                    if fresh
+                ]
+
+                if changes:
+                    model.Session.execute(update, changes)
+                    model.Session.commit()
+
+                yield len(rows), len(changes)
+
+    finally:
+        for http in sessions:
+            http.close()
+
+
+def revalidate_links(storage_name: str, batch_size: int = 1000, workers: int = 10) -> dict[str, int]:
+    """Refresh details of every link file from the storage.
+
+    Returns:
+        number of checked and updated files
+    """
+    checked = updated = 0
+    for batch_checked, batch_updated in iter_link_revalidation(storage_name, batch_size, workers):
+        checked += batch_checked
+        updated += batch_updated
+
+    log.info("Revalidated %d links from %s storage. Updated: %d", checked, storage_name, updated)
+    return {"checked": checked, "updated": updated}
+
+
+def iter_garbage_collection(
+    batch_size: int = 1000,
+    attempts: int = 3,
+    delay: float = 1.0,
+    older_than: int = 0,
+) -> Iterator[tuple[int, int]]:
+    """Remove soft-deleted files from storages in batches.
+
+    Files are processed in the order of their deletion, using the partial
+    index on `deleted_at`. Files from the same storage are removed via batched
+    `remove_many`. Failed removals are retried with exponential backoff and
+    files that still cannot be removed keep their records, so they are picked
+    by the next run. Records of removed files are purged by single DELETE per
+    batch. Storage usage is not modified, because it was already updated when
+    files were marked as deleted.
+
+    Args:
+        batch_size: number of files processed at once
+        attempts: number of removal attempts for every file
+        delay: delay before the second attempt, doubled after every failure
+        older_than: skip files deleted less than this number of seconds ago
+
+    Yields:
+        number of purged and number of failed files for every batch
+    """
+    table: Any = shared.File.__table__
+    deadline = datetime.now(timezone.utc) - timedelta(seconds=older_than)
+    stmt = (
+        sa.select(
+            table.c.id,
+            table.c.deleted_at,
+            table.c.storage,
+            table.c.location,
+            table.c.size,
+            table.c.content_type,
+            table.c.hash,
+            table.c.storage_data,
+        )
+        .where(table.c.deleted_at.is_not(None), table.c.deleted_at <= deadline)
+        .order_by(table.c.deleted_at, table.c.id)
+        .limit(batch_size)
+    )
+
+    cursor = None
+    while True:
+        batch = stmt
+        if cursor:
+            batch = stmt.where(sa.tuple_(table.c.deleted_at, table.c.id) > cursor)
+
+        rows = model.Session.execute(batch).fetchall()
+        if not rows:
+            break
+
+        cursor = (rows[-1].deleted_at, rows[-1].id)
+
+        groups: dict[str, list[Any]] = defaultdict(list)
+        for row in rows:
+            groups[row.storage].append(row)
+
+        purged: list[str] = []
+        for storage_name, group in groups.items():
+            purged.extend(_purge(storage_name, group, attempts, delay))
+
+        if purged:
+            model.Session.execute(sa.delete(table).where(table.c.id.in_(purged)))
+        model.Session.commit()
+
+        yield len(purged), len(rows) - len(purged)
+
+
+def _purge(storage_name: str, rows: list[Any], attempts: int, delay: float) -> list[str]:
+    """Remove files from the storage and return IDs of removed files."""
+    try:
+        storage = shared.get_storage(storage_name)
+    except shared.exc.UnknownStorageError:
+        log.warning("Cannot purge %d files from unknown storage %s", len(rows), storage_name)
+        return []
+
+    purged: list[str] = []
+    pending = rows
+    for attempt in range(attempts):
+        if attempt:
+            time.sleep(delay * 2 ** (attempt - 1))
+
+        items = [
+            shared.FileData(
+                row.location,
+                size=row.size,
+                content_type=row.content_type,
+                hash=row.hash,
+                storage_data=row.storage_data or {},
+            )
+            for row in pending
+        ]
+        try:
+            results = remove_many(storage, items)
+        except shared.exc.StorageError as err:
+            log.warning("Cannot purge %d files from %s: %s", len(pending), storage_name, err)
+            results = [err] * len(pending)
+
+        failed: list[Any] = []
+        for row, result in zip(pending, results):
+            # file that is already missing from the storage is considered
+            # removed
+            if result is None or isinstance(result, shared.exc.MissingFileError):
+                purged.append(row.id)
+            else:
+                failed.append(row)
+
+        pending = failed
+        if not pending:
+            break
+
+    for row in pending:
+        log.error("Cannot purge file %s from %s", row.id, storage_name)
+
+    return purged
+
+
+def collect_garbage(
+    batch_size: int = 1000,
+    attempts: int = 3,
+    delay: float = 1.0,
+    older_than: int = 0,
+) -> dict[str, int]:
+    """Remove every soft-deleted file from its storage.
+
+    Returns:
+        number of purged and failed files
+    """
+    purged = failed = 0
+    for batch_purged, batch_failed in iter_garbage_collection(batch_size, attempts, delay, older_than):
+        purged += batch_purged
+        failed += batch_failed
+
+    log.info("Collected garbage. Purged: %d, failed: %d", purged, failed)
+    return {"purged": purged, "failed": failed}
+
+
+def expired_history(older_than: int, keep_latest: bool = False) -> Any:
+    """Select keys of expired records of ownership history.
+
+    Args:
+        older_than: select records created more than this number of seconds ago
+        keep_latest: skip the most recent record of every file
+
+    Returns:
+        statement that selects `at` and `id` of records
+    """
+    table: Any = shared.TransferHistory.__table__
+    deadline = datetime.now(timezone.utc) - timedelta(seconds=older_than)
+    stmt = sa.select(table.c.at, table.c.id).where(table.c.at < deadline)
+    if keep_latest:
+        newer = table.alias("newer")
+        stmt = stmt.where(
+            sa.exists().where(
+                newer.c.file_id == table.c.file_id,
+                sa.tuple_(newer.c.at, newer.c.id) > sa.tuple_(table.c.at, table.c.id),
+            ),
+        )
+
+    return stmt
+
+
+def iter_history_compaction(
+    older_than: int,
+    batch_size: int = 1000,
+    keep_latest: bool = False,
+) -> Iterator[list[Any]]:
+    """Remove expired records of ownership history in batches.
+
+    Records are processed in the order of transfer, using the index on `at`.
+    Every batch is removed by a single DELETE that returns removed rows, so
+    that the caller can archive them. The batch is committed only when the
+    caller requests the next one. If the caller fails while processing the
+    batch, removal of the batch is rolled back. With `keep_latest`, the most
+    recent record of every file is kept even when it's expired, so that the
+    previous owner of the file remains known.
+
+    Args:
+        older_than: remove records created more than this number of seconds ago
+        batch_size: number of records removed at once
+        keep_latest: keep the most recent record of every file
+
+    Yields:
+        removed records of every batch
+    """
+    table: Any = shared.TransferHistory.__table__
+    stmt = expired_history(older_than, keep_latest).order_by(table.c.at, table.c.id).limit(batch_size)
+
+    cursor = None
+    while True:
+        batch = stmt
+        if cursor:
+            batch = stmt.where(sa.tuple_(table.c.at, table.c.id) > cursor)
+
+        keys = model.Session.execute(batch).fetchall()
+        if not keys:
+            break
+
+        cursor = (keys[-1].at, keys[-1].id)
+        rows = model.Session.execute(
+            sa.delete(table).where(table.c.id.in_([key.id for key in keys])).returning(*table.c),
+        ).fetchall()
+
+        try:
+            yield rows
+        except BaseException:
+            model.Session.rollback()
+            raise
+
+        model.Session.commit()
+
+
+def compact_history(older_than: int, batch_size: int = 1000, keep_latest: bool = False) -> dict[str, int]:
+    """Remove every expired record of ownership history.
+
+    Returns:
+        number of removed records
+    """
+    removed = 0
+    for rows in iter_history_compaction(older_than, batch_size, keep_latest):
+        removed += len(rows)
+
+    log.info("Compacted ownership history. Removed: %d", removed)
+    return {"removed": removed}
@@ -1,11 +1,17 @@
 from __future__ import annotations
 
+import base64
+import json
 import logging
-from collections.abc import Mapping
+from collections import defaultdict
+from collections.abc import Iterable, Mapping
+from datetime import datetime, timezone
 from typing import TYPE_CHECKING, Any
 
 import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.exc import ProgrammingError
+from sqlalchemy.orm import contains_eager, joinedload
 from werkzeug.utils import secure_filename
 
 import ckan.plugins.toolkit as tk
@@ -13,10 +19,12 @@ from ckan import model
 from ckan.logic import validate
 from ckan.types import Action, Context
 
-from ckanext.files import shared, utils
+from ckanext.files import replica, search_index, shared, utils
+from ckanext.files.base import remove_many
+from ckanext.files.model import StorageUsage
 from ckanext.files.shared import File, Owner, TransferHistory
 
-from . import schema
+from . import query, schema
 
 if TYPE_CHECKING:
     from sqlalchemy.sql.elements import ColumnElement
@@ -57,141 +65,70 @@ user_create = shared.with_task_queue(_chained_action, "user_create")
 user_update = shared.with_task_queue(_chained_action, "user_update")
 
 
-def _set_user_owner(context: Context, file_id: str):
+def _set_user_owner(context: Context, file_id: str) -> Owner | None:
     """Add user from context as file owner."""
     user = model.User.get(context.get("user", ""))
-    if user:
-        owner = Owner(
-            file_id=file_id,
-            owner_id=user.id,
-            owner_type="user",
-        )
-        context["session"].add(owner)
+    if not user:
+        return None
 
+    owner = Owner(
+        file_id=file_id,
+        owner_id=user.id,
+        owner_type="user",
+    )
+    context["session"].add(owner)
+    return owner
 
-def _process_filters(  # noqa: C901
-    filters: dict[str, Any], columns: Mapping[str, Column[Any]]
-) -> ColumnElement[bool]:
-    """Transform `{"$and":[{"field":{"$eq":"value"}}]}` filters into SQL filters."""
-    items = []
-
-    for k, v in filters.items():
-        if k in ["$and", "$or"]:
-            if not isinstance(v, list):
-                raise tk.ValidationError({"filters": [f"Only lists are allowed inside {k}"]})
-            nested_items = [
-                _process_filters(sub_filters, columns)
-                for sub_filters in v  # pyright: ignore[reportUnknownVariableType]
-                if isinstance(sub_filters, dict)
-            ]
-            if len(nested_items) > 1:
-                wrapper = sa.and_ if k == "$and" else sa.or_
-                items.append(wrapper(*nested_items).self_group())
-            else:
-                items.extend(nested_items)
 
-        elif k in ["storage_data", "plugin_data"]:
-            items.extend(_process_data(columns[k], v))
+_Usage = tuple[str, str, str, str, int]
 
-        elif k in columns:
-            items.extend(_process_field(columns[k], v))
 
-        else:
-            raise tk.ValidationError({"filters": [f"Unknown filter: {k}"]})
-
-    if len(items) == 1:
-        return items[0]  # pyright: ignore[reportUnknownVariableType]
-
-    return sa.and_(*items).self_group()
-
-
-_op_map = {
-    "$eq": "=",
-    "$ne": "!=",
-    "$lt": "<",
-    "$lte": "<=",
-    "$gt": ">",
-    "$gte": ">=",
-    "$in": "IN",
-    "$is": "IS",
-    "$isnot": "IS NOT",
-    "$like": "LIKE",
-    "$ilike": "ILIKE",
-}
-
-
-def _process_field(col: Column[Any], value: Any):  # noqa: C901
-    """Transform `{"field":{"$eq":"value"}}` into SQL filters."""
-    if isinstance(value, list):
-        value = {"$in": value}  # pyright: ignore[reportUnknownVariableType]
-
-    elif value is None:
-        value = {"$eq": None}
-
-    elif not isinstance(value, dict):
-        value = {"$eq": value}
-
-    for operator, filter in value.items():  # pyright: ignore[reportUnknownVariableType]
-        column = col
-        if operator not in _op_map:
-            raise tk.ValidationError({"filters": [f"Operator {operator} is not supported"]})
-        op = _op_map[operator]
-        if filter is None:
-            if op == "=":
-                op = "is"
-            elif op == "!=":
-                op = "IS NOT"
-
-        elif operator == "$in" and isinstance(filter, list):
-            filter = tuple(filter)  # pyright: ignore[reportUnknownVariableType]  # noqa: PLW2901
-        elif not isinstance(filter, col.type.python_type):
-            filter = str(filter)  # noqa: PLW2901
-            column = sa.func.cast(column, sa.Text)
-
-        func = column.bool_op(op)
-        yield func(filter)
-
-
-def _process_data(col: ColumnElement[Any], value: Any):  # pyright: ignore[reportUnknownParameterType]
-    """Transform file/plugin data filters into SQL JSONB filters."""
-    if not isinstance(value, dict):
-        value = {"$eq": value}
-
-    for k, v in value.items():  # pyright: ignore[reportUnknownVariableType]
-        if k in _op_map:
-            op = _op_map[k]
-            if v is None:
-                if op == "=":
-                    op = "is"
-                elif op == "!=":
-                    op = "IS NOT"
-
-            if isinstance(v, bool):
-                col = sa.cast(col, sa.Boolean)
-
-            elif isinstance(v, int):
-                col = sa.cast(col, sa.Integer)
-
-            elif isinstance(v, float):
-                col = sa.cast(col, sa.Float)
+def _usage(fileobj: File, owner: Owner | None) -> _Usage:
+    """Identify group of storage usage summary and size of the file."""
+    return (
+        fileobj.storage,
+        owner.owner_type if owner else "",
+        owner.owner_id if owner else "",
+        StorageUsage.family_of(fileobj.content_type or ""),
+        fileobj.size or 0,
+    )
 
-            else:
-                col = col.astext
 
-            yield col.bool_op(op)(v)
+def _track_usage(sess: Any, before: _Usage | None, after: _Usage | None):
+    """Apply change of the file to storage usage summary.
 
-        else:
-            yield from _process_data(col[k], v)
+    Statements are executed in the current transaction, so summary is
+    committed or rolled back together with the file.
+    """
+    if before == after:
+        return
+
+    if before and after and before[:4] == after[:4]:
+        sess.execute(StorageUsage.change(*after[:4], 0, after[4] - before[4]))
+        return
+
+    if before:
+        sess.execute(StorageUsage.change(*before[:4], -1, -before[4]))
+
+    if after:
+        sess.execute(StorageUsage.change(*after[:4], 1, after[4]))
 
 
 def _process_sort(
     sort: str | list[str] | list[list[str]] | Any,
     columns: Mapping[str, Column[Any]],
-):
-    """Transform sort field into SQL ordering statements."""
+) -> list[tuple[str, str]]:
+    """Transform sort field into the list of column names and directions.
+
+    File ID is always added as the last sort key, so that ordering is stable
+    and every row has a unique position used by cursor pagination. It uses
+    the direction of the previous key, so that multi-column indexes ending
+    with ID can be scanned in both directions.
+    """
     if isinstance(sort, str):
         sort = [sort]
 
+    keys: list[tuple[str, str]] = []
     for part in sort:
         if isinstance(part, str):
             field: str = part
@@ -209,7 +146,233 @@ def _process_sort(
         if field not in columns:
             raise tk.ValidationError({"sort": [f"Invalid sort field: {field}"]})
 
-        yield getattr(columns[field], direction)()
+        keys.append((field, direction))
+
+    if "id" not in {field for field, _direction in keys}:
+        keys.append(("id", keys[-1][1] if keys else "asc"))
+
+    return keys
+
+
+def _encode_cursor(keys: list[tuple[str, str]], values: Iterable[Any]) -> str:
+    """Build opaque pagination cursor from sort keys and values of the last row."""
+
+    def default(value: Any):
+        if isinstance(value, datetime):
+            return {"$dt": value.isoformat()}
+        raise TypeError(value)
+
+    payload = json.dumps({"k": keys, "v": list(values)}, default=default, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def _decode_cursor(cursor: str, keys: list[tuple[str, str]]) -> list[Any]:
+    """Extract values of the last row from pagination cursor."""
+
+    def object_hook(value: dict[str, Any]):
+        if "$dt" in value:
+            return datetime.fromisoformat(value["$dt"])
+        return value
+
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()), object_hook=object_hook)
+    except ValueError as err:
+        raise tk.ValidationError({"cursor": ["Invalid cursor"]}) from err
+
+    if not isinstance(payload, dict) or not isinstance(payload.get("k"), list):
+        raise tk.ValidationError({"cursor": ["Invalid cursor"]})
+
+    if [tuple(key) if isinstance(key, list) else key for key in payload["k"]] != keys:
+        raise tk.ValidationError({"cursor": ["Cursor does not match sort order"]})
+
+    values = payload.get("v")
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise tk.ValidationError({"cursor": ["Invalid cursor"]})
+
+    return values
+
+
+def _keyset_filter(
+    keys: list[tuple[str, str]],
+    values: list[Any],
+    columns: Mapping[str, Column[Any]],
+) -> ColumnElement[bool]:
+    """Build condition that selects rows located after the cursor.
+
+    When all keys are sorted in the same direction and cannot be NULL, row
+    comparison is used, so that PostgreSQL can turn it into the range scan of
+    the index.
+
+    Otherwise, condition is expanded into the chain of alternatives. PostgreSQL
+    puts NULLs after all values in ascending order and before all values in
+    descending order. The condition follows the same rules, so that it's
+    consistent with ORDER BY clause.
+    """
+    cols = [columns[field] for field, _direction in keys]
+    directions = {direction for _field, direction in keys}
+    if len(directions) == 1 and None not in values and not any(getattr(col, "nullable", True) for col in cols):
+        row = sa.tuple_(*cols)
+        bound = sa.tuple_(*[sa.bindparam(None, value, type_=col.type) for col, value in zip(cols, values)])
+        return row > bound if "asc" in directions else row < bound
+
+    alternatives: list[ColumnElement[bool]] = []
+    for idx, ((field, direction), value) in enumerate(zip(keys, values)):
+        col = columns[field]
+        if direction == "asc":
+            after = sa.false() if value is None else sa.or_(col > value, col.is_(None))
+        else:
+            after = col.is_not(None) if value is None else col < value
+
+        prefix = [columns[f].is_not_distinct_from(v) for (f, _d), v in zip(keys[:idx], values[:idx])]
+        alternatives.append(sa.and_(*prefix, after))
+
+    return sa.or_(*alternatives)
+
+
+def _purge_deleted(sess: Any, storage: shared.Storage, fileobj: File):
+    """Remove soft-deleted file from the storage and DB."""
+    if not storage.supports(shared.Capability.REMOVE):
+        raise tk.ValidationError({"upload": ["File already exists and waits for garbage collection"]})
+
+    try:
+        storage.remove(shared.FileData.from_object(fileobj))
+    except shared.exc.MissingFileError:
+        pass
+    except shared.exc.StorageError as err:
+        raise tk.ValidationError({"upload": [str(err)]}) from err
+
+    sess.delete(fileobj)
+    # record is removed before the new file with the same location is added
+    sess.flush()
+
+
+def _active(fileobj: File | None) -> File | None:
+    """Hide files that are marked as deleted."""
+    if fileobj and fileobj.is_deleted:
+        return None
+
+    return fileobj
+
+
+def _with_owner() -> list[Any]:
+    """Loader options for files that are dictized or checked by owner."""
+    return [joinedload(File.owner)]
+
+
+def _is_owner_scoped(filters: dict[str, Any]) -> bool:
+    """Check if filters select files of the single owner."""
+    return isinstance(filters.get("owner_type"), str) and isinstance(filters.get("owner_id"), str)
+
+
+def _owner_sort_columns(columns: Mapping[str, Column[Any]]) -> Mapping[str, Column[Any]]:
+    """Replace file's ID and creation date with their copies from owner table.
+
+    When files of a single owner are sorted by these columns, PostgreSQL
+    walks `idx_files_owner_listing` in order and stops after the first page,
+    instead of sorting all files of the owner.
+    """
+    owner_columns = Owner.__table__.c
+    if "file_created" not in owner_columns:
+        return columns
+
+    return {**columns, "created": owner_columns["file_created"], "id": owner_columns["file_id"]}
+
+
+def _count(sess: Any, stmt: Any, mode: str, cap: int) -> int | None:
+    """Compute total number of rows matching the search statement."""
+    if mode == "none":
+        return None
+
+    if mode == "capped":
+        return sess.scalar(sa.select(sa.func.count()).select_from(stmt.limit(cap + 1).subquery()))
+
+    if mode == "estimate":
+        # parameters keep types of their columns, so that values are
+        # processed in the same way as in the search statement itself
+        compiled = stmt.compile(
+            dialect=postgresql.dialect(paramstyle="named"),
+            compile_kwargs={"render_postcompile": True},
+        )
+        explain = sa.text(f"EXPLAIN (FORMAT JSON) {compiled}").bindparams(
+            *(
+                sa.bindparam(key, value, type_=bind.type if (bind := compiled.binds.get(key)) is not None else None)
+                for key, value in compiled.params.items()
+            )
+        )
+        plan = sess.scalar(explain)
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    return sess.scalar(stmt.with_only_columns(sa.func.count()))
+
+
+def _referenced_fields(filters: Any) -> set[str]:
+    """Collect names of fields used by search filters."""
+    result: set[str] = set()
+    if isinstance(filters, list):
+        for item in filters:  # pyright: ignore[reportUnknownVariableType]
+            result |= _referenced_fields(item)
+
+    elif isinstance(filters, dict):
+        for k, v in filters.items():  # pyright: ignore[reportUnknownVariableType]
+            if k.startswith("$"):
+                result |= _referenced_fields(v)
+            else:
+                result.add(k)
+
+    return result
+
+
+def _search_via_index(context: Context, data_dict: dict[str, Any]) -> dict[str, Any]:
+    """Search files via Solr and load details of found files from DB."""
+    if not search_index.is_enabled():
+        raise tk.ValidationError({"backend": ["Search index is not enabled"]})
+
+    if data_dict.get("cursor") is not None:
+        raise tk.ValidationError({"cursor": ["Cursor is not supported by search index"]})
+
+    fields: list[str] | None = data_dict.get("fields")
+    include_plugin_data = context.get("include_plugin_data", False)
+    if fields is not None:
+        query.projection(fields, include_plugin_data)
+
+    keys = _process_sort(data_dict["sort"], search_index.FIELDS)  # pyright: ignore[reportArgumentType]
+    try:
+        ids, total, facets = search_index.search(
+            data_dict["filters"],
+            keys,
+            data_dict["start"],
+            data_dict["rows"],
+            data_dict["facets"],
+            data_dict["facet_limit"],
+        )
+    except tk.ValidationError:
+        raise
+    except Exception as err:
+        log.exception("Cannot search files via index")
+        raise tk.ValidationError({"backend": ["Search index is not available"]}) from err
+
+    cache = utils.ContextCache(context)
+    stmt = sa.select(File).where(File.id.in_(ids), File.deleted_at.is_(None)).options(*_with_owner())
+    found = {f.id: f for f in context["session"].scalars(stmt)}
+    results: list[dict[str, Any]] = []
+    for file_id in ids:
+        fileobj = found.get(file_id)
+        if not fileobj:
+            # index is behind DB
+            continue
+
+        cache.set("file", fileobj.id, fileobj)
+        item = fileobj.dictize(include_plugin_data)
+        results.append({field: item.get(field) for field in fields} if fields is not None else item)
+
+    return {
+        "count": total,
+        "results": results,
+        "next_cursor": None,
+        "facets": facets,
+    }
 
 
 @tk.side_effect_free
@@ -227,67 +390,188 @@ def files_file_search(  # noqa: C901, PLR0912, PLR0915
     Provides an ability to search files according to [the future CKAN's search
     spec](https://github.com/ckan/ckan/discussions/8444).
 
-    All columns of File model can be used as filters. Before the search, type
-    of column and type of filter value are compared. If they are the same,
-    original values are used in search. If type different, column value and
-    filter value are casted to string.
-
-    This request produces `size = 10` SQL expression:
+    All columns of File model can be used as filters. Filter values are
+    converted into the type of the column, so that indexes of the column can
+    be used. Both requests below produce `size = 10` SQL expression:
 
     ```sh
-    $ ckanapi action file_search filters:'{"size": 10}'
+    $ ckanapi action files_file_search filters:'{"size": 10}'
+    $ ckanapi action files_file_search filters:'{"size": "10"}'
     ```
 
-    This request produces `size::text = '10'` SQL expression:
+    Integer columns accept numbers and numeric strings, boolean columns
+    accept `true`/`false`, `yes`/`no`, `1`/`0`, and date columns accept ISO
+    8601 strings. Value that cannot be converted produces validation error.
+
+    To compare text representation of the column instead, wrap operators
+    into `$astext`. Such filter cannot use indexes of the column:
 
     ```sh
-    $ ckanapi action file_search filters:'{"size": "10"}'
+    $ ckanapi action files_file_search filters:'{"created": {"$astext": {"$like": "2024-%"}}}'
     ```
 
-    Even though results are usually not changed, using correct types leads to
-    more efficient search.
-
     Apart from File columns, the following Owner properties can be used for
     searching: `owner_id`, `owner_type`, `pinned`.
 
+    Text columns support `$search` operator. It matches values that contain
+    the search term and, when `pg_trgm` extension is installed, values similar
+    to it. Results are ranked by similarity before applying `sort`. Ranking is
+    not applied when `cursor` is used.
+
+    ```sh
+    $ ckanapi action files_file_search filters:'{"name": {"$search": "report"}}'
+    ```
+
+    Nested keys of `storage_data` and `plugin_data` are used as filters via
+    nested dictionaries. Plain numbers and booleans, `$contains` and
+    `$has_key` operators use GIN index of the column. Plain strings compare
+    text representation of the value and, like other operators, require
+    scanning the whole table.
+
+    ```sh
+    $ ckanapi action files_file_search filters:'{"plugin_data": {"tags": {"$contains": ["a", "b"]}}}'
+    $ ckanapi action files_file_search filters:'{"plugin_data": {"$has_key": "tags"}}'
+    ```
+
+    Results are always ordered by file ID after the explicit sort fields,
+    so ordering is stable between requests.
+
+    To walk through large number of files, use cursor pagination instead of
+    `start`. Pass an empty `cursor` with the first request and then pass
+    `next_cursor` from the previous response, until `next_cursor` is
+    empty. Cost of every page does not depend on its position, while skipping
+    rows via `start` becomes slower with every page. `start` is ignored when
+    `cursor` is used. Cursor is valid only for the same `sort`.
+
+    ```sh
+    $ ckanapi action files_file_search cursor= rows=1000
+    $ ckanapi action files_file_search cursor=<NEXT_CURSOR> rows=1000
+    ```
+
+    When only a few properties of files are required, list them in
+    `fields`. Only these columns are fetched from DB and every result
+    contains only requested keys. Owner's table is not joined, unless owner
+    properties are used by `fields`, `filters` or `sort`.
+
+    ```sh
+    $ ckanapi action files_file_search fields:'["id", "name", "size"]'
+    ```
+
+    When `ckanext.files.search_index.enabled` is set, files can be searched
+    via Solr by passing `backend=index`. Index supports filtering by `id`,
+    `name`, `location`, `content_type`, `family`(major part of MIMEtype),
+    `hash`, `storage`, `owner_type`, `owner_id` and `created`, and sorting by
+    the same fields. `$search` operator performs full-text search by
+    name. Cursor pagination and `count` modes are not available. Index backend
+    additionally computes facet counts for fields listed in `facets`: any of
+    `storage`, `content_type`, `family`, `owner_type` and `owner_id`.
+
+    ```sh
+    $ ckanapi action files_file_search backend=index facets:'["family", "storage"]'
+    ```
+
+    Computing the exact number of matching files can take more time than
+    fetching the page itself. Use `count` parameter to change this
+    behavior. `exact` counts all matching files. `none` skips counting and
+    `count` is `null` in the response. `estimate` uses number of rows
+    expected by PostgreSQL planner, which may differ from the real
+    number. `capped` counts at most `count_cap + 1` files: if result is
+    greater than `count_cap`, there are more files than the cap.
+
     Args:
         start (int): index of first row in result/number of rows to skip. Default: `0`
         rows (int): number of rows to return. Default: `10`
         sort (str): name of File column used for sorting. Default: `name`
         filters (dict[str, Any]): search filters
+        cursor (str): opaque position returned as `next_cursor` by the previous search
+        count (str): `exact`, `none`, `estimate` or `capped`. Default: `exact`
+        count_cap (int): max number of counted files in `capped` mode. Default: `1000`
+        fields (list[str]): properties of files included into results. Default: all
+        backend (str): `db` or `index`. Default: `db`
+        facets (list[str]): fields for facet counts. Only for `index` backend
+        facet_limit (int): max number of values in every facet. Default: `50`
 
     Returns:
-        dictionary with `count` and `results`
+        dictionary with `count`, `results` and `next_cursor`
     """
+    context = replica.route(context)
     tk.check_access("files_file_search", context, data_dict)
+    if data_dict["backend"] == "index":
+        return _search_via_index(context, data_dict)
+
     sess = context["session"]
     columns = dict(**File.__table__.c, **Owner.__table__.c)
 
-    stmt = (
-        sa.select(File)
-        .outerjoin(
-            Owner,
-            sa.and_(File.id == Owner.file_id),
-        )
-        .where(_process_filters(data_dict["filters"], columns))
-    )
+    fields: list[str] | None = data_dict.get("fields")
+    if fields is None:
+        projection = {}
+        stmt = sa.select(File).outerjoin(Owner, sa.and_(File.id == Owner.file_id))
+
+    else:
+        projection = query.projection(fields, context.get("include_plugin_data", False))
+        stmt = sa.select(*projection.values()).select_from(File)
+
+        sort = data_dict["sort"]
+        used = set(fields) | _referenced_fields(data_dict["filters"])
+        used.update([sort] if isinstance(sort, str) else (p if isinstance(p, str) else p[0] for p in sort))
+        if used & {"owner_id", "owner_type", "pinned", "file_id"}:
+            stmt = stmt.outerjoin(Owner, sa.and_(File.id == Owner.file_id))
+
+    stmt = stmt.where(File.deleted_at.is_(None), query.process_filters(data_dict["filters"], columns))
 
     try:
-        total: int = sess.scalar(stmt.with_only_columns(sa.func.count()))  # pyright: ignore[reportAssignmentType]
+        total = _count(sess, stmt, data_dict["count"], data_dict["count_cap"])
     except ProgrammingError as err:
         sess.rollback()
         msg = "Invalid file search request"
         log.exception(msg)
         raise tk.ValidationError({"filters": [msg]}) from err
 
-    for clause in _process_sort(data_dict["sort"], columns):
-        stmt = stmt.order_by(clause)
+    cursor: str | None = data_dict.get("cursor")
+
+    # similarity ranking cannot be combined with keyset pagination, so it's
+    # applied only in offset mode
+    if cursor is None:
+        stmt = stmt.order_by(*(rank.desc() for rank in query.search_ranks(data_dict["filters"], columns)))
+
+    keys = _process_sort(data_dict["sort"], columns)
+    sort_map = _owner_sort_columns(columns) if _is_owner_scoped(data_dict["filters"]) else columns
+    sort_map = {field: query.sort_column(col) for field, col in sort_map.items()}
+    sort_columns = [sort_map[field] for field, _direction in keys]
+    stmt = stmt.add_columns(*sort_columns).order_by(
+        *(getattr(col, direction)() for col, (_field, direction) in zip(sort_columns, keys))
+    )
+
+    if cursor:
+        stmt = stmt.where(_keyset_filter(keys, _decode_cursor(cursor, keys), sort_map))
+    elif cursor is None:
+        stmt = stmt.offset(data_dict["start"])
 
-    stmt = stmt.limit(data_dict["rows"]).offset(data_dict["start"])
+    if fields is None:
+        # owner's table is already joined, there is no need in additional join
+        stmt = stmt.options(contains_eager(File.owner))
+
+    rows = sess.execute(stmt.limit(data_dict["rows"])).all()
+
+    width = len(projection) if fields is not None else 1
+    next_cursor = None
+    if cursor is not None and rows and len(rows) == data_dict["rows"]:
+        next_cursor = _encode_cursor(keys, rows[-1][width:])
+
+    if fields is not None:
+        return {
+            "count": total,
+            "results": [dict(zip(projection, row[:width])) for row in rows],
+            "next_cursor": next_cursor,
+        }
 
     cache = utils.ContextCache(context)
-    results: list[shared.File] = [cache.set("file", f.id, f) for f in sess.scalars(stmt)]
-    return {"count": total, "results": [f.dictize(context.get("include_plugin_data", False)) for f in results]}
+    results: list[shared.File] = [cache.set("file", row[0].id, row[0]) for row in rows]
+    return {
+        "count": total,
+        "results": [f.dictize(context.get("include_plugin_data", False)) for f in results],
+        "next_cursor": next_cursor,
+    }
 
 
 @validate(schema.file_create)
@@ -317,6 +601,10 @@ def files_file_create(context: Context, data_dict: dict[str, Any]) -> dict[str,
     ckanapi action files_file_create upload@<(echo -n "hello world") name=file.txt
     ```
 
+    If location of the new file belongs to the soft-deleted file, the deleted
+    file is removed from the storage and DB without waiting for garbage
+    collection.
+
     Requires storage with `CREATE` capability.
 
     Args:
@@ -354,7 +642,12 @@ def files_file_create(context: Context, data_dict: dict[str, Any]) -> dict[str,
     location = storage.prepare_location(filename, data_dict["upload"])
     stmt = shared.File.by_location(location, data_dict["storage"])
     if fileobj := sess.scalar(stmt):
-        raise tk.ValidationError({"upload": ["File already exists"]})
+        if not fileobj.is_deleted:
+            raise tk.ValidationError({"upload": ["File already exists"]})
+
+        # location of soft-deleted file is reused, so the old file is purged
+        # right now instead of waiting for garbage collection
+        _purge_deleted(sess, storage, fileobj)
 
     try:
         storage_data = storage.upload(
@@ -374,7 +667,8 @@ def files_file_create(context: Context, data_dict: dict[str, Any]) -> dict[str,
 
     sess.add(fileobj)
 
-    _set_user_owner(context, fileobj.id)
+    owner = _set_user_owner(context, fileobj.id)
+    _track_usage(sess, None, _usage(fileobj, owner))
 
     # TODO: add hook to set plugin_data using extras
     if not context.get("defer_commit"):
@@ -384,6 +678,8 @@ def files_file_create(context: Context, data_dict: dict[str, Any]) -> dict[str,
 
     utils.ContextCache(context).set("file", fileobj.id, fileobj)
 
+    search_index.safe_index(fileobj)
+
     return fileobj.dictize(context.get("include_plugin_data", False))
 
 
@@ -429,13 +725,16 @@ def files_file_register(context: Context, data_dict: dict[str, Any]):
     )
     sess.add(fileobj)
 
-    _set_user_owner(context, fileobj.id)
+    owner = _set_user_owner(context, fileobj.id)
+    _track_usage(sess, None, _usage(fileobj, owner))
 
     if not context.get("defer_commit"):
         sess.commit()
 
     utils.ContextCache(context).set("file", fileobj.id, fileobj)
 
+    search_index.safe_index(fileobj)
+
     return fileobj.dictize(context.get("include_plugin_data", False))
 
 
@@ -450,6 +749,10 @@ def files_file_delete(context: Context, data_dict: dict[str, Any]) -> dict[str,
     or backups. Check storage documentation if you need to know whether there
     are chances that file is not completely removed with this operation.
 
+    When `ckanext.files.soft_delete` is enabled, file is only marked as
+    deleted. It's hidden from API immediately and removed from the storage
+    later by garbage collector.
+
     Requires storage with `REMOVE` capability.
 
     ```sh
@@ -466,7 +769,7 @@ def files_file_delete(context: Context, data_dict: dict[str, Any]) -> dict[str,
 
     cache = utils.ContextCache(context)
 
-    fileobj = cache.get_model("file", data_dict["id"], File)
+    fileobj = _active(cache.get_model("file", data_dict["id"], File, _with_owner()))
 
     if not fileobj:
         raise tk.ObjectNotFound("file")
@@ -475,21 +778,145 @@ def files_file_delete(context: Context, data_dict: dict[str, Any]) -> dict[str,
     if not storage.supports(shared.Capability.REMOVE):
         raise tk.ValidationError({"storage": ["Operation is not supported"]})
 
-    try:
-        storage.remove(shared.FileData.from_object(fileobj))
-    except shared.exc.PermissionError as err:
-        raise tk.NotAuthorized(str(err)) from err
-
     sess = context["session"]
-    sess.delete(fileobj)
+    if shared.config.soft_delete():
+        fileobj.deleted_at = datetime.now(timezone.utc)
+
+    else:
+        try:
+            storage.remove(shared.FileData.from_object(fileobj))
+        except shared.exc.PermissionError as err:
+            raise tk.NotAuthorized(str(err)) from err
+
+        sess.delete(fileobj)
+
+    _track_usage(sess, _usage(fileobj, fileobj.owner), None)
     if not context.get("defer_commit"):
         sess.commit()
 
     sess.commit()
 
+    search_index.safe_remove(fileobj.id)
+
     return fileobj.dictize(context.get("include_plugin_data", False))
 
 
+def _remove_group(storage_name: str, group: list[File], soft: bool) -> list[Exception | None]:
+    """Remove files of a single storage and return an error for every file.
+
+    When files are deleted softly, they are removed from the storage later by
+    garbage collector, so only support of removal is checked.
+    """
+    try:
+        storage = shared.get_storage(storage_name)
+        if not soft:
+            return remove_many(storage, [shared.FileData.from_object(fileobj) for fileobj in group])
+    except shared.exc.StorageError as err:
+        return [err] * len(group)
+
+    if not storage.supports(shared.Capability.REMOVE):
+        return [shared.exc.UnsupportedOperationError("remove", storage)] * len(group)
+
+    return [None] * len(group)
+
+
+def _delete_records(sess: Any, removed: list[File], soft: bool) -> list[str]:
+    """Delete or mark as deleted records of removed files by a single statement."""
+    deleted = [fileobj.id for fileobj in removed]
+    if deleted and soft:
+        sess.execute(
+            sa.update(File.__table__)
+            .where(query.in_clause(File.__table__.c["id"], deleted))
+            .values(deleted_at=datetime.now(timezone.utc))
+        )
+        for fileobj in removed:
+            sess.expire(fileobj, ["deleted_at"])
+
+    elif deleted:
+        # owners and transfer history are removed by cascade FK
+        sess.execute(sa.delete(File.__table__).where(query.in_clause(File.__table__.c["id"], deleted)))
+        for fileobj in removed:
+            if fileobj.owner:
+                sess.expunge(fileobj.owner)
+            sess.expunge(fileobj)
+
+    return deleted
+
+
+@validate(schema.file_delete_many)
+def files_file_delete_many(context: Context, data_dict: dict[str, Any]) -> dict[str, Any]:
+    """Remove multiple files from storages.
+
+    Files are grouped by storage and every storage removes its files in
+    batches when the backend supports it(S3 `DeleteObjects`, pipelined Redis
+    commands, concurrent removal from filesystem). Details of successfully
+    removed files are deleted from DB by a single statement.
+
+    Failure to remove one file does not stop removal of other files. Such
+    files remain in DB and reported in `errors`.
+
+    When `ckanext.files.soft_delete` is enabled, files are only marked as
+    deleted by a single statement and removed from storages later by garbage
+    collector.
+
+    ```sh
+    ckanapi action files_file_delete_many ids:'["ID-1", "ID-2"]'
+    ```
+
+    Requires storages with `REMOVE` capability.
+
+    Args:
+        ids (list[str]): IDs of files
+
+    Returns:
+        dictionary with the list of `deleted` IDs and `errors` for files that were not removed
+    """
+    tk.check_access("files_file_delete_many", context, data_dict)
+    sess = context["session"]
+
+    ids: list[str] = data_dict["ids"]
+    files: list[File] = list(
+        sess.scalars(
+            sa.select(File)
+            .where(query.in_clause(File.__table__.c["id"], ids), File.deleted_at.is_(None))
+            .options(*_with_owner())
+        )
+    )
+
+    found = {fileobj.id for fileobj in files}
+    errors = {file_id: "Not found" for file_id in ids if file_id not in found}
+
+    groups: dict[str, list[File]] = defaultdict(list)
+    for fileobj in files:
+        groups[fileobj.storage].append(fileobj)
+
+    soft = shared.config.soft_delete()
+    removed: list[File] = []
+    for storage_name, group in groups.items():
+        for fileobj, error in zip(group, _remove_group(storage_name, group, soft)):
+            if error:
+                errors[fileobj.id] = str(error)
+            else:
+                removed.append(fileobj)
+
+    usage: dict[tuple[str, str, str, str], list[int]] = defaultdict(lambda: [0, 0])
+    for fileobj in removed:
+        group_usage = usage[_usage(fileobj, fileobj.owner)[:4]]
+        group_usage[0] -= 1
+        group_usage[1] -= fileobj.size or 0
+
+    for key, (count, size) in usage.items():
+        sess.execute(StorageUsage.change(*key, count, size))
+
+    deleted = _delete_records(sess, removed, soft)
+    if not context.get("defer_commit"):
+        sess.commit()
+
+    search_index.safe_remove_many(deleted)
+
+    return {"deleted": deleted, "errors": errors}
+
+
 @tk.side_effect_free
 @validate(schema.file_show)
 def files_file_show(context: Context, data_dict: dict[str, Any]) -> dict[str, Any]:
@@ -508,10 +935,11 @@ def files_file_show(context: Context, data_dict: dict[str, Any]) -> dict[str, An
     Returns:
         dictionary with file details
     """
+    context = replica.route(context)
     tk.check_access("files_file_show", context, data_dict)
 
     cache = utils.ContextCache(context)
-    fileobj = cache.get_model("file", data_dict["id"], File)
+    fileobj = _active(cache.get_model("file", data_dict["id"], File, _with_owner()))
     if not fileobj:
         raise tk.ObjectNotFound("file")
 
@@ -542,11 +970,7 @@ def files_file_rename(context: Context, data_dict: dict[str, Any]) -> dict[str,
     tk.check_access("files_file_rename", context, data_dict)
 
     cache = utils.ContextCache(context)
-    fileobj = cache.get_model(
-        "file",
-        data_dict["id"],
-        File,
-    )
+    fileobj = _active(cache.get_model("file", data_dict["id"], File, _with_owner()))
     if not fileobj:
         raise tk.ObjectNotFound("file")
 
@@ -555,9 +979,107 @@ def files_file_rename(context: Context, data_dict: dict[str, Any]) -> dict[str,
     if not context.get("defer_commit"):
         context["session"].commit()
 
+    search_index.safe_index(fileobj)
+
+    return fileobj.dictize(context.get("include_plugin_data", False))
+
+
+@validate(schema.file_patch_data)
+def files_file_patch_data(context: Context, data_dict: dict[str, Any]) -> dict[str, Any]:
+    """Merge keys into plugin or storage data of the file.
+
+    Patch is applied by a single UPDATE statement on DB side, so concurrent
+    patches of different keys do not overwrite each other. Only the patch is
+    sent to DB, not the whole data. Missing objects on `path` are created.
+
+    ```sh
+    ckanapi action files_file_patch_data \
+        id=226056e2-6f83-47c5-8bd2-102e2b82ab9a \
+        path:'["ocr"]' patch:'{"language": "en"}'
+    ```
+
+    Args:
+        id (str): ID of the file
+        patch (dict[str, Any]): keys added to the target object
+        path (list[str]): path to the target object inside data. Default: root
+        prop (str): `plugin_data` or `storage_data`. Default: `plugin_data`
+
+    Returns:
+        dictionary with file details
+
+    Raises:
+        ValidationError: path points to a non-object value
+    """
+    tk.check_access("files_file_patch_data", context, data_dict)
+
+    sess = context["session"]
+    cache = utils.ContextCache(context)
+    fileobj = _active(cache.get_model("file", data_dict["id"], File, _with_owner()))
+    if not fileobj:
+        raise tk.ObjectNotFound("file")
+
+    stmt = File.patch_data_statement(data_dict["patch"], data_dict["path"], data_dict["prop"])
+    if sess.scalar(stmt.where(File.__table__.c["id"] == fileobj.id)) is None:
+        raise tk.ValidationError({"path": ["Path does not point to an object"]})
+
+    sess.expire(fileobj, [data_dict["prop"]])
+
+    if not context.get("defer_commit"):
+        sess.commit()
+
     return fileobj.dictize(context.get("include_plugin_data", False))
 
 
+@validate(schema.file_patch_data_many)
+def files_file_patch_data_many(context: Context, data_dict: dict[str, Any]) -> dict[str, Any]:
+    """Merge the same keys into plugin or storage data of multiple files.
+
+    All files are patched by a single UPDATE statement. See
+    `files_file_patch_data` for details.
+
+    ```sh
+    ckanapi action files_file_patch_data_many ids:'["ID-1", "ID-2"]' patch:'{"reviewed": true}'
+    ```
+
+    Args:
+        ids (list[str]): IDs of files
+        patch (dict[str, Any]): keys added to the target object
+        path (list[str]): path to the target object inside data. Default: root
+        prop (str): `plugin_data` or `storage_data`. Default: `plugin_data`
+
+    Returns:
+        dictionary with IDs of `patched` files and `errors` for the rest
+    """
+    tk.check_access("files_file_patch_data_many", context, data_dict)
+
+    sess = context["session"]
+    ids: list[str] = data_dict["ids"]
+    table: Any = File.__table__
+
+    stmt = File.patch_data_statement(data_dict["patch"], data_dict["path"], data_dict["prop"])
+    patched = set(sess.scalars(stmt.where(query.in_clause(table.c.id, ids), table.c.deleted_at.is_(None))))
+
+    errors: dict[str, str] = {}
+    if unpatched := [file_id for file_id in ids if file_id not in patched]:
+        existing = set(
+            sess.scalars(
+                sa.select(table.c.id).where(query.in_clause(table.c.id, unpatched), table.c.deleted_at.is_(None)),
+            )
+        )
+        for file_id in unpatched:
+            errors[file_id] = "Path does not point to an object" if file_id in existing else "File not found"
+
+    # objects loaded into the session before the update are outdated
+    for fileobj in sess.identity_map.values():
+        if isinstance(fileobj, File) and fileobj.id in patched:
+            sess.expire(fileobj, [data_dict["prop"]])
+
+    if not context.get("defer_commit"):
+        sess.commit()
+
+    return {"patched": [file_id for file_id in ids if file_id in patched], "errors": errors}
+
+
 @tk.side_effect_free
 @validate(schema.file_scan)
 def files_file_scan(
@@ -571,9 +1093,17 @@ def files_file_scan(
     user. If owner is specified, user must pass authorization check to see
     files.
 
+    Listing sorted by `created` uses index on owner's table and its cost does
+    not depend on the number of files owned by the owner. Total number of
+    files is computed in the same way as in `files_file_search`. With
+    `count=summary` it's taken from the storage usage summary instead, which
+    does not scan owner's files, but accepts only `storage` filter.
+
     Args:
         owner_id (str): ID of the owner
         owner_type (str): type of the owner
+        filters (dict[str, Any]): additional filters
+        count (str): `exact`(default), `none`, `estimate`, `capped` or `summary`
         **rest (Any): The all other parameters are passed as-is to `files_file_search`.
 
     Returns:
@@ -587,11 +1117,86 @@ def files_file_scan(
 
     tk.check_access("files_file_scan", context, data_dict)
 
-    data_dict["filters"] = {
-        "owner_id": data_dict.pop("owner_id"),
-        "owner_type": data_dict.pop("owner_type"),
+    owner_type = data_dict.pop("owner_type")
+    owner_id = data_dict.pop("owner_id")
+    extra_filters: dict[str, Any] = data_dict.pop("filters")
+
+    use_summary = data_dict.get("count") == "summary"
+    if use_summary:
+        if not set(extra_filters) <= {"storage"} or not all(isinstance(v, str) for v in extra_filters.values()):
+            raise tk.ValidationError({"count": ["Summary count supports only storage filter"]})
+        data_dict["count"] = "none"
+
+    data_dict["filters"] = dict(extra_filters, owner_id=owner_id, owner_type=owner_type)
+    result = tk.get_action("files_file_search")({"ignore_auth": True}, data_dict)
+
+    if use_summary:
+        usage = tk.get_action("files_storage_stats")(
+            {"ignore_auth": True},
+            dict(extra_filters, owner_id=owner_id, owner_type=owner_type),
+        )
+        result["count"] = usage["count"]
+
+    return result
+
+
+@tk.side_effect_free
+@validate(schema.storage_stats)
+def files_storage_stats(context: Context, data_dict: dict[str, Any]) -> dict[str, Any]:
+    """Summary of storage usage.
+
+    Numbers are taken from the summary table maintained by file actions, so
+    the cost of the request does not depend on the number of files. Use
+    `ckan files stats rebuild` to recompute the summary if files were
+    modified bypassing API actions.
+
+    ```sh
+    $ ckanapi action files_storage_stats storage=default group_by=family
+    ```
+
+    Args:
+        storage (str, optional): name of the storage
+        owner_type (str, optional): type of the owner. Empty string for unowned files
+        owner_id (str, optional): ID of the owner. Empty string for unowned files
+        family (str, optional): major part of MIMEtype, e.g. `image`
+        group_by (list[str]): any of `storage`, `owner_type`, `owner_id`, `family`
+
+    Returns:
+        dictionary with total `count` and `size`, and list of `groups`
+    """
+    context = replica.route(context)
+    tk.check_access("files_storage_stats", context, data_dict)
+    sess = context["session"]
+    table = StorageUsage.__table__
+
+    dimensions = ["storage", "owner_type", "owner_id", "family"]
+    for field in data_dict["group_by"]:
+        if field not in dimensions:
+            raise tk.ValidationError({"group_by": [f"Invalid group field: {field}"]})
+
+    group_columns = [table.c[field] for field in data_dict["group_by"]]
+    stmt = sa.select(
+        *group_columns,
+        sa.func.coalesce(sa.func.sum(table.c["count"]), 0).label("count"),
+        sa.func.coalesce(sa.func.sum(table.c["size"]), 0).label("size"),
+    ).group_by(*group_columns)
+
+    for field in dimensions:
+        if field in data_dict:
+            stmt = stmt.where(table.c[field] == data_dict[field])
+
+    groups: list[dict[str, Any]] = []
+    for row in sess.execute(stmt.having(sa.func.sum(table.c["count"]) != 0).order_by(*group_columns)):
+        group = dict(row._mapping)
+        group["count"] = int(group["count"])
+        group["size"] = int(group["size"])
+        groups.append(group)
+
+    return {
+        "count": sum(group["count"] for group in groups),
+        "size": sum(group["size"] for group in groups),
+        "groups": groups if group_columns else [],
     }
-    return tk.get_action("files_file_search")({"ignore_auth": True}, data_dict)
 
 
 @validate(schema.transfer_ownership)
@@ -616,10 +1221,12 @@ def files_transfer_ownership(
 
     cache = utils.ContextCache(context)
 
-    fileobj = cache.get_model("file", data_dict["id"], File)
+    fileobj = _active(cache.get_model("file", data_dict["id"], File, _with_owner()))
     if not fileobj:
         raise tk.ObjectNotFound("file")
 
+    before = _usage(fileobj, fileobj.owner)
+
     if owner := fileobj.owner:
         if owner.pinned and not data_dict["force"]:
             raise tk.ValidationError(
@@ -648,6 +1255,7 @@ def files_transfer_ownership(
         sess.add(owner)
 
     owner.pinned = data_dict["pin"]
+    _track_usage(sess, before, _usage(fileobj, owner))
 
     # without expiration SQLAlchemy fails to synchronize owner value during
     # transfer of unowned files
@@ -655,9 +1263,227 @@ def files_transfer_ownership(
     if not context.get("defer_commit"):
         sess.commit()
 
+    search_index.safe_index(fileobj)
+
     return fileobj.dictize(context.get("include_plugin_data", False))
 
 
+def _lock_transferred(sess: Any, data_dict: dict[str, Any], by_owner: bool) -> list[tuple[Any, Any]]:
+    """Select files for transfer and lock them together with their owners.
+
+    Owners are on the nullable side of the outer join, so they are locked by
+    a separate statement, which also returns their latest state.
+    """
+    conditions: list[Any] = []
+    if "ids" in data_dict:
+        conditions.append(query.in_clause(File.__table__.c["id"], data_dict["ids"]))
+
+    if by_owner:
+        conditions.extend(
+            [
+                Owner.owner_type == data_dict["source_owner_type"],
+                Owner.owner_id == data_dict["source_owner_id"],
+            ]
+        )
+
+    files = sess.execute(
+        sa.select(File.id, File.storage, File.content_type, File.size)
+        .outerjoin(Owner, sa.and_(File.id == Owner.file_id))
+        .where(File.deleted_at.is_(None), *conditions)
+        .with_for_update(of=File.__table__)
+    ).all()
+    if not files:
+        return []
+
+    owners = {
+        owner.file_id: owner
+        for owner in sess.execute(
+            sa.select(Owner.file_id, Owner.owner_type, Owner.owner_id, Owner.pinned)
+            .where(query.in_clause(Owner.__table__.c["file_id"], [file.id for file in files]))
+            .with_for_update()
+        )
+    }
+    rows = [(file, owners.get(file.id)) for file in files]
+
+    if by_owner:
+        # owner could change before the lock was acquired
+        source = (data_dict["source_owner_type"], data_dict["source_owner_id"])
+        rows = [(file, owner) for file, owner in rows if owner and (owner.owner_type, owner.owner_id) == source]
+
+    return rows
+
+
+def _transfer_changes(
+    rows: list[tuple[Any, Any]],
+    target: tuple[str, str],
+    actor: str,
+) -> tuple[list[dict[str, Any]], dict[tuple[str, str, str, str], list[int]]]:
+    """Compute history records and usage deltas of transferred files."""
+    history: list[dict[str, Any]] = []
+    usage: dict[tuple[str, str, str, str], list[int]] = defaultdict(lambda: [0, 0])
+    for file, owner in rows:
+        source = (owner.owner_type, owner.owner_id) if owner else ("", "")
+        if source == target:
+            continue
+
+        if owner:
+            history.append({"file_id": file.id, "owner_type": source[0], "owner_id": source[1], "actor": actor})
+
+        family = StorageUsage.family_of(file.content_type or "")
+        before = usage[(file.storage, *source, family)]
+        after = usage[(file.storage, *target, family)]
+        before[0] -= 1
+        before[1] -= file.size or 0
+        after[0] += 1
+        after[1] += file.size or 0
+
+    return history, usage
+
+
+def _set_owners(sess: Any, owned: list[str], unowned: list[str], values: dict[str, Any]):
+    """Change owners of owned files and add owners to unowned files."""
+    if owned:
+        sess.execute(
+            sa.update(Owner.__table__).where(query.in_clause(Owner.__table__.c["file_id"], owned)).values(**values)
+        )
+
+    if unowned:
+        sess.execute(sa.insert(Owner.__table__), [{"file_id": file_id, **values} for file_id in unowned])
+
+
+@validate(schema.transfer_ownership_many)
+def files_transfer_ownership_many(
+    context: Context,
+    data_dict: dict[str, Any],
+) -> dict[str, Any]:
+    """Transfer ownership of multiple files.
+
+    Files are selected by IDs or by the current owner. When both are
+    specified, only listed files of the given owner are transferred. Number of
+    SQL statements does not depend on the number of files: history records
+    are added by a single multi-row INSERT and owners are changed by a single
+    UPDATE. Selected files and their owners are locked until the end of the
+    transaction, so that files cannot be pinned after the check of pinned
+    files.
+
+    ```sh
+    $ ckanapi action files_transfer_ownership_many \
+        source_owner_type=organization source_owner_id=old-org \
+        owner_type=organization owner_id=new-org force=true
+    ```
+
+    Args:
+        ids (list[str], optional): IDs of files
+        source_owner_id (str, optional): ID of the current owner
+        source_owner_type (str, optional): type of the current owner
+        owner_id (str): ID of the new owner
+        owner_type (str): type of the new owner
+        force (bool): move files even if they are pinned. Default: `False`
+        pin (bool): pin files after transfer to stop future transfers. Default: `False`
+
+    Returns:
+        dictionary with number of transferred files and `errors` for listed files that were not found
+    """
+    by_owner = "source_owner_type" in data_dict and "source_owner_id" in data_dict
+    if "ids" not in data_dict and not by_owner:
+        raise tk.ValidationError({"ids": ["Either ids or source owner must be specified"]})
+
+    tk.check_access("files_transfer_ownership_many", context, data_dict)
+    sess = context["session"]
+    target = (data_dict["owner_type"], data_dict["owner_id"])
+
+    rows = _lock_transferred(sess, data_dict, by_owner)
+    found = {file.id for file, _owner in rows}
+    errors = {file_id: "Not found" for file_id in data_dict.get("ids", []) if file_id not in found}
+
+    if not data_dict["force"]:
+        pinned = [
+            file.id for file, owner in rows if owner and owner.pinned and (owner.owner_type, owner.owner_id) != target
+        ]
+        if pinned:
+            raise tk.ValidationError(
+                {"force": [f"Must be enabled to transfer pinned files: {', '.join(pinned[:10])}"]},
+            )
+
+    history, usage = _transfer_changes(rows, target, context["user"])
+    if history:
+        sess.execute(sa.insert(TransferHistory), history)
+
+    _set_owners(
+        sess,
+        [file.id for file, owner in rows if owner],
+        [file.id for file, owner in rows if not owner],
+        {"owner_type": target[0], "owner_id": target[1], "pinned": data_dict["pin"]},
+    )
+
+    for key, (count, size) in usage.items():
+        if count or size:
+            sess.execute(StorageUsage.change(*key, count, size))
+
+    # owners were modified bypassing ORM
+    sess.expire_all()
+    if not context.get("defer_commit"):
+        sess.commit()
+
+    search_index.safe_index_many(found)
+
+    return {"count": len(rows), "errors": errors}
+
+
+@tk.side_effect_free
+@validate(schema.file_history)
+def files_file_history(context: Context, data_dict: dict[str, Any]) -> dict[str, Any]:
+    """Show ownership history of the file.
+
+    Records are sorted from the most recent transfer to the oldest one. Every
+    record contains details of the owner that had the file before the
+    transfer. Pass an empty `cursor` with the first request and then pass
+    `next_cursor` from the previous response, until `next_cursor` is `null`.
+
+    ```sh
+    ckanapi action files_file_history id=226056e2-6f83-47c5-8bd2-102e2b82ab9a rows=100
+    ```
+
+    Args:
+        id (str): ID of the file
+        rows (int): number of records to return. Default: `10`
+        cursor (str): opaque position returned as `next_cursor` by the previous request
+
+    Returns:
+        dictionary with `results` and `next_cursor`
+    """
+    context = replica.route(context)
+    tk.check_access("files_file_history", context, data_dict)
+    sess = context["session"]
+
+    cache = utils.ContextCache(context)
+    fileobj = _active(cache.get_model("file", data_dict["id"], File))
+    if not fileobj:
+        raise tk.ObjectNotFound("file")
+
+    table: Any = TransferHistory.__table__
+    keys = [("at", "desc"), ("id", "desc")]
+    stmt = (
+        sa.select(TransferHistory)
+        .where(TransferHistory.file_id == fileobj.id)
+        .order_by(TransferHistory.at.desc(), TransferHistory.id.desc())
+    )
+    if cursor := data_dict.get("cursor"):
+        stmt = stmt.where(_keyset_filter(keys, _decode_cursor(cursor, keys), table.c))
+
+    rows = data_dict["rows"]
+    records = sess.scalars(stmt.limit(rows)).all()
+
+    next_cursor = None
+    if records and len(records) == rows:
+        next_cursor = _encode_cursor(keys, [records[-1].at, records[-1].id])
+
+    return {
+        "results": [record.dictize(context) for record in records],
+        "next_cursor": next_cursor,
+    }
+
+
 @validate(schema.file_pin)
 def files_file_pin(context: Context, data_dict: dict[str, Any]) -> dict[str, Any]:
     """Pin file to the current owner.
@@ -676,7 +1502,7 @@ def files_file_pin(context: Context, data_dict: dict[str, Any]) -> dict[str, Any
     sess = context["session"]
 
     cache = utils.ContextCache(context)
-    fileobj = cache.get_model("file", data_dict["id"], File)
+    fileobj = _active(cache.get_model("file", data_dict["id"], File, _with_owner()))
     if not fileobj:
         raise tk.ObjectNotFound("file")
 
@@ -710,7 +1536,7 @@ def files_file_unpin(context: Context, data_dict: dict[str, Any]) -> dict[str, A
     sess = context["session"]
 
     cache = utils.ContextCache(context)
-    fileobj = cache.get_model("file", data_dict["id"], File)
+    fileobj = _active(cache.get_model("file", data_dict["id"], File, _with_owner()))
     if not fileobj:
         raise tk.ObjectNotFound("file")
 
@@ -790,7 +1616,7 @@ def files_file_replace(context: Context, data_dict: dict[str, Any]) -> dict[str,
 
     cache = utils.ContextCache(context)
 
-    fileobj = cache.get_model("file", data_dict["id"], File)
+    fileobj = _active(cache.get_model("file", data_dict["id"], File, _with_owner()))
     if not fileobj:
         raise tk.ObjectNotFound("file")
 
@@ -824,13 +1650,17 @@ def files_file_replace(context: Context, data_dict: dict[str, Any]) -> dict[str,
         old_data = shared.FileData.from_object(fileobj)
         shared.add_task(lambda result, idx, prev: storage.remove(old_data))
 
+    before = _usage(fileobj, fileobj.owner)
     storage_data.into_object(fileobj)
     sess = context["session"]
+    _track_usage(sess, before, _usage(fileobj, fileobj.owner))
     if not context.get("defer_commit"):
         sess.commit()
 
     utils.ContextCache(context).set("file", fileobj.id, fileobj)
 
+    search_index.safe_index(fileobj)
+
     return fileobj.dictize(context.get("include_plugin_data", False))
 
 
@@ -904,10 +1734,13 @@ def files_multipart_start(
 
     sess = context["session"]
     sess.add(fileobj)
-    _set_user_owner(context, fileobj.id)
+    owner = _set_user_owner(context, fileobj.id)
+    _track_usage(sess, None, _usage(fileobj, owner))
     sess.commit()
 
     utils.ContextCache(context).set("file", fileobj.id, fileobj)
+    search_index.safe_index(fileobj)
+
     return fileobj.dictize(context.get("include_plugin_data", False))
 
 
@@ -933,11 +1766,7 @@ def files_multipart_refresh(
     tk.check_access("files_multipart_refresh", context, data_dict)
 
     cache = utils.ContextCache(context)
-    fileobj = cache.get_model(
-        "file",
-        data_dict["id"],
-        File,
-    )
+    fileobj = _active(cache.get_model("file", data_dict["id"], File, _with_owner()))
     if not fileobj:
         raise tk.ObjectNotFound("file")
 
@@ -978,11 +1807,7 @@ def files_multipart_update(
     extras = data_dict.get("__extras", {})
 
     cache = utils.ContextCache(context)
-    fileobj = cache.get_model(
-        "file",
-        data_dict["id"],
-        File,
-    )
+    fileobj = _active(cache.get_model("file", data_dict["id"], File, _with_owner()))
     if not fileobj:
         raise tk.ObjectNotFound("upload")
 
@@ -1035,11 +1860,12 @@ def files_multipart_complete(
     extras = data_dict.get("__extras", {})
 
     cache = utils.ContextCache(context)
-    multipart = cache.get_model("file", data_dict["id"], File)
+    multipart = _active(cache.get_model("file", data_dict["id"], File, _with_owner()))
     if not multipart:
         raise tk.ObjectNotFound("upload")
 
     storage = shared.get_storage(multipart.storage)
+    before = _usage(multipart, multipart.owner)
 
     try:
         storage.multipart_complete(
@@ -1049,6 +1875,9 @@ def files_multipart_complete(
     except shared.exc.UploadError as err:
         raise tk.ValidationError({"upload": [str(err)]}) from err
 
+    _track_usage(sess, before, _usage(multipart, multipart.owner))
     sess.commit()
 
+    search_index.safe_index(multipart)
+
     return multipart.dictize(context.get("include_plugin_data", False))
@@ -2,6 +2,9 @@ from __future__ import annotations
 
 from typing import Any, cast
 
+import sqlalchemy as sa
+from sqlalchemy.orm import contains_eager, joinedload
+
 import ckan.plugins as p
 import ckan.plugins.toolkit as tk
 from ckan import authz, model
@@ -82,7 +85,37 @@ def _get_user(context: Context) -> model.User | None:
 
 def _get_file(context: Context, file_id: str) -> shared.File | None:
     cache = utils.ContextCache(context)
-    return cache.get_model("file", file_id, shared.File)
+    return cache.get_model("file", file_id, shared.File, [joinedload(shared.File.owner)])
+
+
+def _preload_files(context: Context, ids: list[str]):
+    """Load files with a single query, so that permission checks take them from cache."""
+    if not ids:
+        return
+
+    cache = utils.ContextCache(context)
+    stmt = sa.select(shared.File).where(shared.File.id.in_(ids)).options(joinedload(shared.File.owner))
+    found = {file.id: file for file in cache.session.scalars(stmt)}
+    for file_id in ids:
+        # missing files are cached as well to avoid a query per ID
+        cache.set("file", file_id, found.get(file_id))
+
+
+def _preload_owned_files(context: Context, owner_type: str, owner_id: str) -> list[str]:
+    """Load files of the owner with a single query and return their IDs."""
+    cache = utils.ContextCache(context)
+    stmt = (
+        sa.select(shared.File)
+        .join(shared.Owner, shared.File.id == shared.Owner.file_id)
+        .where(shared.Owner.owner_type == owner_type, shared.Owner.owner_id == owner_id)
+        .options(contains_eager(shared.File.owner))
+    )
+    ids: list[str] = []
+    for file in cache.session.scalars(stmt):
+        cache.set("file", file.id, file)
+        ids.append(file.id)
+
+    return ids
 
 
 # Permissions #################################################################
@@ -218,18 +251,51 @@ def files_file_delete(context: Context, data_dict: dict[str, Any]) -> AuthResult
     return authz.is_authorized("files_permission_delete_file", context, data_dict)
 
 
+@tk.auth_allow_anonymous_access
+def files_file_delete_many(context: Context, data_dict: dict[str, Any]) -> AuthResult:
+    """User must be allowed to remove every file."""
+    if authz.is_authorized_boolean("files_permission_manage_files", context, data_dict):
+        return {"success": True}
+
+    ids: list[str] = data_dict["ids"]
+    _preload_files(context, ids)
+    for file_id in ids:
+        if not authz.is_authorized_boolean("files_permission_delete_file", context, {"id": file_id}):
+            return {"success": False, "msg": f"Not allowed to delete file {file_id}"}
+
+    return {"success": True}
+
+
 @tk.auth_allow_anonymous_access
 def files_file_show(context: Context, data_dict: dict[str, Any]) -> AuthResult:
     """Only owner can view files."""
     return authz.is_authorized("files_permission_read_file", context, data_dict)
 
 
+@tk.auth_allow_anonymous_access
+def files_file_history(context: Context, data_dict: dict[str, Any]) -> AuthResult:
+    """Only owner can view ownership history of the file."""
+    return authz.is_authorized("files_permission_read_file", context, data_dict)
+
+
 @tk.auth_allow_anonymous_access
 def files_file_rename(context: Context, data_dict: dict[str, Any]) -> AuthResult:
     """Only owner can rename files."""
     return authz.is_authorized("files_permission_edit_file", context, data_dict)
 
 
+@tk.auth_allow_anonymous_access
+def files_file_patch_data(context: Context, data_dict: dict[str, Any]) -> AuthResult:
+    """Only file manager can modify data of files."""
+    return authz.is_authorized("files_permission_manage_files", context, data_dict)
+
+
+@tk.auth_allow_anonymous_access
+def files_file_patch_data_many(context: Context, data_dict: dict[str, Any]) -> AuthResult:
+    """Only file manager can modify data of files."""
+    return authz.is_authorized("files_permission_manage_files", context, data_dict)
+
+
 @tk.auth_allow_anonymous_access
 def files_file_pin(context: Context, data_dict: dict[str, Any]) -> AuthResult:
     return authz.is_authorized("files_permission_edit_file", context, data_dict)
@@ -262,6 +328,42 @@ def files_transfer_ownership(context: Context, data_dict: dict[str, Any]) -> Aut
     return {"success": result, "msg": "Not allowed to edit file"}
 
 
+def files_transfer_ownership_many(context: Context, data_dict: dict[str, Any]) -> AuthResult:
+    """File manager can transfer any files.
+
+    Other users pass the same checks as in `files_transfer_ownership` for
+    every transferred file: they must be allowed to edit the file and to
+    transfer files to the new owner. The new owner is checked once, no matter
+    how many files are transferred. Missing files are reported by the action.
+    """
+    if authz.is_authorized_boolean("files_permission_manage_files", context, data_dict):
+        return {"success": True}
+
+    msg = "Not allowed to transfer files"
+    if not _owner_allows(context, data_dict["owner_type"], data_dict["owner_id"], "file_transfer"):
+        return {"success": False, "msg": msg}
+
+    ids: list[str] | None = data_dict.get("ids")
+    if ids is None:
+        ids = _preload_owned_files(
+            context,
+            data_dict.get("source_owner_type", ""),
+            data_dict.get("source_owner_id", ""),
+        )
+    else:
+        _preload_files(context, ids)
+
+    for file_id in dict.fromkeys(ids):
+        file = _get_file(context, file_id)
+        if not file or file.is_deleted:
+            continue
+
+        if not authz.is_authorized_boolean("files_permission_edit_file", context, {"id": file_id}):
+            return {"success": False, "msg": msg}
+
+    return {"success": True}
+
+
 @tk.auth_allow_anonymous_access
 def files_file_scan(context: Context, data_dict: dict[str, Any]) -> AuthResult:
     """Only file owner can list files."""
@@ -277,6 +379,21 @@ def files_file_scan(context: Context, data_dict: dict[str, Any]) -> AuthResult:
     return {"success": result, "msg": "Not allowed to list files"}
 
 
+@tk.auth_allow_anonymous_access
+def files_storage_stats(context: Context, data_dict: dict[str, Any]) -> AuthResult:
+    """File managers can see any stats, owners can see stats of their files."""
+    result = authz.is_authorized_boolean("files_permission_manage_files", context, data_dict)
+    if not result and data_dict.get("owner_type") and data_dict.get("owner_id"):
+        result = _owner_allows(
+            context,
+            data_dict["owner_type"],
+            data_dict["owner_id"],
+            "file_scan",
+        )
+
+    return {"success": result, "msg": "Not allowed to see storage stats"}
+
+
 # not included into CKAN ######################################################
 
 
@@ -0,0 +1,406 @@
+"""Compilation of search filters into SQL.
+
+Filters use the format accepted by `files_file_search`. The same functions
+are used by API actions and by export of file records.
+
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from datetime import datetime, timezone
+from functools import partial
+from typing import TYPE_CHECKING, Any
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy.types import UserDefinedType
+
+import ckan.plugins.toolkit as tk
+from ckan import model
+
+from ckanext.files.model import compact
+from ckanext.files.shared import File, Owner
+
+if TYPE_CHECKING:
+    from sqlalchemy.sql.elements import ColumnElement
+    from sqlalchemy.sql.schema import Column
+
+
+def process_filters(  # noqa: C901
+    filters: dict[str, Any], columns: Mapping[str, Column[Any]]
+) -> ColumnElement[bool]:
+    """Transform `{"$and":[{"field":{"$eq":"value"}}]}` filters into SQL filters."""
+    items = []
+
+    for k, v in filters.items():
+        if k in ["$and", "$or"]:
+            if not isinstance(v, list):
+                raise tk.ValidationError({"filters": [f"Only lists are allowed inside {k}"]})
+            nested_items = [
+                process_filters(sub_filters, columns)
+                for sub_filters in v  # pyright: ignore[reportUnknownVariableType]
+                if isinstance(sub_filters, dict)
+            ]
+            if len(nested_items) > 1:
+                wrapper = sa.and_ if k == "$and" else sa.or_
+                items.append(wrapper(*nested_items).self_group())
+            else:
+                items.extend(nested_items)
+
+        elif k in ["storage_data", "plugin_data"]:
+            items.extend(_process_data(columns[k], v))
+
+        elif k in columns:
+            items.extend(_process_field(columns[k], v))
+
+        else:
+            raise tk.ValidationError({"filters": [f"Unknown filter: {k}"]})
+
+    if len(items) == 1:
+        return items[0]  # pyright: ignore[reportUnknownVariableType]
+
+    return sa.and_(*items).self_group()
+
+
+_op_map = {
+    "$eq": "=",
+    "$ne": "!=",
+    "$lt": "<",
+    "$lte": "<=",
+    "$gt": ">",
+    "$gte": ">=",
+    "$in": "IN",
+    "$is": "IS",
+    "$isnot": "IS NOT",
+    "$like": "LIKE",
+    "$ilike": "ILIKE",
+}
+
+
+def _process_field(col: Column[Any], value: Any):
+    """Transform `{"field":{"$eq":"value"}}` into SQL filters."""
+    if isinstance(value, list):
+        value = {"$in": value}  # pyright: ignore[reportUnknownVariableType]
+
+    elif value is None:
+        value = {"$eq": None}
+
+    elif not isinstance(value, dict):
+        value = {"$eq": value}
+
+    for operator, filter in value.items():  # pyright: ignore[reportUnknownVariableType]
+        if operator == "$search":
+            column = col
+            if not _is_text(col) and hasattr(col.type, "as_text"):
+                # compact column, e.g. storage stored as reference
+                column = _as_text(col)
+            yield _search_clause(column, filter)
+
+        elif operator == "$astext":
+            yield from _process_field(_as_text(col), filter)
+
+        elif operator == "$in":
+            items = filter if isinstance(filter, list) else [filter]  # pyright: ignore[reportUnknownVariableType]
+            yield in_clause(col, [_coerce(col, item) for item in items])  # pyright: ignore[reportUnknownVariableType]
+
+        elif operator in _op_map:
+            yield _comparison(col, operator, filter)
+
+        else:
+            raise tk.ValidationError({"filters": [f"Operator {operator} is not supported"]})
+
+
+def _comparison(col: Column[Any], operator: str, value: Any) -> ColumnElement[bool]:
+    """Compare column with the value using one of operators from `_op_map`."""
+    op = _null_op(_op_map[operator], value)
+    column: Any = col
+
+    if value is None:
+        pass
+
+    elif operator in ("$like", "$ilike"):
+        value = str(value)
+        if not _is_text(col):
+            column = _as_text(col)
+
+    else:
+        value = _coerce(col, value)
+
+    return column.bool_op(op)(value)
+
+
+def _null_op(op: str, value: Any) -> str:
+    """Replace equality operators with identity checks when value is NULL."""
+    if value is None:
+        if op == "=":
+            return "is"
+        if op == "!=":
+            return "IS NOT"
+
+    return op
+
+
+def in_clause(col: Column[Any], values: list[Any]) -> ColumnElement[bool]:
+    """Build `col = ANY(:values)` condition.
+
+    Unlike `IN (:v1, :v2, ...)`, the statement contains a single array
+    parameter, so its text does not depend on the number of values. It stays
+    short for thousands of items and can be reused from statement cache.
+    """
+    array_type = ARRAY(col.type)
+    return col == sa.any_(sa.cast(sa.literal(values, array_type), array_type))
+
+
+_true_values = frozenset(["true", "t", "yes", "y", "on", "1"])
+_false_values = frozenset(["false", "f", "no", "n", "off", "0"])
+
+
+def _coerce(col: Column[Any], value: Any) -> Any:
+    """Convert filter value into the type of the column.
+
+    Comparing the column with the value of the same type keeps indexes of the
+    column usable. Values that cannot be converted produce validation error.
+    """
+    if value is None:
+        return value
+
+    if isinstance(col.type, sa.Boolean):
+        converter = _as_bool
+    elif isinstance(col.type, sa.Integer):
+        converter = _as_int
+    elif isinstance(col.type, sa.DateTime):
+        converter = partial(_as_datetime, aware=bool(col.type.timezone))
+    elif _is_text(col):
+        converter = _as_str
+    else:
+        return value
+
+    try:
+        return converter(value)
+    except (TypeError, ValueError):
+        name = getattr(col, "key", None) or "value"
+        raise tk.ValidationError({"filters": [f"Invalid value for {name}: {value!r}"]}) from None
+
+
+def _as_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+
+    if isinstance(value, (str, int)):
+        normalized = str(value).strip().lower()
+        if normalized in _true_values:
+            return True
+        if normalized in _false_values:
+            return False
+
+    raise ValueError(value)
+
+
+def _as_int(value: Any) -> int:
+    if isinstance(value, bool):
+        raise TypeError(value)
+
+    return int(value)
+
+
+def _as_datetime(value: Any, aware: bool) -> datetime:
+    """Parse ISO 8601 date. Dates without offset are treated as UTC."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+
+    if not isinstance(value, datetime):
+        raise TypeError(value)
+
+    if aware and not value.tzinfo:
+        value = value.replace(tzinfo=timezone.utc)
+
+    return value
+
+
+def _as_str(value: Any) -> str:
+    if isinstance(value, (dict, list)):
+        raise TypeError(value)
+
+    return str(value)
+
+
+def sort_column(col: Column[Any]) -> Any:
+    """Expression used to sort rows by the column.
+
+    In compact schema storages are references to the dictionary of storages,
+    but files are still sorted by names of storages.
+    """
+    if isinstance(col.type, compact.StorageName) and not col.type.is_text:
+        return col.type.as_text(col)
+
+    return col
+
+
+def _is_text(col: Column[Any]) -> bool:
+    return getattr(col.type, "is_text", isinstance(col.type, sa.String))
+
+
+def _as_text(col: Column[Any]) -> Any:
+    """Textual representation of the column."""
+    if as_text := getattr(col.type, "as_text", None):
+        return as_text(col)
+
+    return sa.cast(col, sa.Text)
+
+
+_trigram_available: bool | None = None
+
+
+def _has_trigram() -> bool:
+    """Check if pg_trgm extension is installed."""
+    global _trigram_available  # noqa: PLW0603
+    if _trigram_available is None:
+        stmt = sa.text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        _trigram_available = bool(model.Session.scalar(stmt))
+
+    return _trigram_available
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _search_clause(col: Column[Any], value: Any) -> ColumnElement[bool]:
+    """Build condition for `$search` operator.
+
+    Column matches when it contains the value as a substring or, if pg_trgm
+    is available, when it's similar to the value. Both conditions are served
+    by trigram index.
+    """
+    if not isinstance(value, str) or not _is_text(col):
+        raise tk.ValidationError({"filters": ["$search requires a string and text field"]})
+
+    substring = col.ilike(f"%{_escape_like(value)}%", escape="\\")
+    if not _has_trigram():
+        return substring
+
+    return sa.or_(substring, col.bool_op("%")(value)).self_group()
+
+
+def search_ranks(filters: dict[str, Any], columns: Mapping[str, Column[Any]]) -> list[ColumnElement[Any]]:
+    """Collect similarity expressions of `$search` filters for ordering."""
+    if not _has_trigram():
+        return []
+
+    ranks: list[ColumnElement[Any]] = []
+    for k, v in filters.items():
+        if k in ["$and", "$or"] and isinstance(v, list):
+            for sub_filters in v:  # pyright: ignore[reportUnknownVariableType]
+                if isinstance(sub_filters, dict):
+                    ranks.extend(search_ranks(sub_filters, columns))  # pyright: ignore[reportUnknownArgumentType]
+
+        elif k in columns and isinstance(v, dict) and isinstance(v.get("$search"), str):
+            ranks.append(sa.func.similarity(columns[k], v["$search"]))
+
+    return ranks
+
+
+class _JsonPath(UserDefinedType):  # pyright: ignore[reportMissingTypeArgument]
+    """PostgreSQL jsonpath type."""
+
+    cache_ok = True
+
+    def get_col_spec(self, **kw: Any) -> str:
+        return "jsonpath"
+
+
+def _json_path(path: tuple[str, ...]) -> str:
+    """Build jsonpath expression that points to the nested key."""
+    return "$" + "".join('."{}"'.format(key.replace("\\", "\\\\").replace('"', '\\"')) for key in path)
+
+
+def _nest(path: tuple[str, ...], value: Any) -> Any:
+    """Wrap value into dictionaries with keys from path."""
+    for key in reversed(path):
+        value = {key: value}
+    return value
+
+
+def _process_data(  # pyright: ignore[reportUnknownParameterType]
+    col: ColumnElement[Any],
+    value: Any,
+    path: tuple[str, ...] = (),
+):
+    """Transform file/plugin data filters into SQL JSONB filters.
+
+    Filters that can be served by GIN index on data column are compiled into
+    containment(`@>`) and jsonpath existence(`@?`) checks against the whole
+    column:
+
+    * plain number or boolean, i.e. `{"key": 1}`, becomes `col @> '{"key":
+      1}'`. It matches only values of the same JSON type: `1` does not match
+      `"1"`. Plain strings compare text representation of the value, the
+      same way as explicit `$eq`, so `"1"` matches both `"1"` and `1`.
+    * `{"key": {"$contains": ["a"]}}` becomes `col @> '{"key": ["a"]}'`
+    * `{"key": {"$has_key": "nested"}}` becomes `col @? '$."key"."nested"'`
+
+    Other operators compare extracted value and require full scan.
+    """
+    if not isinstance(value, dict):
+        if path and isinstance(value, (bool, int, float)):
+            yield col.bool_op("@>")(sa.cast(_nest(path, value), JSONB))
+            return
+
+        value = {"$eq": value}
+
+    for k, v in value.items():  # pyright: ignore[reportUnknownVariableType]
+        if k == "$contains":
+            yield col.bool_op("@>")(sa.cast(_nest(path, v), JSONB))
+
+        elif k == "$has_key":
+            if not isinstance(v, str):
+                raise tk.ValidationError({"filters": ["$has_key requires a string"]})
+            yield col.bool_op("@?")(sa.cast(_json_path((*path, v)), _JsonPath()))
+
+        elif k in _op_map:
+            yield _data_comparison(col, path, k, v)
+
+        else:
+            yield from _process_data(col, v, (*path, k))
+
+
+def _data_comparison(col: ColumnElement[Any], path: tuple[str, ...], operator: str, value: Any) -> ColumnElement[bool]:
+    """Compare nested value of data column, casting it to the type of value."""
+    field: Any = col
+    for key in path:
+        field = field[key]
+
+    if isinstance(value, bool):
+        field = sa.cast(field, sa.Boolean)
+
+    elif isinstance(value, int):
+        field = sa.cast(field, sa.Integer)
+
+    elif isinstance(value, float):
+        field = sa.cast(field, sa.Float)
+
+    else:
+        field = field.astext
+
+    return field.bool_op(_null_op(_op_map[operator], value))(value)
+
+
+def projection(fields: list[str], include_plugin_data: bool) -> dict[str, ColumnElement[Any]]:
+    """Map requested fields to selected expressions."""
+    available: dict[str, ColumnElement[Any]] = {
+        name: col for name, col in File.__table__.c.items() if include_plugin_data or name != "plugin_data"
+    }
+    available.update(
+        owner_id=Owner.__table__.c.owner_id,
+        owner_type=Owner.__table__.c.owner_type,
+        pinned=sa.func.coalesce(Owner.__table__.c.pinned, sa.false()),
+    )
+
+    result: dict[str, ColumnElement[Any]] = {}
+    for field in fields:
+        if field not in available:
+            raise tk.ValidationError({"fields": [f"Invalid field: {field}"]})
+        result[field] = available[field]
+
+    return result
@@ -36,17 +36,31 @@ def file_register(
 
 
 @validator_args
-def file_search(
+def file_search(  # noqa: PLR0913
     default: ValidatorFactory,
     int_validator: Validator,
     dict_only: Validator,
     convert_to_json_if_string: Validator,
+    ignore_missing: Validator,
+    unicode_safe: Validator,
+    one_of: ValidatorFactory,
+    natural_number_validator: Validator,
+    json_or_string: Validator,
+    convert_to_list_if_string: Validator,
+    list_of_strings: Validator,
 ) -> Schema:
     return {
         "start": [default(0), int_validator],
         "rows": [default(10), int_validator],
         "sort": [default("name")],
         "filters": [default("{}"), convert_to_json_if_string, dict_only],
+        "cursor": [ignore_missing, unicode_safe],
+        "count": [default("exact"), one_of(["exact", "none", "estimate", "capped"])],
+        "count_cap": [default(1000), natural_number_validator],
+        "fields": [ignore_missing, json_or_string, convert_to_list_if_string, list_of_strings],
+        "backend": [default("db"), one_of(["db", "index"])],
+        "facets": [default("[]"), json_or_string, convert_to_list_if_string, list_of_strings],
+        "facet_limit": [default(50), natural_number_validator],
     }
 
 
@@ -55,6 +69,16 @@ def file_delete(not_empty: Validator, unicode_safe: Validator) -> Schema:
     return {"id": [not_empty, unicode_safe]}
 
 
+@validator_args
+def file_delete_many(
+    not_empty: Validator,
+    json_or_string: Validator,
+    convert_to_list_if_string: Validator,
+    list_of_strings: Validator,
+) -> Schema:
+    return {"ids": [not_empty, json_or_string, convert_to_list_if_string, list_of_strings]}
+
+
 @validator_args
 def file_show(not_empty: Validator, unicode_safe: Validator) -> Schema:
     return {"id": [not_empty, unicode_safe]}
@@ -65,6 +89,62 @@ def file_rename(not_empty: Validator, unicode_safe: Validator) -> Schema:
     return {"id": [not_empty, unicode_safe], "name": [not_empty, unicode_safe]}
 
 
+@validator_args
+def file_patch_data(  # noqa: PLR0913
+    not_empty: Validator,
+    not_missing: Validator,
+    unicode_safe: Validator,
+    default: ValidatorFactory,
+    one_of: ValidatorFactory,
+    dict_only: Validator,
+    convert_to_json_if_string: Validator,
+    json_or_string: Validator,
+    convert_to_list_if_string: Validator,
+    list_of_strings: Validator,
+) -> Schema:
+    return {
+        "id": [not_empty, unicode_safe],
+        "patch": [not_missing, convert_to_json_if_string, dict_only],
+        "path": [default("[]"), json_or_string, convert_to_list_if_string, list_of_strings],
+        "prop": [default("plugin_data"), one_of(["plugin_data", "storage_data"])],
+    }
+
+
+@validator_args
+def file_patch_data_many(  # noqa: PLR0913
+    not_empty: Validator,
+    not_missing: Validator,
+    default: ValidatorFactory,
+    one_of: ValidatorFactory,
+    dict_only: Validator,
+    convert_to_json_if_string: Validator,
+    json_or_string: Validator,
+    convert_to_list_if_string: Validator,
+    list_of_strings: Validator,
+) -> Schema:
+    return {
+        "ids": [not_empty, json_or_string, convert_to_list_if_string, list_of_strings],
+        "patch": [not_missing, convert_to_json_if_string, dict_only],
+        "path": [default("[]"), json_or_string, convert_to_list_if_string, list_of_strings],
+        "prop": [default("plugin_data"), one_of(["plugin_data", "storage_data"])],
+    }
+
+
+@validator_args
+def file_history(
+    not_empty: Validator,
+    unicode_safe: Validator,
+    default: ValidatorFactory,
+    natural_number_validator: Validator,
+    ignore_missing: Validator,
+) -> Schema:
+    return {
+        "id": [not_empty, unicode_safe],
+        "rows": [default(10), natural_number_validator],
+        "cursor": [ignore_missing, unicode_safe],
+    }
+
+
 @validator_args
 def transfer_ownership(
     not_empty: Validator,
@@ -82,13 +162,47 @@ def transfer_ownership(
 
 
 @validator_args
-def file_scan(default: ValidatorFactory, unicode_only: Validator, ignore_missing: Validator) -> Schema:
+def transfer_ownership_many(  # noqa: PLR0913
+    not_empty: Validator,
+    boolean_validator: Validator,
+    default: ValidatorFactory,
+    unicode_safe: Validator,
+    ignore_missing: Validator,
+    json_or_string: Validator,
+    convert_to_list_if_string: Validator,
+    list_of_strings: Validator,
+) -> Schema:
+    return {
+        "ids": [ignore_missing, json_or_string, convert_to_list_if_string, list_of_strings],
+        "source_owner_id": [ignore_missing, unicode_safe],
+        "source_owner_type": [ignore_missing, unicode_safe],
+        "owner_id": [not_empty, unicode_safe],
+        "owner_type": [not_empty, unicode_safe],
+        "force": [default(False), boolean_validator],
+        "pin": [default(False), boolean_validator],
+    }
+
+
+@validator_args
+def file_scan(
+    default: ValidatorFactory,
+    unicode_only: Validator,
+    ignore_missing: Validator,
+    convert_to_json_if_string: Validator,
+    dict_only: Validator,
+    one_of: ValidatorFactory,
+) -> Schema:
     return {
         "owner_id": [default(""), unicode_only],
         "owner_type": [default("user"), unicode_only],
+        "filters": [default("{}"), convert_to_json_if_string, dict_only],
         "start": [ignore_missing],
         "rows": [ignore_missing],
         "sort": [ignore_missing],
+        "cursor": [ignore_missing],
+        "count": [ignore_missing, one_of(["exact", "none", "estimate", "capped", "summary"])],
+        "count_cap": [ignore_missing],
+        "fields": [ignore_missing],
     }
 
 
@@ -194,3 +308,21 @@ def multipart_complete(not_empty: Validator, unicode_safe: Validator, boolean_va
         "keep_storage_data": [boolean_validator],
         "keep_plugin_data": [boolean_validator],
     }
+
+
+@validator_args
+def storage_stats(  # noqa: PLR0913
+    ignore_missing: Validator,
+    unicode_safe: Validator,
+    default: ValidatorFactory,
+    json_or_string: Validator,
+    convert_to_list_if_string: Validator,
+    list_of_strings: Validator,
+) -> Schema:
+    return {
+        "storage": [ignore_missing, unicode_safe],
+        "owner_type": [ignore_missing, unicode_safe],
+        "owner_id": [ignore_missing, unicode_safe],
+        "family": [ignore_missing, unicode_safe],
+        "group_by": [default("[]"), json_or_string, convert_to_list_if_string, list_of_strings],
+    }
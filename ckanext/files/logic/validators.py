@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import logging
+import re
 from typing import Any, Literal, cast
 
 import file_keeper as fk
@@ -13,6 +14,17 @@ from ckanext.files import shared, task, utils
 
 log = logging.getLogger(__name__)
 
+RE_DATA_URL = re.compile(r"^data:[^,]*;base64,")
+
+
+def _get_file(sess: Any, file_id: str) -> shared.File | None:
+    """Get file by ID, treating soft-deleted files as missing."""
+    file = sess.get(shared.File, file_id)
+    if file and file.is_deleted:
+        return None
+
+    return file
+
 
 def files_cascade_options(value: Any) -> dict[str, set[str]]:
     if isinstance(value, str):
@@ -92,7 +104,7 @@ def files_file_into_public_url(
     result = []
     sess = context["session"]
     for file_id in ids:
-        file = sess.get(shared.File, file_id)
+        file = _get_file(sess, file_id)
         if not file:
             msg = "File does not exist"
             errors[key].append(msg)
@@ -116,9 +128,21 @@ def files_into_upload(
     errors: FlattenErrorDict,
     context: Context,
 ):
-    """Convert value into Upload object."""
+    """Convert value into Upload object.
+
+    Big binary payloads and base64-encoded data URLs are moved into temporary
+    files to keep memory usage flat. Any other string, even if it starts with
+    `data:`, is kept as a raw content of the file.
+    """
+    value = data[key]
     try:
-        data[key] = fk.make_upload(data[key])
+        if isinstance(value, str) and RE_DATA_URL.match(value):
+            value = utils.decode_data_url(value)
+
+        elif isinstance(value, bytes) and len(value) > shared.config.spool_threshold():
+            value = utils.spool_bytes(value)
+
+        data[key] = fk.make_upload(value)
 
     except TypeError as err:
         msg = f"Unsupported source type: {err}"
@@ -163,7 +187,7 @@ def files_file_id_exists(
 
     sess = context["session"]
     for file_id in ids:
-        file = sess.get(shared.File, file_id)
+        file = _get_file(sess, file_id)
         if not file:
             msg = "File does not exist"
             errors[key].append(msg)
@@ -189,7 +213,7 @@ def files_content_type_from_file(file_field: str, if_empty: bool = False):
             return
         file_id = file_id.rsplit("/", 1)[-1]
         sess = context["session"]
-        file = sess.get(shared.File, file_id)
+        file = _get_file(sess, file_id)
 
         if file:
             data[key] = file.content_type
@@ -211,7 +235,7 @@ def files_accept_file_with_type(*supported_types: str):
         ids = value if isinstance(value, list) else [value]
         sess = context["session"]
         for file_id in ids:
-            file = sess.get(shared.File, file_id)
+            file = _get_file(sess, file_id)
             if not file:
                 msg = "File does not exist"
                 errors[key].append(msg)
@@ -243,7 +267,7 @@ def files_accept_file_with_storage(*supported_storages: str):
         sess = context["session"]
 
         for file_id in ids:
-            file = sess.get(shared.File, file_id)
+            file = _get_file(sess, file_id)
             if not file:
                 msg = "File does not exist"
                 errors[key].append(msg)
@@ -301,7 +325,7 @@ def files_transfer_ownership(owner_type: str, id_field: str | list[str] = "id"):
         sess = context["session"]
 
         for file_id in ids:
-            file = sess.get(shared.File, file_id)
+            file = _get_file(sess, file_id)
             if not file or not file.owner:
                 errors[key].append(msg)
                 raise tk.StopOnError
@@ -370,7 +394,7 @@ def files_copy_attribute(attribute: str, destination: str):
         value = data[key]
         sess = context["session"]
 
-        file = sess.get(shared.File, value)
+        file = _get_file(sess, value)
         if not file or not hasattr(file, attribute):
             return
 
@@ -397,7 +421,7 @@ def files_validate_with_storage(storage_name: str):
 
 
 # unstable
-def files_upload_as(  # noqa: PLR0913
+def files_upload_as(  # noqa: PLR0913, PLR0917
     storage: str,
     owner_type: str,
     id_field: str,
@@ -0,0 +1,299 @@
+"""WSGI middleware of the extension.
+
+`UploadGate` rejects uploads that will be refused by the storage anyway before
+the request body is parsed. Without it, werkzeug spools the whole multipart
+body to disk before the action has a chance to check the file.
+
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import logging
+import re
+import tempfile
+from collections.abc import Iterable
+from typing import Any, Callable
+from urllib.parse import parse_qsl
+
+import magic
+import sqlalchemy as sa
+from file_keeper.default import SAMPLE_SIZE
+
+from ckan import model
+
+from ckanext.files import config, shared, utils
+
+log = logging.getLogger(__name__)
+
+# Content-Length includes multipart boundaries, headers of the parts and
+# additional fields. Requests are rejected only when they exceed the limit
+# significantly and the exact size of the file is verified by the storage.
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Amount of data read from the request body while looking for the file part.
+PEEK_SIZE = 16 * 1024
+
+# parts of multipart upload do not start with the file's signature
+UNSNIFFABLE_ROUTES = frozenset(["files_multipart_update"])
+
+RE_ACTION = re.compile(r"^/api/(?:\d+/)?action/(?P<action>[^/]+)/?$")
+RE_FILENAME = re.compile(rb"""content-disposition:[^\r\n]*\bfilename\*?=""", re.IGNORECASE)
+
+WSGIApp = Callable[[dict[str, Any], Callable[..., Any]], Iterable[bytes]]
+
+
+class ReplayStream(io.RawIOBase):
+    """Stream that returns already consumed bytes before the rest of input."""
+
+    def __init__(self, head: bytes, tail: Any):
+        self.head = head
+        self.tail = tail
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        size = len(buffer)
+        if self.head:
+            chunk, self.head = self.head[:size], self.head[size:]
+        else:
+            chunk = self.tail.read(size)
+
+        buffer[: len(chunk)] = chunk
+        return len(chunk)
+
+
+class UploadGate:
+    """Check size and type of the upload before reading request body.
+
+    Size is checked using Content-Length header. Content type is detected from
+    the first bytes of the file part of multipart request. Both checks are
+    compared with restrictions of the target storage. Storage of new files is
+    sent inside the request body, so they are checked against the most
+    permissive restrictions among configured storages, unless the storage is
+    fixed by the route. Replacements go into the storage of the existing file
+    when its ID is in the query string. Otherwise, the most permissive
+    restrictions are used as well.
+    """
+
+    def __init__(self, app: WSGIApp):
+        self.app = app
+
+    def __call__(self, environ: dict[str, Any], start_response: Callable[..., Any]) -> Iterable[bytes]:
+        rejection = self.check(environ)
+        if rejection:
+            return _reject(environ, start_response, *rejection)
+
+        return self.app(environ, start_response)
+
+    def check(self, environ: dict[str, Any]) -> tuple[str, str] | None:
+        """Check the request and return status and reason of rejection.
+
+        Returns:
+            status and error message if upload must be rejected
+        """
+        route = _route(environ.get("PATH_INFO", "")) if environ.get("REQUEST_METHOD") == "POST" else None
+        storages = _storages(route, environ) if route else []
+        if not storages:
+            return None
+
+        try:
+            length = int(environ.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            return None
+
+        max_size = _max_size(storages)
+        if max_size >= 0 and length > max_size + MULTIPART_OVERHEAD:
+            return "413 Request Entity Too Large", str(shared.exc.LargeUploadError(length, max_size))
+
+        content_type = environ.get("CONTENT_TYPE", "")
+        if (
+            length
+            and route not in UNSNIFFABLE_ROUTES
+            and content_type.startswith("multipart/form-data")
+            and _restricts_types(storages)
+        ):
+            head = _read(environ["wsgi.input"], min(length, PEEK_SIZE))
+            environ["wsgi.input"] = io.BufferedReader(ReplayStream(head, environ["wsgi.input"]))
+
+            sample = _file_sample(head)
+            if sample:
+                mime = magic.from_buffer(sample, True)
+                if not any(_supports_type(storage, mime) for storage in storages):
+                    return "415 Unsupported Media Type", str(shared.exc.WrongUploadTypeError(mime))
+
+        return None
+
+
+def spooling_request(base: type[Any]) -> type[Any]:
+    """Extend request class with configurable spooling of uploaded files.
+
+    By default, werkzeug keeps small files in memory and moves the rest into
+    anonymous temporary files. Produced class uses
+    `ckanext.files.upload.spool_threshold` and `ckanext.files.upload.spool_dir`
+    instead.
+    """
+
+    class SpoolingRequest(base):
+        def _get_file_stream(
+            self,
+            total_content_length: int | None,
+            content_type: str | None,
+            filename: str | None = None,
+            content_length: int | None = None,
+        ) -> Any:
+            return tempfile.SpooledTemporaryFile(config.spool_threshold(), dir=config.spool_dir())
+
+    return SpoolingRequest
+
+
+def _route(path: str) -> str | None:
+    """Identify upload route."""
+    if path.rstrip("/") == "/admin-panel/files_manager/upload":
+        return "files_manager.upload"
+
+    if match := RE_ACTION.match(path):
+        return match["action"]
+
+    return None
+
+
+def _storages(route: str, environ: dict[str, Any]) -> list[shared.Storage]:
+    """Collect storages that may receive the upload."""
+    query = dict(parse_qsl(environ.get("QUERY_STRING", "")))
+    name: str | None = None
+    if route == "files_resource_upload":
+        name = config.resources_storage()
+
+    elif route == "group_image_upload":
+        name = config.group_images_storage()
+
+    elif route == "user_image_upload":
+        name = config.user_images_storage()
+
+    elif route == "files_manager.upload":
+        name = config.default_storage()
+
+    elif route == "files_file_create":
+        # action reads the storage from the body, which is not parsed yet
+        return _all_storages()
+
+    elif route in ("files_file_replace", "files_multipart_update"):
+        # content is uploaded into the storage of existing file. When ID of
+        # the file is sent inside the body, the storage is unknown.
+        name = _file_storage(query["id"]) if query.get("id") else None
+        if not name:
+            return _all_storages()
+
+    else:
+        return []
+
+    storage = _get_storage(name)
+    return [storage] if storage else []
+
+
+def _all_storages() -> list[shared.Storage]:
+    return [storage for storage_name in config.storages() if (storage := _get_storage(storage_name))]
+
+
+def _file_storage(file_id: str) -> str | None:
+    """Get storage of the existing file.
+
+    Separate connection is used, so that the session of the request is not
+    affected.
+    """
+    engine = model.meta.engine
+    if engine is None:
+        return None
+
+    with engine.connect() as conn:
+        return conn.scalar(sa.select(shared.File.storage).where(shared.File.id == file_id))
+
+
+def _get_storage(name: str | None) -> shared.Storage | None:
+    if not name:
+        return None
+
+    try:
+        storage = shared.get_storage(name)
+    except shared.exc.UnknownStorageError:
+        return None
+
+    return storage if isinstance(storage, shared.Storage) else None
+
+
+def _max_size(storages: list[shared.Storage]) -> int:
+    """Return the most permissive size restriction."""
+    sizes = [storage.settings.max_size for storage in storages]
+    if any(size < 0 for size in sizes):
+        return -1
+
+    return max(sizes)
+
+
+def _restricts_types(storages: list[shared.Storage]) -> bool:
+    return all(storage.settings.supported_types for storage in storages)
+
+
+def _supports_type(storage: shared.Storage, content_type: str) -> bool:
+    supported = storage.settings.supported_types
+    return not supported or utils.is_supported_type(content_type, supported)
+
+
+def _read(stream: Any, size: int) -> bytes:
+    """Read exactly `size` bytes unless stream is exhausted."""
+    chunks: list[bytes] = []
+    while size > 0:
+        chunk = stream.read(size)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size -= len(chunk)
+
+    return b"".join(chunks)
+
+
+def _file_sample(head: bytes) -> bytes | None:
+    """Extract beginning of the file from multipart body."""
+    match = RE_FILENAME.search(head)
+    if not match:
+        return None
+
+    start = head.find(b"\r\n\r\n", match.end())
+    if start < 0:
+        return None
+
+    return head[start + 4 : start + 4 + SAMPLE_SIZE]
+
+
+def _reject(
+    environ: dict[str, Any],
+    start_response: Callable[..., Any],
+    status: str,
+    error: str,
+) -> Iterable[bytes]:
+    log.debug("Upload to %s rejected: %s", environ.get("PATH_INFO"), error)
+
+    if environ.get("PATH_INFO", "").startswith("/api/"):
+        body = json.dumps(
+            {
+                "success": False,
+                "error": {"__type": "Validation Error", "upload": [error]},
+            },
+        ).encode()
+        content_type = "application/json;charset=utf-8"
+    else:
+        body = error.encode()
+        content_type = "text/plain;charset=utf-8"
+
+    start_response(
+        status,
+        [
+            ("Content-Type", content_type),
+            ("Content-Length", str(len(body))),
+            ("Connection", "close"),
+        ],
+    )
+    return [body]
@@ -0,0 +1,37 @@
+"""Add GIN indexes on storage_data and plugin_data.
+
+Revision ID: 15c3b5191405
+Revises: b4b6ff46cd13
+Create Date: 2026-10-19 09:12:31.248017
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "15c3b5191405"
+down_revision = "b4b6ff46cd13"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "idx_files_file_storage_data",
+        "files_file",
+        ["storage_data"],
+        postgresql_using="gin",
+        postgresql_ops={"storage_data": "jsonb_path_ops"},
+    )
+    op.create_index(
+        "idx_files_file_plugin_data",
+        "files_file",
+        ["plugin_data"],
+        postgresql_using="gin",
+        postgresql_ops={"plugin_data": "jsonb_path_ops"},
+    )
+
+
+def downgrade():
+    op.drop_index("idx_files_file_plugin_data", "files_file")
+    op.drop_index("idx_files_file_storage_data", "files_file")
@@ -0,0 +1,56 @@
+"""Add trigram index on file name.
+
+Index requires pg_trgm extension. If extension is not installed and cannot be
+created by the current DB user, migration does nothing and search falls back
+to the full scan. Alembic does not re-apply migrations, so in this case the
+extension and the index must be created manually.
+
+Revision ID: c73dda2c2cdd
+Revises: 15c3b5191405
+Create Date: 2026-10-19 10:41:07.503118
+
+"""
+
+import logging
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.exc import DBAPIError
+
+# revision identifiers, used by Alembic.
+revision = "c73dda2c2cdd"
+down_revision = "15c3b5191405"
+branch_labels = None
+depends_on = None
+
+log = logging.getLogger(__name__)
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    installed = bind.scalar(sa.text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"))
+    if not installed:
+        try:
+            with bind.begin_nested():
+                bind.execute(sa.text("CREATE EXTENSION pg_trgm"))
+        except DBAPIError:
+            log.warning(
+                "pg_trgm extension cannot be created. Trigram index on files_file.name is not added. "
+                "To enable it, run as DB superuser: %s; %s",
+                "CREATE EXTENSION pg_trgm",
+                "CREATE INDEX idx_files_file_name_trgm ON files_file USING gin (name gin_trgm_ops)",
+            )
+            return
+
+    op.create_index(
+        "idx_files_file_name_trgm",
+        "files_file",
+        ["name"],
+        postgresql_using="gin",
+        postgresql_ops={"name": "gin_trgm_ops"},
+    )
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS idx_files_file_name_trgm")
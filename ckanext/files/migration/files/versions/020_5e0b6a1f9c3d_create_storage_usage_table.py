@@ -0,0 +1,48 @@
+"""Create storage usage table.
+
+Revision ID: 5e0b6a1f9c3d
+Revises: c73dda2c2cdd
+Create Date: 2026-10-19 14:05:12.512093
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5e0b6a1f9c3d"
+down_revision = "c73dda2c2cdd"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "files_storage_usage",
+        sa.Column("storage", sa.Text, primary_key=True),
+        sa.Column("owner_type", sa.Text, primary_key=True),
+        sa.Column("owner_id", sa.Text, primary_key=True),
+        sa.Column("family", sa.Text, primary_key=True),
+        sa.Column("count", sa.BIGINT(), nullable=False, server_default="0"),
+        sa.Column("size", sa.BIGINT(), nullable=False, server_default="0"),
+    )
+
+    op.execute(
+        """
+        INSERT INTO files_storage_usage (storage, owner_type, owner_id, family, count, size)
+        SELECT
+            f.storage,
+            COALESCE(o.owner_type, ''),
+            COALESCE(o.owner_id, ''),
+            COALESCE(NULLIF(split_part(f.content_type, '/', 1), ''), 'application') AS family,
+            count(*),
+            COALESCE(sum(f.size), 0)
+        FROM files_file f
+        LEFT JOIN files_owner o ON o.file_id = f.id
+        GROUP BY 1, 2, 3, 4
+        """
+    )
+
+
+def downgrade():
+    op.drop_table("files_storage_usage")
@@ -0,0 +1,82 @@
+"""Add file_created to owner table.
+
+Revision ID: 8b2f4d6e1a07
+Revises: 5e0b6a1f9c3d
+Create Date: 2026-10-19 16:41:03.118274
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "8b2f4d6e1a07"
+down_revision = "5e0b6a1f9c3d"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("files_owner", sa.Column("file_created", sa.DateTime(timezone=True)))
+    op.execute(
+        """
+        UPDATE files_owner o SET file_created = f.created
+        FROM files_file f WHERE f.id = o.file_id
+        """
+    )
+    op.alter_column("files_owner", "file_created", nullable=False)
+
+    # copy creation date of the file whenever owner is created or moved to
+    # a different file
+    op.execute(
+        """
+        CREATE FUNCTION files_owner_copy_file_created() RETURNS trigger AS $$
+        BEGIN
+            SELECT created INTO NEW.file_created FROM files_file WHERE id = NEW.file_id;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER files_owner_copy_file_created
+        BEFORE INSERT OR UPDATE OF file_id ON files_owner
+        FOR EACH ROW EXECUTE PROCEDURE files_owner_copy_file_created()
+        """
+    )
+
+    # keep the copy in sync when creation date of the file changes
+    op.execute(
+        """
+        CREATE FUNCTION files_file_sync_owner_created() RETURNS trigger AS $$
+        BEGIN
+            UPDATE files_owner SET file_created = NEW.created WHERE file_id = NEW.id;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER files_file_sync_owner_created
+        AFTER UPDATE OF created ON files_file
+        FOR EACH ROW WHEN (OLD.created IS DISTINCT FROM NEW.created)
+        EXECUTE PROCEDURE files_file_sync_owner_created()
+        """
+    )
+
+    op.create_index(
+        "idx_files_owner_listing",
+        "files_owner",
+        ["owner_type", "owner_id", "file_created", "file_id"],
+    )
+
+
+def downgrade():
+    op.drop_index("idx_files_owner_listing", "files_owner")
+    op.execute("DROP TRIGGER IF EXISTS files_file_sync_owner_created ON files_file")
+    op.execute("DROP FUNCTION IF EXISTS files_file_sync_owner_created()")
+    op.execute("DROP TRIGGER IF EXISTS files_owner_copy_file_created ON files_owner")
+    op.execute("DROP FUNCTION IF EXISTS files_owner_copy_file_created()")
+    op.drop_column("files_owner", "file_created")
@@ -0,0 +1,31 @@
+"""Add deleted_at to file.
+
+Revision ID: 3d9a7c5e2b14
+Revises: 8b2f4d6e1a07
+Create Date: 2026-10-19 16:42:37.204518
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3d9a7c5e2b14"
+down_revision = "8b2f4d6e1a07"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("files_file", sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=True))
+    op.create_index(
+        "idx_files_file_deleted_at",
+        "files_file",
+        ["deleted_at", "id"],
+        postgresql_where=sa.text("deleted_at IS NOT NULL"),
+    )
+
+
+def downgrade():
+    op.drop_index("idx_files_file_deleted_at", "files_file")
+    op.drop_column("files_file", "deleted_at")
@@ -0,0 +1,28 @@
+"""Create storage dictionary.
+
+Revision ID: 9c4e1b7d2f60
+Revises: 3d9a7c5e2b14
+Create Date: 2026-10-19 18:05:11.318245
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9c4e1b7d2f60"
+down_revision = "3d9a7c5e2b14"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "files_storage",
+        sa.Column("id", sa.SmallInteger, sa.Identity(), primary_key=True),
+        sa.Column("name", sa.Text, nullable=False, unique=True),
+    )
+
+
+def downgrade():
+    op.drop_table("files_storage")
@@ -0,0 +1,33 @@
+"""Add transfer history indexes.
+
+Revision ID: 5e8a3f1c7b92
+Revises: 9c4e1b7d2f60
+Create Date: 2026-10-19 18:27:40.512963
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5e8a3f1c7b92"
+down_revision = "9c4e1b7d2f60"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "idx_files_transfer_history_file_at",
+        "files_transfer_history",
+        ["file_id", "at"],
+    )
+    op.create_index(
+        "idx_files_transfer_history_at",
+        "files_transfer_history",
+        ["at", "id"],
+    )
+
+
+def downgrade():
+    op.drop_index("idx_files_transfer_history_at", "files_transfer_history")
+    op.drop_index("idx_files_transfer_history_file_at", "files_transfer_history")
@@ -7,5 +7,6 @@ except ImportError:
     from .owner import FilesOwner as Owner
     from .transfer_history import TransferHistory
 
+from .usage import StorageUsage
 
-__all__ = ["File", "Owner", "TransferHistory"]
+__all__ = ["File", "Owner", "StorageUsage", "TransferHistory"]
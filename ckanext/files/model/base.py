@@ -1,6 +1,11 @@
 from __future__ import annotations
 
+import operator
+from collections.abc import Callable, Collection
 from datetime import datetime, timezone
+from typing import Any
+
+import sqlalchemy as sa
 
 import ckan.plugins.toolkit as tk
 
@@ -9,3 +14,70 @@ Base = tk.BaseModel
 
 def now():
     return datetime.now(timezone.utc)
+
+
+def copy_json(value: Any) -> Any:
+    """Copy JSON-compatible value.
+
+    Unlike `copy.deepcopy`, only dictionaries and lists are copied and there
+    is no bookkeeping of visited objects. Everything else inside JSON is
+    immutable and returned as-is.
+    """
+    if isinstance(value, dict):
+        return {k: copy_json(v) for k, v in value.items()}  # pyright: ignore[reportUnknownVariableType]
+
+    if isinstance(value, list):
+        return [copy_json(v) for v in value]  # pyright: ignore[reportUnknownVariableType]
+
+    return value
+
+
+def make_dictizer(table: sa.Table, exclude: Collection[str] = ()) -> Callable[[Any], dict[str, Any]]:
+    """Build function that transforms model instance into dictionary.
+
+    Produces the same result as CKAN's `table_dictize`, but the list of
+    columns and conversion of every column are resolved once, when
+    dictizer is created. Dates are transformed into ISO strings and JSON
+    values are copied, so that modifications of the result do not affect
+    the model.
+
+    Args:
+        table: table of the model
+        exclude: names of columns omitted from the result
+    """
+    columns = [col for col in table.c if col.name not in exclude]
+    names = tuple(col.name for col in columns)
+    getter = operator.attrgetter(*names)
+
+    converters: list[tuple[str, Callable[[Any], Any]]] = []
+    for col in columns:
+        if isinstance(col.type, sa.DateTime):
+            converters.append((col.name, datetime.isoformat))
+
+        elif isinstance(col.type, sa.JSON):
+            converters.append((col.name, copy_json))
+
+        elif not isinstance(col.type, (sa.String, sa.Integer, sa.Boolean)):
+            converters.append((col.name, _as_text))
+
+    def dictize(obj: Any) -> dict[str, Any]:
+        result = dict(zip(names, getter(obj)))
+        for name, convert in converters:
+            value = result[name]
+            if value is not None:
+                result[name] = convert(value)
+
+        return result
+
+    return dictize
+
+
+def _as_text(value: Any) -> Any:
+    """Stringify value in the same way as `table_dictize`."""
+    if isinstance(value, (dict, list, int)):
+        return value
+
+    if isinstance(value, datetime):
+        return value.isoformat()
+
+    return str(value)
@@ -0,0 +1,394 @@
+"""Compact representation of file identifiers and storage names.
+
+By default, IDs of files and names of storages are stored as text. Large
+portals can convert the schema into compact form via `ckan files maintain
+compact-schema`:
+
+* `files_file.id`, `files_owner.file_id` and `files_transfer_history.file_id`
+  become native `uuid` columns(16 bytes instead of 37);
+* `files_file.storage` becomes `smallint` reference to the `files_storage`
+  dictionary.
+
+Models declare these columns using types from this module. The types follow
+the actual state of the schema, which is detected when the plugin is
+configured, so Python code always works with string IDs and storage names and
+the public API does not depend on the form of the schema.
+
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import threading
+from collections.abc import Iterable
+from typing import Any
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID, insert
+
+from ckan import model
+
+from .base import Base
+
+log = logging.getLogger(__name__)
+
+RE_UUID = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+# the lowest UUID. Used instead of empty string, which is the lowest text ID
+# used as a starting point of keyset pagination.
+NIL_UUID = "00000000-0000-0000-0000-000000000000"
+
+storage_table = sa.Table(
+    "files_storage",
+    Base.metadata,
+    sa.Column("id", sa.SmallInteger, sa.Identity(), primary_key=True),
+    sa.Column("name", sa.Text, nullable=False, unique=True),
+)
+
+
+class _State:
+    native_uuid: bool = False
+    storage_dictionary: bool = False
+    storage_ids: dict[str, int]
+    storage_names: dict[int, str]
+
+    def __init__(self):
+        self.storage_ids = {}
+        self.storage_names = {}
+        self.lock = threading.Lock()
+
+
+state = _State()
+
+
+class FileId(sa.types.TypeDecorator):
+    """ID of the file stored either as text or as native UUID.
+
+    When native UUIDs are used, values that are not valid UUIDs match
+    nothing, the same way as unknown IDs.
+    """
+
+    impl = sa.Text
+    cache_ok = True
+
+    @property
+    def _static_cache_key(self) -> Any:  # pyright: ignore[reportIncompatibleVariableOverride]
+        # statements compiled for one form of the schema are not reused for
+        # another
+        return (*super()._static_cache_key, state.native_uuid)
+
+    @property
+    def is_text(self) -> bool:
+        return not state.native_uuid
+
+    def load_dialect_impl(self, dialect: Any) -> Any:
+        if state.native_uuid:
+            return dialect.type_descriptor(UUID(as_uuid=False))
+
+        return dialect.type_descriptor(sa.Text())
+
+    def process_bind_param(self, value: Any, dialect: Any) -> Any:
+        if not state.native_uuid or value is None:
+            return value
+
+        if value == "":
+            return NIL_UUID
+
+        value = str(value)
+        return value if RE_UUID.match(value) else None
+
+    def process_result_value(self, value: Any, dialect: Any) -> Any:
+        # driver may return UUID objects for native columns
+        return value if value is None else str(value)
+
+    def as_text(self, column: Any) -> Any:
+        """Expression with textual representation of the column."""
+        if state.native_uuid:
+            return sa.cast(column, sa.Text)
+
+        return column
+
+
+class StorageName(sa.types.TypeDecorator):
+    """Name of the storage stored either as text or as dictionary reference."""
+
+    impl = sa.Text
+    cache_ok = True
+
+    @property
+    def _static_cache_key(self) -> Any:  # pyright: ignore[reportIncompatibleVariableOverride]
+        return (*super()._static_cache_key, state.storage_dictionary)
+
+    @property
+    def is_text(self) -> bool:
+        return not state.storage_dictionary
+
+    def load_dialect_impl(self, dialect: Any) -> Any:
+        if state.storage_dictionary:
+            return dialect.type_descriptor(sa.SmallInteger())
+
+        return dialect.type_descriptor(sa.Text())
+
+    def process_bind_param(self, value: Any, dialect: Any) -> Any:
+        if not state.storage_dictionary or value is None:
+            return value
+
+        name = str(value)
+        if name not in state.storage_ids:
+            register_configured_storage(name)
+
+        # unknown storage cannot be referenced by any file
+        return state.storage_ids.get(name)
+
+    def process_result_value(self, value: Any, dialect: Any) -> Any:
+        if not state.storage_dictionary or value is None or isinstance(value, str):
+            return value
+
+        if value not in state.storage_names:
+            # storage was registered by another process
+            load_storages()
+
+        return state.storage_names.get(value, str(value))
+
+    def as_text(self, column: Any) -> Any:
+        """Expression with the name of the storage."""
+        if state.storage_dictionary:
+            return sa.select(storage_table.c.name).where(storage_table.c.id == column).scalar_subquery()
+
+        return column
+
+
+def detect(conn: Any) -> tuple[bool, bool]:
+    """Check if IDs are native UUIDs and storages are stored in dictionary."""
+    stmt = sa.text(
+        """
+        SELECT column_name, data_type FROM information_schema.columns
+        WHERE table_schema = current_schema()
+            AND table_name = 'files_file'
+            AND column_name IN ('id', 'storage')
+        """,
+    )
+    types = dict(conn.execute(stmt).all())
+    return types.get("id") == "uuid", types.get("storage") == "smallint"
+
+
+def configure(storages: Iterable[str] = ()):
+    """Adapt column types to the current schema.
+
+    Configured storages are registered in the dictionary, so that files can
+    be uploaded into them.
+    """
+    engine = model.meta.engine
+    if engine is None:
+        return
+
+    try:
+        with engine.begin() as conn:
+            native_uuid, storage_dictionary = detect(conn)
+            if storage_dictionary:
+                register_storages(conn, storages)
+
+    except sa.exc.SQLAlchemyError:
+        log.exception("Cannot detect form of files schema")
+        return
+
+    set_mode(native_uuid, storage_dictionary)
+
+
+def set_mode(native_uuid: bool, storage_dictionary: bool):
+    """Switch column types of models.
+
+    Form of the schema is a part of the cache key of column types, so
+    statements compiled for one form are never executed against another.
+    Value processors and statements cached for the types and models of the
+    extension are dropped on switch, caches of other models are not affected.
+    """
+    if storage_dictionary:
+        load_storages()
+
+    mode = (native_uuid, storage_dictionary)
+    if mode == (state.native_uuid, state.storage_dictionary):
+        return
+
+    state.native_uuid = native_uuid
+    state.storage_dictionary = storage_dictionary
+    _reset_caches()
+
+
+def _reset_caches():
+    """Drop cached data that depends on the form of the schema."""
+    from ckanext.files import replica  # noqa: PLC0415
+
+    def is_compact(type_: Any) -> bool:
+        return isinstance(type_, (FileId, StorageName))
+
+    # dialects keep implementation and value processors of every type
+    for engine in [model.meta.engine, *replica.engines()]:
+        if engine is None:
+            continue
+
+        memos = engine.dialect._type_memos  # pyright: ignore[reportAttributeAccessIssue]
+        for type_ in [t for t in list(memos) if is_compact(t)]:
+            memos.pop(type_, None)
+
+    # mappers keep compiled INSERT/UPDATE/DELETE statements
+    for mapper in Base.registry.mappers:
+        if any(is_compact(col.type) for col in mapper.local_table.c) and (
+            cache := mapper.__dict__.get("_compiled_cache")
+        ):
+            cache.clear()
+
+
+def register_configured_storage(name: str):
+    """Add configured storage to the dictionary on the first reference.
+
+    Storage may be configured after the dictionary was filled, for example,
+    by another process. Names of storages that are not configured are not
+    registered, so that filters by arbitrary names do not grow the dictionary.
+    """
+    from ckanext.files import shared  # noqa: PLC0415
+
+    engine = model.meta.engine
+    if engine is None:
+        return
+
+    try:
+        shared.get_storage(name)
+    except shared.exc.UnknownStorageError:
+        return
+
+    with engine.begin() as conn:
+        register_storages(conn, [name])
+
+    load_storages()
+
+
+def register_storages(conn: Any, names: Iterable[str]):
+    """Add storages to the dictionary."""
+    values = [{"name": name} for name in names]
+    if values:
+        stmt = insert(storage_table).on_conflict_do_nothing(index_elements=["name"])
+        conn.execute(stmt, values)
+
+
+def load_storages():
+    """Read the dictionary of storages."""
+    engine = model.meta.engine
+    if engine is None:
+        return
+
+    with state.lock, engine.connect() as conn:
+        rows = conn.execute(sa.select(storage_table.c.id, storage_table.c.name)).all()
+        state.storage_ids = {name: id for id, name in rows}
+        state.storage_names = dict(rows)
+
+
+def upgrade(conn: Any, native_uuid: bool = True, storage_dictionary: bool = True):
+    """Convert schema into compact form.
+
+    Tables are rewritten under exclusive lock, so the portal must be stopped
+    during conversion.
+
+    Raises:
+        ValueError: some files have IDs that are not canonical UUIDs
+    """
+    current_uuid, current_dictionary = detect(conn)
+
+    if native_uuid and not current_uuid:
+        invalid = conn.scalar(
+            sa.text(
+                "SELECT count(*) FROM files_file WHERE id !~ :pattern",
+            ),
+            {"pattern": RE_UUID.pattern},
+        )
+        if invalid:
+            msg = f"{invalid} files have IDs that are not canonical UUIDs"
+            raise ValueError(msg)
+
+        _alter_ids(conn, "uuid", "{}::uuid")
+
+    if storage_dictionary and not current_dictionary:
+        conn.execute(
+            sa.text(
+                """
+                INSERT INTO files_storage (name)
+                SELECT DISTINCT storage FROM files_file
+                ON CONFLICT (name) DO NOTHING
+                """,
+            ),
+        )
+        _replace_storage_column(
+            conn,
+            "smallint",
+            "UPDATE files_file f SET storage_new = s.id FROM files_storage s WHERE s.name = f.storage",
+        )
+        conn.execute(
+            sa.text(
+                """
+                ALTER TABLE files_file ADD CONSTRAINT files_file_storage_fkey
+                FOREIGN KEY (storage) REFERENCES files_storage (id)
+                """,
+            ),
+        )
+
+
+def downgrade(conn: Any, native_uuid: bool = True, storage_dictionary: bool = True):
+    """Convert schema from compact form back into text columns."""
+    current_uuid, current_dictionary = detect(conn)
+
+    if native_uuid and current_uuid:
+        _alter_ids(conn, "text", "{}::text")
+
+    if storage_dictionary and current_dictionary:
+        _replace_storage_column(
+            conn,
+            "text",
+            "UPDATE files_file f SET storage_new = s.name FROM files_storage s WHERE s.id = f.storage",
+        )
+
+
+def _alter_ids(conn: Any, type_: str, using: str):
+    """Change type of file ID and columns that reference it."""
+    columns = [
+        ("files_file", "id"),
+        ("files_owner", "file_id"),
+        ("files_transfer_history", "file_id"),
+    ]
+    statements = [
+        "ALTER TABLE files_transfer_history DROP CONSTRAINT files_transfer_history_owner_file_id_fkey",
+        "ALTER TABLE files_owner DROP CONSTRAINT files_owner_file_id_fkey",
+        *(
+            f"ALTER TABLE {table} ALTER COLUMN {column} TYPE {type_} USING {using.format(column)}"
+            for table, column in columns
+        ),
+        """
+        ALTER TABLE files_owner ADD CONSTRAINT files_owner_file_id_fkey
+        FOREIGN KEY (file_id) REFERENCES files_file (id) ON DELETE CASCADE
+        """,
+        """
+        ALTER TABLE files_transfer_history ADD CONSTRAINT files_transfer_history_owner_file_id_fkey
+        FOREIGN KEY (file_id) REFERENCES files_owner (file_id) ON DELETE CASCADE
+        """,
+    ]
+    for stmt in statements:
+        conn.execute(sa.text(stmt))
+
+
+def _replace_storage_column(conn: Any, type_: str, fill: str):
+    """Replace storage column with the column of different type.
+
+    Storage cannot be converted in place, because conversion requires a
+    lookup in the dictionary.
+    """
+    statements = [
+        f"ALTER TABLE files_file ADD COLUMN storage_new {type_}",
+        fill,
+        "DROP INDEX idx_files_file_location_in_storage",
+        "ALTER TABLE files_file DROP COLUMN storage",
+        "ALTER TABLE files_file RENAME COLUMN storage_new TO storage",
+        "ALTER TABLE files_file ALTER COLUMN storage SET NOT NULL",
+        "CREATE UNIQUE INDEX idx_files_file_location_in_storage ON files_file (storage, location)",
+    ]
+    for stmt in statements:
+        conn.execute(sa.text(stmt))
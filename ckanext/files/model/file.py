@@ -5,13 +5,13 @@ from datetime import datetime
 from typing import Any, Literal
 
 import sqlalchemy as sa
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, array
 from sqlalchemy.orm import Mapped, relationship
 
-from ckan.lib.dictization import table_dictize
 from ckan.model.types import make_uuid
 
-from .base import Base, now
+from .base import Base, copy_json, make_dictizer, now
+from .compact import FileId, StorageName
 from .owner import FilesOwner
 
 foreign: Any
@@ -30,6 +30,12 @@ class FilesFile(Base):
         created (datetime): date of creation
         storage_data (dict[str, Any]): additional data set by storage
         plugin_data (dict[str, Any]): additional data set by plugins
+        deleted_at (datetime | None): date of soft deletion
+
+    `owner` is loaded by a separate query on the first access. Queries that
+    need owners of all the selected files must request them explicitly, via
+    `joinedload(File.owner)` or `contains_eager(File.owner)` when owner's
+    table is already joined.
 
     Example:
         ```python
@@ -47,7 +53,7 @@ class FilesFile(Base):
     __table__ = sa.Table(
         "files_file",
         Base.metadata,
-        sa.Column("id", sa.UnicodeText, primary_key=True, default=make_uuid),
+        sa.Column("id", FileId, primary_key=True, default=make_uuid),
         sa.Column("name", sa.UnicodeText, nullable=False),
         sa.Column("location", sa.Text, nullable=False),
         sa.Column(
@@ -59,7 +65,7 @@ class FilesFile(Base):
         sa.Column("size", sa.BIGINT(), nullable=False, default=0),
         sa.Column("hash", sa.Text, nullable=False, default=""),
         sa.Column("algorithm", sa.Text, nullable=False, default=""),
-        sa.Column("storage", sa.Text, nullable=False),
+        sa.Column("storage", StorageName, nullable=False),
         sa.Column(
             "created",
             sa.DateTime(timezone=True),
@@ -69,7 +75,26 @@ class FilesFile(Base):
         ),
         sa.Column("storage_data", JSONB, default=dict, server_default="{}"),
         sa.Column("plugin_data", JSONB, default=dict, server_default="{}"),
+        sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=True),
         sa.Index("idx_files_file_location_in_storage", "storage", "location", unique=True),
+        sa.Index(
+            "idx_files_file_deleted_at",
+            "deleted_at",
+            "id",
+            postgresql_where=sa.text("deleted_at IS NOT NULL"),
+        ),
+        sa.Index(
+            "idx_files_file_storage_data",
+            "storage_data",
+            postgresql_using="gin",
+            postgresql_ops={"storage_data": "jsonb_path_ops"},
+        ),
+        sa.Index(
+            "idx_files_file_plugin_data",
+            "plugin_data",
+            postgresql_using="gin",
+            postgresql_ops={"plugin_data": "jsonb_path_ops"},
+        ),
     )
 
     id: Mapped[str]
@@ -88,13 +113,15 @@ class FilesFile(Base):
     storage_data: Mapped[dict[str, Any]]
     plugin_data: Mapped[dict[str, Any]]
 
+    deleted_at: Mapped[datetime | None]
+
     owner: Mapped[FilesOwner | None] = relationship(  # type: ignore
         FilesOwner,
         back_populates="files",
         single_parent=True,
         uselist=False,
         cascade="delete, delete-orphan",
-        lazy="joined",
+        lazy="select",
     )
 
     def __init__(self, **kwargs: Any):
@@ -102,23 +129,27 @@ class FilesFile(Base):
         if not self.id:
             self.id = make_uuid()
 
+    @property
+    def is_deleted(self) -> bool:
+        """File is marked as deleted and waits for garbage collection."""
+        return self.deleted_at is not None
+
     def dictize(self, include_plugin_data: bool = False) -> dict[str, Any]:
-        result = table_dictize(self, {})
-        result["storage_data"] = copy.deepcopy(result["storage_data"])
+        result = _dictize_file(self)
 
-        if self.owner:
-            result["owner_type"] = self.owner.owner_type
-            result["owner_id"] = self.owner.owner_id
-            result["pinned"] = self.owner.pinned
+        owner = self.owner
+        if owner:
+            result["owner_type"] = owner.owner_type
+            result["owner_id"] = owner.owner_id
+            result["pinned"] = owner.pinned
 
         else:
             result["owner_type"] = None
             result["owner_id"] = None
             result["pinned"] = False
 
-        plugin_data = result.pop("plugin_data")
         if include_plugin_data:
-            result["plugin_data"] = copy.deepcopy(plugin_data)
+            result["plugin_data"] = copy_json(self.plugin_data)
 
         return result
 
@@ -128,6 +159,12 @@ class FilesFile(Base):
         dict_path: list[str] | None = None,
         prop: Literal["storage_data", "plugin_data"] = "plugin_data",
     ) -> dict[str, Any]:
+        """Merge patch into data of the object.
+
+        The whole data is written back on commit, so concurrent patches may
+        overwrite each other. Use `patch_data_statement` to patch data
+        atomically.
+        """
         data: dict[str, Any] = copy.deepcopy(getattr(self, prop))
 
         target: Any = data
@@ -142,9 +179,80 @@ class FilesFile(Base):
         setattr(self, prop, data)
         return data
 
+    @classmethod
+    def patch_data_statement(
+        cls,
+        patch: dict[str, Any],
+        dict_path: list[str] | None = None,
+        prop: Literal["storage_data", "plugin_data"] = "plugin_data",
+    ) -> Any:
+        """Build UPDATE statement that applies patch on DB side.
+
+        This is an atomic alternative of `patch_data`. Patch is merged into
+        the object located at `dict_path` via `jsonb_set` and `||`, so
+        concurrent patches of different keys do not overwrite each other and
+        unmodified parts of data are not sent over the network. Missing
+        objects on the path are created. Files that have non-object value on
+        the path are not modified.
+
+        Statement has no filters by file. Add them via `where` before the
+        execution.
+
+        Args:
+            patch: keys added to the target object
+            dict_path: path to the target object
+            prop: patched column
+
+        Returns:
+            UPDATE statement that returns IDs of patched files
+        """
+        table: Any = cls.__table__
+        column = table.c[prop]
+        path = dict_path or []
+
+        value: Any = sa.func.coalesce(column, _jsonb({}))
+        for idx in range(1, len(path)):
+            # create missing intermediate objects
+            value = sa.func.jsonb_set(
+                value,
+                _path(path[:idx]),
+                sa.func.coalesce(_extract(column, path[:idx]), _jsonb({})),
+            )
+
+        if path:
+            value = sa.func.jsonb_set(
+                value,
+                _path(path),
+                sa.func.coalesce(_extract(column, path), _jsonb({})).op("||")(_jsonb(patch)),
+            )
+        else:
+            value = value.op("||")(_jsonb(patch))
+
+        guards = [
+            sa.func.coalesce(sa.func.jsonb_typeof(_extract(column, path[:idx])), "object") == "object"
+            for idx in range(1, len(path) + 1)
+        ]
+
+        return sa.update(table).where(*guards).values({prop: value}).returning(table.c.id)
+
     @classmethod
     def by_location(cls, location: str, storage: str):
         return sa.select(cls).where(
             cls.location == location,
             cls.storage == storage,
         )
+
+
+_dictize_file = make_dictizer(FilesFile.__table__, exclude=["plugin_data"])
+
+
+def _jsonb(value: Any) -> Any:
+    return sa.cast(sa.literal(value, JSONB), JSONB)
+
+
+def _path(path: list[str]) -> Any:
+    return sa.cast(array(path, type_=sa.Text), ARRAY(sa.Text))
+
+
+def _extract(column: Any, path: list[str]) -> Any:
+    return sa.func.jsonb_extract_path(column, *path, type_=JSONB)
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
+from datetime import datetime
+
 import sqlalchemy as sa
 from sqlalchemy.orm import Mapped, relationship
 
-from ckan.lib.dictization import table_dictize
 from ckan.model.vocabulary import TYPE_CHECKING
 from ckan.types import Context
 
@@ -11,7 +12,8 @@ if TYPE_CHECKING:
     from .file import FilesFile
 
 
-from .base import Base
+from .base import Base, make_dictizer
+from .compact import FileId
 
 
 class FilesOwner(Base):
@@ -23,6 +25,10 @@ class FilesOwner(Base):
         owner_type (str): Type of the owner
         pinned (bool): is ownership protected from transfer
 
+    `file_created` is a copy of the file's creation date, maintained by DB
+    trigger. Together with `idx_files_owner_listing` it allows listing the
+    newest files of the owner without sorting all of them.
+
     Example:
         ```python
         owner = Owner(
@@ -36,11 +42,19 @@ class FilesOwner(Base):
     __table__ = sa.Table(
         "files_owner",
         Base.metadata,
-        sa.Column("file_id", sa.Text, primary_key=True),
+        sa.Column("file_id", FileId, primary_key=True),
         sa.Column("owner_id", sa.Text, nullable=False),
         sa.Column("owner_type", sa.Text, nullable=False),
         sa.Column("pinned", sa.Boolean, default=False, nullable=False),
+        sa.Column(
+            "file_created",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.FetchedValue(),
+            server_onupdate=sa.FetchedValue(),
+        ),
         sa.Index("idx_file_owner_owner", "owner_type", "owner_id", unique=False),
+        sa.Index("idx_files_owner_listing", "owner_type", "owner_id", "file_created", "file_id"),
         sa.ForeignKeyConstraint(
             ["file_id"],
             ["files_file.id"],
@@ -52,14 +66,18 @@ class FilesOwner(Base):
     owner_id: Mapped[str]
     owner_type: Mapped[str]
     pinned: Mapped[bool]
+    file_created: Mapped[datetime]
 
     files: Mapped[list[FilesFile]] = relationship("FilesFile", back_populates="owner")
 
     def dictize(self, context: Context):
-        return table_dictize(self, context)
+        return _dictize_owner(self)
 
     def select_history(self):
-        """Returns a select statement to fetch ownership history."""
+        """Returns a select statement to fetch ownership history.
+
+        Records are sorted from the most recent to the oldest.
+        """
         from .transfer_history import TransferHistory  # noqa: PLC0415
 
         return (
@@ -68,4 +86,8 @@ class FilesOwner(Base):
             .where(
                 TransferHistory.file_id == self.file_id,
             )
+            .order_by(TransferHistory.at.desc(), TransferHistory.id.desc())
         )
+
+
+_dictize_owner = make_dictizer(FilesOwner.__table__)
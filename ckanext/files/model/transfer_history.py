@@ -10,6 +10,7 @@ from ckan.model.types import make_uuid
 from ckan.types import Context
 
 from .base import Base, now
+from .compact import FileId
 from .owner import FilesOwner
 
 
@@ -37,7 +38,7 @@ class TransferHistory(Base):
         "files_transfer_history",
         Base.metadata,
         sa.Column("id", sa.Text, primary_key=True, default=make_uuid),
-        sa.Column("file_id", sa.Text, nullable=False),
+        sa.Column("file_id", FileId, nullable=False),
         sa.Column("owner_id", sa.Text, nullable=False),
         sa.Column("owner_type", sa.Text, nullable=False),
         sa.Column(
@@ -54,6 +55,8 @@ class TransferHistory(Base):
             "files_transfer_history_owner_file_id_fkey",
             ondelete="CASCADE",
         ),
+        sa.Index("idx_files_transfer_history_file_at", "file_id", "at"),
+        sa.Index("idx_files_transfer_history_at", "at", "id"),
     )
     id: Mapped[str]
     file_id: Mapped[str]
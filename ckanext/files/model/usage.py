@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+from typing import Any
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Mapped
+
+from . import compact
+from .base import Base
+
+
+class StorageUsage(Base):
+    """Summary of storage usage.
+
+    Every row contains number and total size of files that share storage,
+    owner and family of content type(`image`, `text`, etc.). Unowned files
+    have empty `owner_type` and `owner_id`.
+
+    The table is updated together with files by API actions and can be
+    recomputed from scratch via `rebuild`.
+
+    Keyword Args:
+        storage (str): name of the storage
+        owner_type (str): type of the owner
+        owner_id (str): ID of the owner
+        family (str): major part of MIMEtype
+        count (int): number of files
+        size (int): total size of files
+    """
+
+    __table__ = sa.Table(
+        "files_storage_usage",
+        Base.metadata,
+        sa.Column("storage", sa.Text, primary_key=True),
+        sa.Column("owner_type", sa.Text, primary_key=True),
+        sa.Column("owner_id", sa.Text, primary_key=True),
+        sa.Column("family", sa.Text, primary_key=True),
+        sa.Column("count", sa.BIGINT(), nullable=False, default=0),
+        sa.Column("size", sa.BIGINT(), nullable=False, default=0),
+    )
+
+    storage: Mapped[str]
+    owner_type: Mapped[str]
+    owner_id: Mapped[str]
+    family: Mapped[str]
+    count: Mapped[int]
+    size: Mapped[int]
+
+    @staticmethod
+    def family_of(content_type: str) -> str:
+        """Extract family from MIMEtype."""
+        return content_type.split("/", 1)[0] or "application"
+
+    @classmethod
+    def change(  # noqa: PLR0913, PLR0917
+        cls,
+        storage: str,
+        owner_type: str,
+        owner_id: str,
+        family: str,
+        count: int,
+        size: int,
+    ) -> Any:
+        """Build statement that adds delta to the counters of the group."""
+        stmt = insert(cls.__table__).values(
+            storage=storage,
+            owner_type=owner_type,
+            owner_id=owner_id,
+            family=family,
+            count=count,
+            size=size,
+        )
+        return stmt.on_conflict_do_update(
+            index_elements=["storage", "owner_type", "owner_id", "family"],
+            set_={
+                "count": cls.__table__.c["count"] + stmt.excluded["count"],
+                "size": cls.__table__.c["size"] + stmt.excluded["size"],
+            },
+        )
+
+    @classmethod
+    def rebuild(cls, file_table: sa.Table, owner_table: sa.Table) -> list[Any]:
+        """Build statements that recompute the whole table from files."""
+        family = sa.func.coalesce(
+            sa.func.nullif(sa.func.split_part(file_table.c.content_type, "/", 1), ""),
+            "application",
+        )
+        storage: Any = file_table.c.storage
+        source_table = file_table.outerjoin(owner_table, owner_table.c.file_id == file_table.c.id)
+        if compact.state.storage_dictionary:
+            storage = compact.storage_table.c.name
+            source_table = source_table.join(compact.storage_table, compact.storage_table.c.id == file_table.c.storage)
+
+        owner_type = sa.func.coalesce(owner_table.c.owner_type, "")
+        owner_id = sa.func.coalesce(owner_table.c.owner_id, "")
+
+        source = (
+            sa.select(
+                storage,
+                owner_type,
+                owner_id,
+                family,
+                sa.func.count(),
+                sa.func.coalesce(sa.func.sum(file_table.c.size), 0),
+            )
+            .select_from(source_table)
+            .where(file_table.c.deleted_at.is_(None))
+            .group_by(storage, owner_type, owner_id, family)
+        )
+
+        return [
+            sa.delete(cls.__table__),
+            sa.insert(cls.__table__).from_select(
+                ["storage", "owner_type", "owner_id", "family", "count", "size"],
+                source,
+            ),
+        ]
@@ -13,7 +13,9 @@ import ckan.plugins.toolkit as tk
 from ckan.exceptions import CkanConfigurationException
 from ckan.logic import clear_validators_cache
 
-from . import base, config, shared, storage
+from . import base, config, replica, shared, storage
+from .middleware import UploadGate, spooling_request
+from .model import compact
 
 
 @tk.blanket.helpers
@@ -28,10 +30,24 @@ class FilesPlugin(p.SingletonPlugin):
     p.implements(shared.IFiles, inherit=True)
 
     p.implements(p.IConfigDeclaration)
+    p.implements(p.IMiddleware, inherit=True)
 
     def declare_config_options(self, declaration: shared.types.Declaration, key: shared.types.Key):
         if tk.check_ckan_version("2.12"):
             declaration.declare_bool("ckanext.files.enable_resource_migration_template_patch")
+            declaration.declare_bool("ckanext.files.early_upload_validation", True)
+            declaration.declare("ckanext.files.upload.spool_threshold", "1MiB").append_validators(
+                "files_parse_filesize"
+            )
+            declaration.declare("ckanext.files.upload.spool_dir")
+            declaration.declare("ckanext.files.derivatives.storage")
+            declaration.declare_list("ckanext.files.derivatives.presets", ["thumbnail:64x64", "preview:320x320"])
+            declaration.declare_int("ckanext.files.derivatives.workers", 2)
+            declaration.declare_int("ckanext.files.derivatives.max_age", 31536000)
+            declaration.declare_bool("ckanext.files.search_index.enabled")
+            declaration.declare_bool("ckanext.files.soft_delete")
+            declaration.declare("ckanext.files.replica.url")
+            declaration.declare_int("ckanext.files.replica.pin_duration", 5)
             return
 
         # this call allows using custom validators in config declarations
@@ -106,11 +122,29 @@ class FilesPlugin(p.SingletonPlugin):
 
         return adapters
 
+    # IMiddleware
+    def make_middleware(self, app: Any, config_: Any):
+        app.request_class = spooling_request(app.request_class)
+        app.teardown_request(replica.remove)
+
+        if config.early_upload_validation():
+            app.wsgi_app = UploadGate(app.wsgi_app)
+        return app
+
     # IConfigurable
     def configure(self, config_: Any):
         if not tk.check_ckan_version("2.12"):
             _initialize_storages()
 
+        if replica.is_enabled():
+            replica.install()
+        else:
+            replica.uninstall()
+
+        # compact columns are available only for models of the extension
+        if isinstance(shared.File.__table__.c["id"].type, compact.FileId):
+            compact.configure(config.storages())
+
     # IConfigurer
     def update_config(self, config_: Any):
         tk.add_template_directory(config_, "templates")
@@ -0,0 +1,174 @@
+"""Routing of read-only queries to the DB replica.
+
+When `ckanext.files.replica.url` is set, read-only actions and views get a
+session bound to the replica instead of the primary `model.Session`. Writes
+always go to the primary.
+
+Replica lags behind the primary, so the user who just modified something
+would not see the change when reading from the replica. To avoid it, every
+commit that contains writes pins the current user session(cookie-based CKAN
+session) to the primary for `ckanext.files.replica.pin_duration` seconds.
+Reads are also kept on the primary when the current transaction contains
+uncommitted writes and outside of web requests(CLI commands, background
+jobs).
+
+Read-your-writes relies on the CKAN session cookie. API clients that
+authenticate with a token and do not send cookies back are not pinned to
+the primary and may read stale data right after a write.
+
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections.abc import Callable
+from typing import Any, cast
+
+import sqlalchemy as sa
+from flask import has_request_context
+from sqlalchemy import orm
+
+from ckan import model
+from ckan.common import session as user_session
+from ckan.types import Context
+
+from ckanext.files import config, utils
+
+log = logging.getLogger(__name__)
+
+# key of the CKAN session with timestamp until which reads use primary
+PIN_KEY = "files_replica_pinned_until"
+
+# key of `Session.info` that marks transaction with writes
+WRITES_KEY = "files_has_writes"
+
+Session: Any = orm.scoped_session(orm.sessionmaker(autoflush=False, expire_on_commit=False))
+
+_engines: dict[str, sa.engine.Engine] = {}
+_lock = threading.Lock()
+
+
+def is_enabled() -> bool:
+    """Check if replica is configured."""
+    return bool(config.replica_url())
+
+
+def get_engine() -> sa.engine.Engine | None:
+    """Engine connected to the replica or None if replica is not configured."""
+    url = config.replica_url()
+    if not url:
+        return None
+
+    if url not in _engines:
+        with _lock:
+            if url not in _engines:
+                _engines[url] = sa.create_engine(url, pool_pre_ping=True)
+
+    return _engines[url]
+
+
+def engines() -> list[sa.engine.Engine]:
+    """Engines connected to replicas."""
+    return list(_engines.values())
+
+
+def get_session() -> Any:
+    """Session for read-only queries.
+
+    Returns replica session when reads can be served by replica and
+    `model.Session` otherwise.
+    """
+    engine = get_engine()
+    if not engine or not can_read_replica():
+        return model.Session
+
+    if Session.registry.has():
+        return Session()
+
+    return Session(bind=engine)
+
+
+def route(context: Context) -> Context:
+    """Build context of read-only action.
+
+    When reads can be served by replica, copy of the context with replica
+    session and separate cache is returned. Otherwise the original context is
+    returned as-is. Custom sessions passed by the caller are never replaced.
+    """
+    if context.get("session", model.Session) is not model.Session:
+        return context
+
+    sess = get_session()
+    if sess is model.Session:
+        return context
+
+    routed = cast(Context, dict(context, session=sess))
+    routed.pop(utils.ContextCache.key, None)  # pyright: ignore[reportCallIssue, reportArgumentType]
+    return routed
+
+
+def can_read_replica() -> bool:
+    """Check if the current reads can be served by replica."""
+    if not has_request_context():
+        return False
+
+    if model.Session().info.get(WRITES_KEY):
+        return False
+
+    return user_session.get(PIN_KEY, 0) <= time.time()
+
+
+def pin():
+    """Send reads of the current user session to primary for a while."""
+    user_session[PIN_KEY] = time.time() + config.replica_pin_duration()
+
+
+def remove(*args: Any):
+    """Close replica session at the end of request."""
+    Session.remove()
+
+
+def install():
+    """Track writes of `model.Session` to keep reads of writers on primary.
+
+    Listeners are registered only when replica is configured, so that
+    portals without replica do not pay for them. Repeated calls are ignored.
+    """
+    for name, listener in _listeners:
+        if not sa.event.contains(model.Session, name, listener):
+            sa.event.listen(model.Session, name, listener)
+
+
+def uninstall():
+    """Remove listeners registered by `install`."""
+    for name, listener in _listeners:
+        if sa.event.contains(model.Session, name, listener):
+            sa.event.remove(model.Session, name, listener)
+
+
+def _track_flush(sess: Any, flush_context: Any):
+    sess.info[WRITES_KEY] = True
+
+
+def _track_statement(state: orm.ORMExecuteState):
+    if not state.is_select:
+        state.session.info[WRITES_KEY] = True
+
+
+def _pin_after_commit(sess: Any):
+    if sess.info.pop(WRITES_KEY, False) and is_enabled() and has_request_context():
+        pin()
+
+
+def _forget_writes(sess: Any):
+    sess.info.pop(WRITES_KEY, None)
+
+
+_listeners: list[tuple[str, Callable[..., Any]]] = [
+    ("after_flush", _track_flush),
+    ("do_orm_execute", _track_statement),
+    ("after_commit", _pin_after_commit),
+    ("after_rollback", _forget_writes),
+]
@@ -0,0 +1,323 @@
+"""Solr index of files.
+
+Files are stored in the same Solr core as datasets. Documents of files have
+`entity_type` and `state` set to `file`. Because of it, they are never
+returned by `package_search`, which always filters by `state:active`.
+
+DB remains the source of truth. The index is updated by API actions after
+changes are made in DB and can be rebuilt from scratch via `ckan files
+search-index rebuild`. Note, `ckan search-index rebuild` without `-r` flag
+clears the whole index, including files, so files must be re-indexed after it.
+
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+from collections.abc import Collection, Iterable
+from datetime import datetime, timezone
+from typing import Any
+
+import sqlalchemy as sa
+from sqlalchemy.orm import selectinload
+
+import ckan.plugins.toolkit as tk
+from ckan import model
+from ckan.lib.search.common import make_connection
+from ckan.lib.search.query import solr_literal
+
+from ckanext.files import config
+from ckanext.files.model import StorageUsage
+from ckanext.files.shared import File
+
+log = logging.getLogger(__name__)
+
+ENTITY_TYPE = "file"
+
+# mapping between names of File fields and fields of Solr documents
+FIELDS = {
+    "id": "id",
+    "name": "name",
+    "location": "files_location",
+    "content_type": "files_content_type",
+    "family": "files_family",
+    "hash": "files_hash",
+    "storage": "files_storage",
+    "owner_type": "files_owner_type",
+    "owner_id": "files_owner_id",
+    "created": "metadata_created",
+}
+
+FACETS = frozenset(["storage", "content_type", "family", "owner_type", "owner_id"])
+
+_range_ops = {
+    "$gt": "{{{} TO *]",
+    "$gte": "[{} TO *]",
+    "$lt": "[* TO {}}}",
+    "$lte": "[* TO {}]",
+}
+
+
+def is_enabled() -> bool:
+    """Check if files are indexed."""
+    return config.search_index_enabled()
+
+
+def index_id(file_id: str) -> str:
+    """Unique key of the file's document."""
+    return hashlib.md5(f"{ENTITY_TYPE}{file_id}{tk.config['ckan.site_id']}".encode()).hexdigest()  # noqa: S324
+
+
+def as_document(fileobj: File) -> dict[str, Any]:
+    """Transform file into Solr document."""
+    doc: dict[str, Any] = {
+        "id": fileobj.id,
+        "index_id": index_id(fileobj.id),
+        "site_id": tk.config["ckan.site_id"],
+        "entity_type": ENTITY_TYPE,
+        "state": ENTITY_TYPE,
+        "name": fileobj.name,
+        "title": fileobj.name,
+        "files_location": fileobj.location,
+        "files_content_type": fileobj.content_type,
+        "files_family": StorageUsage.family_of(fileobj.content_type or ""),
+        "files_hash": fileobj.hash,
+        "files_storage": fileobj.storage,
+        "metadata_created": fileobj.created,
+    }
+
+    if owner := fileobj.owner:
+        doc["files_owner_type"] = owner.owner_type
+        doc["files_owner_id"] = owner.owner_id
+
+    return doc
+
+
+def index(files: Iterable[File], defer_commit: bool = False):
+    """Add files to the index or update existing documents."""
+    docs = [as_document(fileobj) for fileobj in files]
+    if not docs:
+        return
+
+    commit = not defer_commit and tk.config.get("ckan.search.solr_commit")
+    make_connection().add(docs=docs, commit=commit)
+
+
+def remove(file_ids: Iterable[str], defer_commit: bool = False):
+    """Remove files from the index."""
+    ids = list(file_ids)
+    if not ids:
+        return
+
+    commit = not defer_commit and tk.config.get("ckan.search.solr_commit")
+    make_connection().delete(id=[index_id(file_id) for file_id in ids], commit=commit)
+
+
+def clear():
+    """Remove all files of the current portal from the index."""
+    make_connection().delete(q=" AND ".join(_base_filters()), commit=True)
+
+
+def commit():
+    """Make indexed documents visible for search."""
+    make_connection().commit(waitSearcher=False)
+
+
+def safe_index(fileobj: File):
+    """Index the file, logging errors instead of raising them.
+
+    Used by API actions: failed indexation must not break the operation,
+    because DB already contains the correct state.
+    """
+    if not is_enabled():
+        return
+
+    try:
+        index([fileobj])
+    except Exception:
+        log.exception("Cannot index file %s", fileobj.id)
+
+
+def safe_index_many(file_ids: Collection[str], batch_size: int = 1000):
+    """Re-index files by ID, logging errors instead of raising them."""
+    if not is_enabled() or not file_ids:
+        return
+
+    ids = list(file_ids)
+    try:
+        for start in range(0, len(ids), batch_size):
+            stmt = (
+                sa.select(File)
+                .where(File.id.in_(ids[start : start + batch_size]), File.deleted_at.is_(None))
+                .options(selectinload(File.owner))
+            )
+            index(model.Session.scalars(stmt).all(), defer_commit=True)
+        commit()
+    except Exception:
+        log.exception("Cannot index %d files", len(ids))
+
+
+def safe_remove(file_id: str):
+    """Remove the file from index, logging errors instead of raising them."""
+    if not is_enabled():
+        return
+
+    try:
+        remove([file_id])
+    except Exception:
+        log.exception("Cannot remove file %s from index", file_id)
+
+
+def safe_remove_many(file_ids: Collection[str]):
+    """Remove files from index, logging errors instead of raising them."""
+    if not is_enabled() or not file_ids:
+        return
+
+    try:
+        remove(file_ids)
+    except Exception:
+        log.exception("Cannot remove %d files from index", len(file_ids))
+
+
+def search(  # noqa: PLR0913, PLR0917
+    filters: dict[str, Any],
+    sort: list[tuple[str, str]],
+    start: int,
+    rows: int,
+    facets: Iterable[str] = (),
+    facet_limit: int = 50,
+) -> tuple[list[str], int, dict[str, dict[str, int]]]:
+    """Search files in the index.
+
+    Args:
+        filters: filters in the format of `files_file_search`
+        sort: list of field names and directions
+        start: number of skipped results
+        rows: max number of results
+        facets: fields used for faceting
+        facet_limit: max number of values for every facet
+
+    Returns:
+        IDs of files, total number of results and facet counts
+
+    Raises:
+        ValidationError: filters or facets cannot be served by index
+    """
+    params: dict[str, Any] = {
+        "fq": [*_base_filters(), _compile(filters)],
+        "fl": "id",
+        "start": start,
+        "rows": rows,
+        "sort": ", ".join(f"{_solr_field(field, 'sort')} {direction}" for field, direction in sort),
+    }
+
+    facet_fields = list(facets)
+    for field in facet_fields:
+        if field not in FACETS:
+            raise tk.ValidationError({"facets": [f"Invalid facet: {field}"]})
+
+    if facet_fields:
+        params.update(
+            {
+                "facet": "true",
+                "facet.field": [FIELDS[field] for field in facet_fields],
+                "facet.mincount": 1,
+                "facet.limit": facet_limit,
+            }
+        )
+
+    result = make_connection().search("*:*", **params)
+
+    facet_counts: dict[str, dict[str, int]] = {}
+    raw_facets: dict[str, list[Any]] = (result.facets or {}).get("facet_fields", {})
+    for field in facet_fields:
+        values = raw_facets.get(FIELDS[field], [])
+        facet_counts[field] = dict(zip(values[::2], values[1::2]))
+
+    return [doc["id"] for doc in result.docs], result.hits, facet_counts
+
+
+def _base_filters() -> list[str]:
+    return [
+        f"+site_id:{solr_literal(tk.config['ckan.site_id'])}",
+        f"+entity_type:{ENTITY_TYPE}",
+        f"+state:{ENTITY_TYPE}",
+    ]
+
+
+def _solr_field(field: str, usage: str = "filters") -> str:
+    if field not in FIELDS:
+        raise tk.ValidationError({usage: [f"Field {field} is not indexed"]})
+    return FIELDS[field]
+
+
+def _compile(filters: Any) -> str:  # noqa: C901
+    """Transform filters of `files_file_search` into Solr query."""
+    if not isinstance(filters, dict):
+        raise tk.ValidationError({"filters": ["Filters must be an object"]})
+
+    clauses: list[str] = []
+    for k, v in filters.items():  # pyright: ignore[reportUnknownVariableType]
+        if k in ["$and", "$or"]:
+            if not isinstance(v, list):
+                raise tk.ValidationError({"filters": [f"Only lists are allowed inside {k}"]})
+            glue = " AND " if k == "$and" else " OR "
+            nested = [_compile(sub) for sub in v]  # pyright: ignore[reportUnknownVariableType]
+            if nested:
+                clauses.append("(" + glue.join(nested) + ")")
+            continue
+
+        field = _solr_field(k)
+        value: Any = v
+        if isinstance(value, list):
+            value = {"$in": value}
+        elif not isinstance(value, dict):
+            value = {"$eq": value}
+
+        for op, operand in value.items():  # pyright: ignore[reportUnknownVariableType]
+            clauses.append(_clause(field, op, operand))
+
+    return "(" + " AND ".join(clauses) + ")" if clauses else "*:*"
+
+
+def _clause(field: str, op: str, value: Any) -> str:  # noqa: PLR0911
+    if op == "$eq":
+        if value is None:
+            return f"(*:* -{field}:[* TO *])"
+        return f"{field}:{_literal(field, value)}"
+
+    if op == "$ne":
+        if value is None:
+            return f"{field}:[* TO *]"
+        return f"(*:* -{field}:{_literal(field, value)})"
+
+    if op == "$in":
+        if not isinstance(value, list) or not value:
+            return "-*:*"
+        return f"{field}:(" + " OR ".join(_literal(field, item) for item in value) + ")"  # pyright: ignore[reportUnknownVariableType]
+
+    if op in _range_ops:
+        return f"{field}:" + _range_ops[op].format(_literal(field, value))
+
+    if op == "$search" and field == FIELDS["name"]:
+        return f"title:{_literal(field, value)}"
+
+    raise tk.ValidationError({"filters": [f"Operator {op} is not supported by search index"]})
+
+
+def _literal(field: str, value: Any) -> str:
+    if field == FIELDS["created"]:
+        if isinstance(value, str):
+            try:
+                value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            except ValueError:
+                raise tk.ValidationError({"filters": [f"Invalid date: {value}"]}) from None
+
+        if isinstance(value, datetime):
+            if not value.tzinfo:
+                value = value.replace(tzinfo=timezone.utc)
+            value = value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{text}"'
@@ -3,6 +3,9 @@ from __future__ import annotations
 import dataclasses
 import logging
 import os
+import shutil
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 import file_keeper as fk
@@ -18,6 +21,9 @@ from ckanext.files import shared
 log = logging.getLogger(__name__)
 CHUNK_SIZE = 16384
 
+# number of threads removing files concurrently
+REMOVE_WORKERS = 8
+
 
 @dataclasses.dataclass()
 class Settings(shared.Settings, fs.Settings):
@@ -44,6 +50,54 @@ class FsStorage(shared.Storage, fs.FsStorage):  # pyright: ignore[reportIncompat
     UploaderFactory = type("Uploader", (shared.Uploader, fs.Uploader), {})
     ManagerFactory = type("Manager", (shared.Manager, fs.Manager), {})
 
+    @override
+    def copy_from(
+        self,
+        location: shared.Location,
+        data: shared.FileData,
+        source: fk.Storage,
+        /,
+        **kwargs: Any,
+    ) -> shared.FileData:
+        if not isinstance(source, FsStorage):
+            raise shared.exc.UnsupportedOperationError("copy_from", self)
+
+        src = source.full_path(data.location)
+        if not os.path.exists(src):
+            raise shared.exc.MissingFileError(source, data.location)
+
+        dest = self.full_path(location)
+        if not self.settings.overwrite_existing and os.path.exists(dest):
+            raise shared.exc.ExistingFileError(self, location)
+
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        shutil.copyfile(src, dest)
+
+        return dataclasses.replace(data, location=location)
+
+    @override
+    def remove_many(self, items: Sequence[shared.FileData], /, **kwargs: Any) -> list[Exception | None]:
+        """Unlink files concurrently.
+
+        Removal is dominated by filesystem latency, which is significant for
+        network filesystems, so multiple files are removed at once.
+        """
+        if not self.supports(shared.Capability.REMOVE):
+            raise shared.exc.UnsupportedOperationError("remove", self)
+
+        def remove(data: shared.FileData) -> Exception | None:
+            try:
+                self.remove(data, **kwargs)
+            except Exception as err:  # noqa: BLE001
+                return err
+            return None
+
+        if len(items) < 2:  # noqa: PLR2004
+            return [remove(data) for data in items]
+
+        with ThreadPoolExecutor(min(REMOVE_WORKERS, len(items))) as pool:
+            return list(pool.map(remove, items))
+
 
 class PublicFsReader(Reader):
     capabilities = fs.Reader.capabilities | fk.Capability.LINK_PERMANENT
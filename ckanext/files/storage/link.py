@@ -60,15 +60,20 @@ class Uploader(shared.Uploader):
         if not resp.ok:
             log.debug("Cannot analyze URL %s: %s", url, resp)
 
-        content_length = resp.headers.get("content-length") or "0"
-        size = int(content_length) if content_length.isnumeric() else 0
+        return _data_from_response(location, url, resp)
 
-        content_type = resp.headers.get("content-type") or "application/octet-stream"
-        content_type = content_type.split(";", 1)[0]
 
-        hash = resp.headers.get("etag") or ""
+def _data_from_response(location: shared.Location, url: str, resp: requests.Response) -> shared.FileData:
+    """Build file details from the headers of HEAD response."""
+    content_length = resp.headers.get("content-length") or "0"
+    size = int(content_length) if content_length.isnumeric() else 0
 
-        return shared.FileData(location, size=size, content_type=content_type, hash=hash, storage_data={"url": url})
+    content_type = resp.headers.get("content-type") or "application/octet-stream"
+    content_type = content_type.split(";", 1)[0]
+
+    hash = resp.headers.get("etag") or ""
+
+    return shared.FileData(location, size=size, content_type=content_type, hash=hash, storage_data={"url": url})
 
 
 @dataclasses.dataclass()
@@ -85,6 +90,48 @@ class LinkStorage(shared.Storage):
     UploaderFactory = Uploader
     ReaderFactory = Reader
 
+    def revalidate(
+        self,
+        data: shared.FileData,
+        session: requests.Session | None = None,
+    ) -> shared.FileData | None:
+        """Check whether linked resource changed since the last visit.
+
+        Conditional HEAD request is sent to the URL of the link. When stored
+        hash contains ETag of the resource, it's sent via `If-None-Match`
+        header, so that unchanged resources are confirmed by the remote server
+        with `304 Not Modified` response.
+
+        Args:
+            data: current details of the link
+            session: optional HTTP session used for connection pooling
+
+        Returns:
+            updated details of the link or nothing if link is not modified or
+            cannot be reached
+        """
+        url = data.storage_data.get("url", data.location)
+        headers = {"If-None-Match": data.hash} if data.hash else {}
+
+        try:
+            resp = (session or requests).head(url, headers=headers, timeout=self.settings.timeout)
+        except requests.RequestException as err:
+            log.debug("Cannot revalidate URL %s: %s", url, err)
+            return None
+
+        if resp.status_code == requests.codes.not_modified:
+            return None
+
+        if not resp.ok:
+            log.debug("Cannot revalidate URL %s: %s", url, resp)
+            return None
+
+        fresh = _data_from_response(data.location, url, resp)
+        if (fresh.size, fresh.content_type, fresh.hash) == (data.size, data.content_type, data.hash):
+            return None
+
+        return dataclasses.replace(fresh, storage_data=dict(data.storage_data, url=url))
+
     @override
     @classmethod
     def declare_config_options(
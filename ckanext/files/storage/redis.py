@@ -1,8 +1,11 @@
 from __future__ import annotations
 
 import dataclasses
+from collections.abc import Sequence
+from typing import Any
 
 from file_keeper.default.adapters import redis as rd
+from redis.exceptions import RedisError
 from typing_extensions import override
 
 import ckan.plugins.toolkit as tk
@@ -10,6 +13,9 @@ from ckan.config.declaration import Declaration, Key
 
 from ckanext.files import shared
 
+# max number of fields removed by a single HDEL command
+REMOVE_BATCH_SIZE = 1000
+
 
 def _default_prefix():
     return "ckanext:files:{}:file_content".format(tk.config["ckan.site_id"])
@@ -27,6 +33,37 @@ class RedisStorage(shared.Storage, rd.RedisStorage):  # pyright: ignore[reportIn
     ManagerFactory = type("Manager", (shared.Manager, rd.Manager), {})
     UploaderFactory = type("Uploader", (shared.Uploader, rd.Uploader), {})
 
+    @override
+    def remove_many(self, items: Sequence[shared.FileData], /, **kwargs: Any) -> list[Exception | None]:
+        """Remove fields of the HASH via pipelined HDEL commands."""
+        if not self.supports(shared.Capability.REMOVE):
+            raise shared.exc.UnsupportedOperationError("remove", self)
+
+        errors: list[Exception | None] = [None] * len(items)
+        paths: dict[int, str] = {}
+        for idx, data in enumerate(items):
+            try:
+                paths[idx] = self.full_path(data.location)
+            except shared.exc.LocationError as err:  # noqa: PERF203
+                errors[idx] = err
+
+        if not paths:
+            return errors
+
+        cfg = self.settings
+        fields = list(paths.values())
+        pipe = cfg.redis.pipeline(transaction=False)
+        for start in range(0, len(fields), REMOVE_BATCH_SIZE):
+            pipe.hdel(cfg.bucket, *fields[start : start + REMOVE_BATCH_SIZE])
+
+        try:
+            pipe.execute()
+        except RedisError as err:
+            for idx in paths:
+                errors[idx] = err
+
+        return errors
+
     @override
     @classmethod
     def declare_config_options(cls, declaration: Declaration, key: Key):
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
 import dataclasses
+from collections.abc import Sequence
 from typing import Any
 
+import file_keeper as fk
 from file_keeper.default.adapters import s3
 from typing_extensions import override
 
@@ -12,6 +14,9 @@ from ckan.config.declaration import Declaration, Key
 
 from ckanext.files import shared
 
+# max number of keys accepted by DeleteObjects
+DELETE_BATCH_SIZE = 1000
+
 
 class Reader(shared.Reader, s3.Reader):
     @override
@@ -33,6 +38,83 @@ class S3Storage(shared.Storage, s3.S3Storage):  # pyright: ignore[reportIncompat
     UploaderFactory = type("Reader", (shared.Uploader, s3.Uploader), {})
     ManagerFactory = type("Reader", (shared.Manager, s3.Manager), {})
 
+    @override
+    def copy_from(
+        self,
+        location: shared.Location,
+        data: shared.FileData,
+        source: fk.Storage,
+        /,
+        **kwargs: Any,
+    ) -> shared.FileData:
+        if not isinstance(source, S3Storage):
+            raise shared.exc.UnsupportedOperationError("copy_from", self)
+
+        result = dataclasses.replace(data, location=location)
+        if not self.settings.overwrite_existing and self.exists(result):
+            raise shared.exc.ExistingFileError(self, location)
+
+        # managed copy switches to multipart copy for objects larger than 5GiB
+        self.settings.client.copy(
+            {"Bucket": source.settings.bucket, "Key": source.full_path(data.location)},
+            self.settings.bucket,
+            self.full_path(location),
+        )
+
+        return result
+
+    @override
+    def remove_many(self, items: Sequence[shared.FileData], /, **kwargs: Any) -> list[Exception | None]:
+        """Remove objects via DeleteObjects, up to 1000 keys per request."""
+        if not self.supports(shared.Capability.REMOVE):
+            raise shared.exc.UnsupportedOperationError("remove", self)
+
+        errors: list[Exception | None] = [None] * len(items)
+        for start in range(0, len(items), DELETE_BATCH_SIZE):
+            keys: dict[str, list[int]] = {}
+            for idx in range(start, min(start + DELETE_BATCH_SIZE, len(items))):
+                key = self._object_key(items[idx])
+                if isinstance(key, Exception):
+                    errors[idx] = key
+                else:
+                    keys.setdefault(key, []).append(idx)
+
+            for key, err in self._delete_objects(list(keys)).items():
+                for idx in keys.get(key, []):
+                    errors[idx] = err
+
+        return errors
+
+    def _object_key(self, data: shared.FileData) -> str | Exception:
+        """Compute key of the object or return an error of invalid location."""
+        try:
+            return self.full_path(data.location)
+        except shared.exc.LocationError as err:
+            return err
+
+    def _delete_objects(self, keys: list[str]) -> dict[str, Exception]:
+        """Delete objects by a single request and return errors of failed keys."""
+        if not keys:
+            return {}
+
+        client = self.settings.client
+        try:
+            resp = client.delete_objects(
+                Bucket=self.settings.bucket,
+                Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True},
+            )
+        except client.exceptions.ClientError as err:
+            return dict.fromkeys(keys, err)
+
+        errors: dict[str, Exception] = {}
+        for error in resp.get("Errors", []):
+            if error.get("Code") == "AccessDenied":
+                errors[error["Key"]] = shared.exc.PermissionError(self, "remove", error.get("Message", ""))
+            else:
+                errors[error["Key"]] = shared.exc.StorageError(f"{error.get('Code')}: {error.get('Message')}")
+
+        return errors
+
     @override
     @classmethod
     def declare_config_options(cls, declaration: Declaration, key: Key):
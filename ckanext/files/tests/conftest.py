@@ -8,11 +8,13 @@ from unittest import mock as _mock
 import factory
 import pytest
 import pytz
+import sqlalchemy as sa
 from freezegun import freeze_time
 from pytest_factoryboy import register
 from responses import RequestsMock
 from werkzeug.datastructures import FileStorage
 
+from ckan import model
 from ckan.lib.redis import connect_to_redis
 from ckan.tests import factories
 from ckan.tests.helpers import call_action  # pyright: ignore[reportUnknownVariableType]
@@ -135,6 +137,28 @@ def clean_redis(reset_redis: Any):
     reset_redis()
 
 
+@pytest.fixture
+def sql_statements():
+    """Collect SQL statements executed during the test.
+
+    Example:
+        ```python
+        def test_single_query(sql_statements):
+            sql_statements.clear()
+            model.Session.get(File, id)
+            assert len(sql_statements) == 1
+        ```
+    """
+    statements: list[str] = []
+
+    def listener(conn: Any, cursor: Any, statement: str, *args: Any):
+        statements.append(statement)
+
+    sa.event.listen(model.meta.engine, "before_cursor_execute", listener)
+    yield statements
+    sa.event.remove(model.meta.engine, "before_cursor_execute", listener)
+
+
 @register(_name="file")
 class FileFactory(factories.CKANFactory):
     class Meta:  # pyright: ignore[reportIncompatibleVariableOverride]
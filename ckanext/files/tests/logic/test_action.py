@@ -1,12 +1,16 @@
 from __future__ import annotations
 
+import base64
 import io
+import json
 import uuid
+from datetime import datetime, timezone
 from typing import Any
 
 import pytest
 import sqlalchemy as sa
 from faker import Faker
+from sqlalchemy.dialects import postgresql
 from werkzeug.datastructures import FileStorage
 
 import ckan.model as model
@@ -15,7 +19,9 @@ from ckan import types
 from ckan.tests.factories import fake
 from ckan.tests.helpers import call_action  # pyright: ignore[reportUnknownVariableType]
 
-from ckanext.files import shared
+from ckanext.files import jobs, shared
+from ckanext.files.logic.query import process_filters
+from ckanext.files.model import StorageUsage
 
 call_action: Any
 
@@ -66,6 +72,22 @@ class TestFileCreate:
         result = file_factory(name=bad_name)
         assert result["location"] == good_name
 
+    def test_data_url(self, file_factory: types.TestFactory):
+        """Base64-encoded data URL is decoded."""
+        content = b"hello world"
+        result = file_factory(upload="data:text/plain;base64," + base64.b64encode(content).decode())
+
+        data = shared.FileData.from_object(model.Session.get(shared.File, result["id"]))
+        assert shared.get_storage().content(data) == content
+
+    @pytest.mark.parametrize("content", ["data: hello world\n", "data:text/plain,hello world"])
+    def test_plain_text_with_data_prefix(self, file_factory: types.TestFactory, content: str):
+        """Text that is not a base64-encoded data URL is kept as it is."""
+        result = file_factory(upload=content)
+
+        data = shared.FileData.from_object(model.Session.get(shared.File, result["id"]))
+        assert shared.get_storage().content(data) == content.encode()
+
     @pytest.mark.ckan_config(f"{shared.config.STORAGE_PREFIX}test.location_transformers", ["uuid4_prefix"])
     def test_location_transformed(self, file_factory: types.TestFactory):
         """Location transformers are applied to the location."""
@@ -142,6 +164,23 @@ class TestFileSearch:
         assert first in result["results"]
         assert second in result["results"]
 
+    def test_number_of_queries(
+        self,
+        file_factory: types.TestFactory,
+        user: dict[str, Any],
+        sql_statements: list[str],
+    ):
+        """Owners are loaded together with files, without extra queries."""
+        file_factory.create_batch(3, user=user["name"])
+        model.Session.expunge_all()
+
+        sql_statements.clear()
+        result = call_action("files_file_search")
+        assert all(item["owner_id"] == user["id"] for item in result["results"])
+        selects = [s for s in sql_statements if "files_file" in s or "files_owner" in s]
+        # one for count, one for results
+        assert len(selects) == 2  # noqa: PLR2004
+
     def test_sort(self, file_factory: types.TestFactory, faker: Faker):
         """Results can be sorted by multiple fields with different directions."""
         first = file_factory(name="a.txt", upload=faker.binary(10))
@@ -189,6 +228,62 @@ class TestFileSearch:
         result = call_action("files_file_search", filters={"location": {"$ne": small["name"]}})
         assert result["results"] == [big]
 
+    def test_filter_value_coercion(self, faker: Faker, file_factory: types.TestFactory):
+        """Filter values are converted into the type of the column."""
+        big = file_factory(upload=faker.binary(100))
+        small = file_factory(upload=faker.binary(10))
+
+        result = call_action("files_file_search", filters={"size": "10"})
+        assert result["results"] == [small]
+
+        result = call_action("files_file_search", filters={"size": {"$in": ["100", 10]}, "pinned": "false"})
+        assert result["count"] == 2
+
+        result = call_action("files_file_search", filters={"created": {"$lte": big["created"]}})
+        assert big in result["results"]
+
+        result = call_action("files_file_search", filters={"size": {"$astext": {"$like": "1%"}}})
+        assert result["count"] == 2
+
+        with pytest.raises(tk.ValidationError):
+            call_action("files_file_search", filters={"size": "ten"})
+
+        with pytest.raises(tk.ValidationError):
+            call_action("files_file_search", filters={"pinned": "maybe"})
+
+        with pytest.raises(tk.ValidationError):
+            call_action("files_file_search", filters={"created": "yesterday"})
+
+    def test_coerced_filters_keep_columns_intact(self):
+        """Columns are not casted, so their indexes remain usable."""
+        columns = dict(**shared.File.__table__.c, **shared.Owner.__table__.c)
+        clause = process_filters({"size": "10", "created": {"$gte": "2024-01-01T00:00:00Z"}}, columns)
+        sql = str(clause.compile(dialect=postgresql.dialect()))
+        assert "CAST" not in sql
+
+    def test_naive_datetime_filter_is_utc(self):
+        """Dates without offset are compared as UTC."""
+        columns = dict(**shared.File.__table__.c)
+        clause = process_filters({"created": {"$gte": "2024-01-01T00:00:00"}}, columns)
+        params = clause.compile(dialect=postgresql.dialect()).params
+        assert list(params.values()) == [datetime(2024, 1, 1, tzinfo=timezone.utc)]
+
+    def test_large_in_filter(self, file_factory: types.TestFactory):
+        """Long lists of values are passed as a single array parameter."""
+        file = file_factory()
+        ids = [str(uuid.uuid4()) for _ in range(10_000)] + [file["id"]]
+
+        result = call_action("files_file_search", filters={"id": ids})
+        assert result["results"] == [file]
+
+        result = call_action("files_file_search", filters={"id": {"$in": []}})
+        assert result["count"] == 0
+
+        columns = dict(**shared.File.__table__.c, **shared.Owner.__table__.c)
+        short = str(process_filters({"id": ids[:2]}, columns).compile(dialect=postgresql.dialect()))
+        long = str(process_filters({"id": ids}, columns).compile(dialect=postgresql.dialect()))
+        assert short == long
+
     def test_filter_by_data(self, file_factory: types.TestFactory):
         """File can be found by storage/plugin data."""
         big_obj = file_factory.model()
@@ -220,6 +315,181 @@ class TestFileSearch:
         result = call_action("files_file_search", filters={"storage_data": {"name": "big"}})
         assert result["results"] == [big]
 
+    def test_filter_by_data_containment(self, file_factory: types.TestFactory):
+        """Data can be filtered by containment and key existence."""
+        first_obj = file_factory.model()
+        second_obj = file_factory.model()
+
+        first_obj.plugin_data = {"tags": ["a", "b"], "meta": {"source": "x"}}
+        second_obj.plugin_data = {"tags": ["b"], "count": "1"}
+        model.Session.commit()
+
+        first = call_action("files_file_show", id=first_obj.id)
+        second = call_action("files_file_show", id=second_obj.id)
+
+        result = call_action("files_file_search", filters={"plugin_data": {"tags": {"$contains": ["a"]}}})
+        assert result["results"] == [first]
+
+        result = call_action("files_file_search", filters={"plugin_data": {"tags": {"$contains": ["b"]}}})
+        assert result["count"] == 2
+
+        result = call_action("files_file_search", filters={"plugin_data": {"$has_key": "count"}})
+        assert result["results"] == [second]
+
+        result = call_action("files_file_search", filters={"plugin_data": {"meta": {"$has_key": "source"}}})
+        assert result["results"] == [first]
+
+        result = call_action("files_file_search", filters={"plugin_data": {"meta": {"source": "x"}}})
+        assert result["results"] == [first]
+
+        # plain value matches only the same JSON type, explicit $eq compares text
+        result = call_action("files_file_search", filters={"plugin_data": {"count": 1}})
+        assert result["count"] == 0
+
+        result = call_action("files_file_search", filters={"plugin_data": {"count": {"$eq": "1"}}})
+        assert result["results"] == [second]
+
+    def test_filter_by_data_plain_value(self, file_factory: types.TestFactory):
+        """Plain string compares text, while plain number requires the same JSON type."""
+        text_obj = file_factory.model()
+        number_obj = file_factory.model()
+
+        text_obj.plugin_data = {"count": "1"}
+        number_obj.plugin_data = {"count": 1}
+        model.Session.commit()
+
+        result = call_action("files_file_search", filters={"plugin_data": {"count": "1"}})
+        assert result["count"] == 2
+
+        result = call_action("files_file_search", filters={"plugin_data": {"count": 1}})
+        assert [item["id"] for item in result["results"]] == [number_obj.id]
+
+    @pytest.mark.parametrize(
+        "sort",
+        ["name", "id", [["size", "desc"]], [["name", "desc"]], [["owner_id", "desc"], "created"]],
+    )
+    def test_cursor(self, file_factory: types.TestFactory, sort: Any):
+        """Cursor pagination visits every file exactly once."""
+        files = file_factory.create_batch(5)
+        expected = call_action("files_file_search", sort=sort, rows=10)["results"]
+
+        seen: list[dict[str, Any]] = []
+        result = call_action("files_file_search", sort=sort, rows=2, cursor="")
+        seen.extend(result["results"])
+        while result["next_cursor"]:
+            result = call_action("files_file_search", sort=sort, rows=2, cursor=result["next_cursor"])
+            seen.extend(result["results"])
+
+        assert len(seen) == len(files)
+        assert seen == expected
+
+    def test_search_with_cursor(self, file_factory: types.TestFactory):
+        """Cursor pagination of search results follows sort order instead of rank."""
+        for name in ["report-a.csv", "annual-report.csv", "report.csv", "summary.csv", "reports.txt"]:
+            file_factory(name=name)
+
+        filters = {"name": {"$search": "report"}}
+        expected = call_action("files_file_search", filters=filters, sort="name", rows=10, cursor="")["results"]
+
+        seen: list[dict[str, Any]] = []
+        result = call_action("files_file_search", filters=filters, sort="name", rows=2, cursor="")
+        seen.extend(result["results"])
+        while result["next_cursor"]:
+            result = call_action(
+                "files_file_search", filters=filters, sort="name", rows=2, cursor=result["next_cursor"]
+            )
+            seen.extend(result["results"])
+
+        assert seen == expected
+        assert [item["name"] for item in seen] == sorted(item["name"] for item in seen)
+
+    def test_cursor_ignores_start(self, file_factory: types.TestFactory):
+        """Offset is not applied in cursor mode."""
+        file_factory.create_batch(3)
+        result = call_action("files_file_search", start=2, rows=3, cursor="")
+        assert len(result["results"]) == 3
+
+    def test_cursor_sort_mismatch(self, file_factory: types.TestFactory):
+        """Cursor cannot be used with a different sort."""
+        file_factory.create_batch(2)
+        result = call_action("files_file_search", sort="name", rows=1, cursor="")
+
+        with pytest.raises(tk.ValidationError):
+            call_action("files_file_search", sort="size", rows=1, cursor=result["next_cursor"])
+
+    def test_search_operator(self, file_factory: types.TestFactory):
+        """$search finds names containing the term, ranked by similarity."""
+        report = file_factory(name="report.csv")
+        annual = file_factory(name="annual-report-2024.csv")
+        file_factory(name="image.png")
+
+        result = call_action("files_file_search", filters={"name": {"$search": "report"}})
+        assert {f["id"] for f in result["results"]} == {report["id"], annual["id"]}
+        assert result["results"][0]["id"] == report["id"]
+
+        result = call_action("files_file_search", filters={"name": {"$search": "100%"}})
+        assert result["count"] == 0
+
+    def test_like_does_not_cast_text(self, file_factory: types.TestFactory):
+        """$ilike on text column works with non-string values."""
+        file = file_factory(name="2024.csv")
+        result = call_action("files_file_search", filters={"name": {"$ilike": 2024}})
+        assert result["count"] == 0
+
+        result = call_action("files_file_search", filters={"name": {"$ilike": "2024%"}})
+        assert result["results"] == [file]
+
+    def test_fields(self, file_factory: types.TestFactory, user: dict[str, Any]):
+        """Only requested fields are returned."""
+        file = file_factory(user=user)
+        file_factory(user="")
+
+        result = call_action("files_file_search", fields=["id", "name"], filters={"id": file["id"]})
+        assert result["results"] == [{"id": file["id"], "name": file["name"]}]
+
+        result = call_action("files_file_search", fields="id", filters={"owner_id": user["id"]})
+        assert result["results"] == [{"id": file["id"]}]
+
+        result = call_action("files_file_search", fields=["pinned", "owner_id"], sort="size")
+        assert {"pinned": False, "owner_id": None} in result["results"]
+
+        with pytest.raises(tk.ValidationError):
+            call_action("files_file_search", fields=["not-a-field"])
+
+    def test_fields_with_cursor(self, file_factory: types.TestFactory):
+        """Projection can be combined with cursor pagination."""
+        ids = {file_factory()["id"] for _ in range(3)}
+
+        result = call_action("files_file_search", fields=["id"], cursor="", rows=2)
+        second = call_action("files_file_search", fields=["id"], cursor=result["next_cursor"], rows=2)
+        assert {f["id"] for f in result["results"] + second["results"]} == ids
+
+    def test_count_modes(self, file_factory: types.TestFactory):
+        """Total number of files can be skipped, estimated or capped."""
+        file_factory.create_batch(3)
+
+        assert call_action("files_file_search", count="exact")["count"] == 3
+        assert call_action("files_file_search", count="none")["count"] is None
+        assert call_action("files_file_search", count="capped", count_cap=1)["count"] == 2
+        assert call_action("files_file_search", count="capped", count_cap=10)["count"] == 3
+        assert isinstance(call_action("files_file_search", count="estimate")["count"], int)
+
+        with pytest.raises(tk.ValidationError):
+            call_action("files_file_search", count="approximate")
+
+    @pytest.mark.parametrize(
+        "payload",
+        [None, [], {"k": 1, "v": []}, {"k": [1], "v": [1]}, {"k": [["id", "asc"]], "v": 1}],
+    )
+    def test_invalid_cursor(self, payload: Any):
+        """Malformed cursor produces validation error."""
+        with pytest.raises(tk.ValidationError):
+            call_action("files_file_search", cursor="not a cursor")
+
+        cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+        with pytest.raises(tk.ValidationError):
+            call_action("files_file_search", sort="id", cursor=cursor)
+
 
 @pytest.mark.usefixtures("with_plugins", "clean_db")
 class TestFileDelete:
@@ -244,6 +514,115 @@ class TestFileDelete:
         assert not existing
 
 
+@pytest.mark.usefixtures("with_plugins", "clean_db")
+class TestFileDeleteMany:
+    def test_delete(self, faker: Faker, file_factory: types.TestFactory, user: dict[str, Any]):
+        """Files are removed from storage and DB, missing files are reported."""
+        first, second, kept = file_factory.create_batch(3, user=user["name"], upload=faker.binary(10))
+        missing = faker.uuid4()
+
+        result = call_action("files_file_delete_many", ids=[first["id"], second["id"], missing])
+        assert sorted(result["deleted"]) == sorted([first["id"], second["id"]])
+        assert list(result["errors"]) == [missing]
+
+        assert not model.Session.get(shared.File, first["id"])
+        assert not model.Session.get(shared.Owner, second["id"])
+        assert model.Session.get(shared.File, kept["id"])
+
+        storage = shared.get_storage()
+        assert not storage.exists(shared.FileData.from_dict(first))
+        assert storage.exists(shared.FileData.from_dict(kept))
+
+        stats = call_action("files_storage_stats", owner_type="user", owner_id=user["id"])
+        assert (stats["count"], stats["size"]) == (1, 10)
+
+    @pytest.mark.ckan_config(f"{shared.config.STORAGE_PREFIX}test.disabled_capabilities", ["REMOVE"])
+    def test_missing_remove_capability(self, file: dict[str, Any]):
+        """Files from storages without REMOVE capability are reported as errors."""
+        result = call_action("files_file_delete_many", ids=[file["id"]])
+        assert result["deleted"] == []
+        assert list(result["errors"]) == [file["id"]]
+        assert model.Session.get(shared.File, file["id"])
+
+
+@pytest.mark.usefixtures("with_plugins", "clean_db")
+@pytest.mark.ckan_config(shared.config.SOFT_DELETE, True)
+class TestSoftDelete:
+    def test_delete(self, faker: Faker, file_factory: types.TestFactory):
+        """Deleted file is hidden from API, but remains in the storage."""
+        file = file_factory(upload=faker.binary(10))
+        call_action("files_file_delete", id=file["id"])
+
+        with pytest.raises(tk.ObjectNotFound):
+            call_action("files_file_show", id=file["id"])
+
+        assert call_action("files_file_search", filters={"id": file["id"]})["count"] == 0
+
+        fileobj = model.Session.get(shared.File, file["id"])
+        assert fileobj
+        assert fileobj.is_deleted
+        assert shared.get_storage().exists(shared.FileData.from_dict(file))
+
+    def test_delete_many(self, faker: Faker, file_factory: types.TestFactory, user: dict[str, Any]):
+        """Files are marked as deleted and excluded from usage stats."""
+        first, second = file_factory.create_batch(2, user=user["name"], upload=faker.binary(10))
+
+        result = call_action("files_file_delete_many", ids=[first["id"]])
+        assert result == {"deleted": [first["id"]], "errors": {}}
+
+        stats = call_action("files_storage_stats", owner_type="user", owner_id=user["id"])
+        assert (stats["count"], stats["size"]) == (1, 10)
+
+        result = call_action("files_file_delete_many", ids=[first["id"], second["id"]])
+        assert result["deleted"] == [second["id"]]
+        assert list(result["errors"]) == [first["id"]]
+
+    def test_garbage_collection(self, faker: Faker, file_factory: types.TestFactory):
+        """Garbage collector removes deleted files from storage and DB."""
+        deleted, kept = file_factory.create_batch(2, upload=faker.binary(10))
+        call_action("files_file_delete", id=deleted["id"])
+
+        assert jobs.collect_garbage(batch_size=1) == {"purged": 1, "failed": 0}
+
+        storage = shared.get_storage()
+        assert not storage.exists(shared.FileData.from_dict(deleted))
+        assert not model.Session.get(shared.File, deleted["id"])
+        assert storage.exists(shared.FileData.from_dict(kept))
+        assert model.Session.get(shared.File, kept["id"])
+
+    def test_garbage_collection_delay(self, faker: Faker, file_factory: types.TestFactory):
+        """Recently deleted files can be kept by garbage collector."""
+        file = file_factory(upload=faker.binary(10))
+        call_action("files_file_delete", id=file["id"])
+
+        assert jobs.collect_garbage(older_than=3600) == {"purged": 0, "failed": 0}
+        assert model.Session.get(shared.File, file["id"])
+
+    def test_create_at_deleted_location(self, file_factory: types.TestFactory):
+        """Deleted file is purged when new file is created at its location."""
+        deleted = file_factory(upload=b"old")
+        call_action("files_file_delete", id=deleted["id"])
+
+        file = file_factory(name=deleted["location"], upload=b"new")
+        assert file["location"] == deleted["location"]
+        assert not model.Session.get(shared.File, deleted["id"])
+
+        data = shared.FileData.from_object(model.Session.get(shared.File, file["id"]))
+        assert shared.get_storage().content(data) == b"new"
+
+    @pytest.mark.ckan_config(f"{shared.config.STORAGE_PREFIX}test.public", True)
+    def test_public_download(self, app: Any, file_factory: types.TestFactory):
+        """Deleted file cannot be downloaded from public storage."""
+        file = file_factory()
+        with app.flask_app.test_request_context():
+            url = tk.url_for("files.public_download", storage_name=file["storage"], location=file["location"])
+
+        assert app.get(url).status_code == 200
+
+        call_action("files_file_delete", id=file["id"])
+        assert app.get(url).status_code == 404
+
+
 @pytest.mark.usefixtures("with_plugins", "clean_db")
 class TestFileShow:
     def test_show_missing(self, faker: Faker):
@@ -283,6 +662,67 @@ class TestFileRename:
         assert result["name"] == good_name
 
 
+@pytest.mark.usefixtures("with_plugins", "clean_db")
+class TestFilePatchData:
+    def test_patch(self, file_factory: types.TestFactory):
+        """Keys are merged into existing data and missing objects are created."""
+        fileobj = file_factory.model()
+        fileobj.plugin_data = {"a": 1, "nested": {"b": 2}}
+        model.Session.commit()
+
+        call_action("files_file_patch_data", id=fileobj.id, patch={"c": 3})
+        call_action("files_file_patch_data", id=fileobj.id, patch={"d": 4}, path=["nested"])
+        result = call_action(
+            "files_file_patch_data",
+            {"include_plugin_data": True},
+            id=fileobj.id,
+            patch={"e": 5},
+            path=["x", "y"],
+        )
+
+        assert result["plugin_data"] == {"a": 1, "c": 3, "nested": {"b": 2, "d": 4}, "x": {"y": {"e": 5}}}
+
+    def test_path_conflict(self, file_factory: types.TestFactory):
+        """Non-object value on the path is not replaced."""
+        fileobj = file_factory.model()
+        fileobj.plugin_data = {"a": 1}
+        model.Session.commit()
+
+        with pytest.raises(tk.ValidationError):
+            call_action("files_file_patch_data", id=fileobj.id, patch={"b": 2}, path=["a", "x"])
+
+        model.Session.refresh(fileobj)
+        assert fileobj.plugin_data == {"a": 1}
+
+    def test_storage_data(self, file: dict[str, Any]):
+        """Storage data can be patched as well."""
+        result = call_action("files_file_patch_data", id=file["id"], patch={"etag": "x"}, prop="storage_data")
+        assert result["storage_data"] == dict(file["storage_data"], etag="x")
+
+    def test_many(self, faker: Faker, file_factory: types.TestFactory):
+        """Multiple files are patched at once and failures are reported."""
+        first, second, conflict = file_factory.create_batch(3)
+        conflict_obj = model.Session.get(shared.File, conflict["id"])
+        assert conflict_obj
+        conflict_obj.plugin_data = {"meta": "text"}
+        model.Session.commit()
+        missing = faker.uuid4()
+
+        result = call_action(
+            "files_file_patch_data_many",
+            ids=[first["id"], second["id"], conflict["id"], missing],
+            patch={"reviewed": True},
+            path=["meta"],
+        )
+        assert result["patched"] == [first["id"], second["id"]]
+        assert set(result["errors"]) == {conflict["id"], missing}
+
+        for file_id in [first["id"], second["id"]]:
+            fileobj = model.Session.get(shared.File, file_id)
+            assert fileobj
+            assert fileobj.plugin_data == {"meta": {"reviewed": True}}
+
+
 @pytest.mark.usefixtures("with_plugins", "clean_db")
 class TestFilePin:
     def test_pin_missing(self, faker: Faker):
@@ -433,6 +873,151 @@ class TestFileOwnershipTransfer:
         assert file.owner
 
 
+@pytest.mark.usefixtures("with_plugins", "clean_db")
+class TestFileOwnershipTransferMany:
+    def test_source_is_required(self):
+        """Files must be selected by IDs or by owner."""
+        with pytest.raises(tk.ValidationError):
+            call_action("files_transfer_ownership_many", owner_id=fake.unique.uuid4(), owner_type="user")
+
+    def test_transfer_by_ids(self, faker: Faker, file_factory: types.TestFactory, user: dict[str, Any]):
+        """Owned and unowned files are transferred and history is recorded."""
+        owned = file_factory(user=user["name"], upload=faker.binary(10))
+        unowned = file_factory(user="", upload=faker.binary(20))
+        untouched = file_factory(user=user["name"])
+        owner_id = fake.unique.uuid4()
+
+        result = call_action(
+            "files_transfer_ownership_many",
+            ids=[owned["id"], unowned["id"]],
+            owner_id=owner_id,
+            owner_type="organization",
+            pin=True,
+        )
+        assert result["count"] == 2
+
+        for file_id in [owned["id"], unowned["id"]]:
+            info = call_action("files_file_show", id=file_id)
+            assert (info["owner_type"], info["owner_id"], info["pinned"]) == ("organization", owner_id, True)
+
+        assert call_action("files_file_show", id=untouched["id"])["owner_id"] == user["id"]
+
+        history = model.Session.scalars(sa.select(shared.TransferHistory)).all()
+        assert [(h.file_id, h.owner_id) for h in history] == [(owned["id"], user["id"])]
+
+        stats = call_action("files_storage_stats", owner_type="organization", owner_id=owner_id)
+        assert (stats["count"], stats["size"]) == (2, 30)
+
+    def test_missing_files(self, file: dict[str, Any], file_factory: types.TestFactory):
+        """Missing and deleted files are reported in errors."""
+        deleted = file_factory()
+        call_action("files_file_delete", id=deleted["id"])
+        missing = fake.unique.uuid4()
+
+        result = call_action(
+            "files_transfer_ownership_many",
+            ids=[file["id"], missing, deleted["id"]],
+            owner_id=fake.unique.uuid4(),
+            owner_type="user",
+        )
+        assert result == {"count": 1, "errors": {missing: "Not found", deleted["id"]: "Not found"}}
+
+    def test_transfer_by_owner(self, file_factory: types.TestFactory, user: dict[str, Any]):
+        """All files of the owner are transferred."""
+        file_factory.create_batch(3, user=user["name"])
+        owner_id = fake.unique.uuid4()
+
+        result = call_action(
+            "files_transfer_ownership_many",
+            source_owner_type="user",
+            source_owner_id=user["id"],
+            owner_id=owner_id,
+            owner_type="user",
+        )
+        assert result["count"] == 3
+
+        result = call_action("files_file_scan", owner_type="user", owner_id=owner_id)
+        assert len(result["results"]) == 3
+        result = call_action("files_file_scan", owner_type="user", owner_id=user["id"])
+        assert result["results"] == []
+
+    def test_transfer_pinned(self, file: dict[str, Any]):
+        """Pinned files are not transferred without force-flag."""
+        call_action("files_file_pin", id=file["id"])
+        owner_id = fake.unique.uuid4()
+
+        with pytest.raises(tk.ValidationError):
+            call_action("files_transfer_ownership_many", ids=[file["id"]], owner_id=owner_id, owner_type="user")
+
+        call_action(
+            "files_transfer_ownership_many",
+            ids=[file["id"]],
+            owner_id=owner_id,
+            owner_type="user",
+            force=True,
+        )
+        assert call_action("files_file_show", id=file["id"])["owner_id"] == owner_id
+
+
+@pytest.mark.usefixtures("with_plugins", "clean_db")
+class TestFileHistory:
+    def _transfer(self, file_id: str, owners: list[str]):
+        for owner_id in owners:
+            call_action("files_transfer_ownership", id=file_id, owner_id=owner_id, owner_type="user")
+
+    def test_pagination(self, faker: Faker, file_factory: types.TestFactory, user: dict[str, Any]):
+        """History is paginated from the most recent transfer."""
+        file = file_factory(user=user["name"])
+        owners = [faker.uuid4() for _ in range(3)]
+        self._transfer(file["id"], owners)
+
+        result = call_action("files_file_history", id=file["id"], rows=2)
+        assert [record["owner_id"] for record in result["results"]] == [owners[1], owners[0]]
+        assert result["next_cursor"]
+
+        result = call_action("files_file_history", id=file["id"], rows=2, cursor=result["next_cursor"])
+        assert [record["owner_id"] for record in result["results"]] == [user["id"]]
+        assert result["next_cursor"] is None
+
+    def test_missing(self, faker: Faker):
+        """History of missing file is not available."""
+        with pytest.raises(tk.ObjectNotFound):
+            call_action("files_file_history", id=faker.uuid4())
+
+    def test_compaction(self, faker: Faker, file_factory: types.TestFactory, user: dict[str, Any]):
+        """Expired records are removed, optionally keeping the latest one."""
+        file = file_factory(user=user["name"])
+        self._transfer(file["id"], [faker.uuid4() for _ in range(3)])
+        table: Any = shared.TransferHistory.__table__
+        model.Session.execute(sa.update(table).values(at=table.c.at - sa.text("interval '2 days'")))
+        model.Session.commit()
+
+        assert jobs.compact_history(7 * 24 * 60 * 60) == {"removed": 0}
+        assert jobs.compact_history(24 * 60 * 60, batch_size=1, keep_latest=True) == {"removed": 2}
+        assert len(call_action("files_file_history", id=file["id"])["results"]) == 1
+
+        assert jobs.compact_history(24 * 60 * 60) == {"removed": 1}
+        assert call_action("files_file_history", id=file["id"])["results"] == []
+
+    def test_compaction_is_committed_after_processing(
+        self, faker: Faker, file_factory: types.TestFactory, user: dict[str, Any]
+    ):
+        """Batch is restored when the caller fails to process it."""
+        file = file_factory(user=user["name"])
+        self._transfer(file["id"], [faker.uuid4() for _ in range(3)])
+        table: Any = shared.TransferHistory.__table__
+        model.Session.execute(sa.update(table).values(at=table.c.at - sa.text("interval '2 days'")))
+        model.Session.commit()
+
+        expired = jobs.expired_history(24 * 60 * 60, keep_latest=True)
+        assert model.Session.scalar(sa.select(sa.func.count()).select_from(expired.subquery())) == 2
+
+        batches = jobs.iter_history_compaction(24 * 60 * 60, batch_size=1, keep_latest=True)
+        assert len(next(batches)) == 1
+        batches.close()
+        assert len(call_action("files_file_history", id=file["id"])["results"]) == 3
+
+
 @pytest.mark.usefixtures("with_plugins", "clean_db")
 class TestFileOwnerScan:
     def test_filter_by_owner(self, file_factory: types.TestFactory, user: dict[str, Any]):
@@ -445,3 +1030,134 @@ class TestFileOwnerScan:
 
         result = call_action("files_file_scan", owner_type="user", owner_id=fake.unique.uuid4())
         assert result["results"] == []
+
+    def test_newest_first_with_cursor(self, file_factory: types.TestFactory, user: dict[str, Any]):
+        """Owner's files can be listed page by page using cursor."""
+        files = [file_factory(user=user["name"]) for _ in range(3)]
+        file_factory(user="")
+
+        first = call_action(
+            "files_file_scan",
+            owner_type="user",
+            owner_id=user["id"],
+            sort=[["created", "desc"]],
+            rows=2,
+        )
+        assert [f["id"] for f in first["results"]] == [f["id"] for f in files[:0:-1]]
+        assert first["count"] == 3
+
+        second = call_action(
+            "files_file_scan",
+            owner_type="user",
+            owner_id=user["id"],
+            sort=[["created", "desc"]],
+            rows=2,
+            cursor=first["next_cursor"],
+        )
+        assert [f["id"] for f in second["results"]] == [files[0]["id"]]
+
+    def test_cursor_uses_row_comparison(
+        self,
+        file_factory: types.TestFactory,
+        user: dict[str, Any],
+        sql_statements: list[str],
+    ):
+        """Owner's cursor page is selected by the row comparison over listing index."""
+        file_factory.create_batch(2, user=user["name"])
+        first = call_action(
+            "files_file_scan",
+            owner_type="user",
+            owner_id=user["id"],
+            sort=[["created", "desc"]],
+            rows=1,
+        )
+
+        sql_statements.clear()
+        call_action(
+            "files_file_scan",
+            owner_type="user",
+            owner_id=user["id"],
+            sort=[["created", "desc"]],
+            rows=1,
+            cursor=first["next_cursor"],
+        )
+        assert any("(files_owner.file_created, files_owner.file_id) <" in s for s in sql_statements)
+
+    def test_extra_filters(self, file_factory: types.TestFactory, user: dict[str, Any]):
+        """Additional filters are combined with owner filters."""
+        file = file_factory(user=user["name"], name="a.txt")
+        file_factory(user=user["name"], name="b.txt")
+
+        result = call_action(
+            "files_file_scan",
+            owner_type="user",
+            owner_id=user["id"],
+            filters={"name": "a.txt"},
+        )
+        assert result["results"] == [file]
+        assert result["count"] == 1
+
+    def test_count_modes(self, file_factory: types.TestFactory, user: dict[str, Any]):
+        """Files are counted exactly unless summary is requested."""
+        file = file_factory(user=user["name"])
+        file_factory(user=user["name"])
+
+        # file added bypassing API is not reflected by the summary
+        clone = shared.File(name=file["name"], storage=file["storage"], location=fake.unique.file_name())
+        owner = shared.Owner(file_id=clone.id, owner_id=user["id"], owner_type="user")
+        model.Session.add_all([clone, owner])
+        model.Session.commit()
+
+        result = call_action("files_file_scan", owner_type="user", owner_id=user["id"])
+        assert result["count"] == 3
+
+        result = call_action("files_file_scan", owner_type="user", owner_id=user["id"], count="summary")
+        assert result["count"] == 2
+
+        with pytest.raises(tk.ValidationError):
+            call_action(
+                "files_file_scan",
+                owner_type="user",
+                owner_id=user["id"],
+                count="summary",
+                filters={"name": file["name"]},
+            )
+
+
+@pytest.mark.usefixtures("with_plugins", "clean_db")
+class TestStorageStats:
+    def test_summary_follows_actions(self, faker: Faker, file_factory: types.TestFactory, user: dict[str, Any]):
+        """Summary is updated by create, transfer and delete."""
+        file = file_factory(upload=faker.binary(10), user=user)
+        file_factory(upload=faker.binary(20), user="")
+
+        result = call_action("files_storage_stats", group_by=["owner_type"])
+        assert (result["count"], result["size"]) == (2, 30)
+        assert result["groups"] == [
+            {"owner_type": "", "count": 1, "size": 20},
+            {"owner_type": "user", "count": 1, "size": 10},
+        ]
+
+        call_action("files_transfer_ownership", id=file["id"], owner_id="org-id", owner_type="organization")
+        result = call_action("files_storage_stats", owner_type="organization", owner_id="org-id")
+        assert (result["count"], result["size"]) == (1, 10)
+
+        call_action("files_file_delete", id=file["id"])
+        result = call_action("files_storage_stats")
+        assert (result["count"], result["size"]) == (1, 20)
+
+    def test_summary_matches_rebuild(self, faker: Faker, file_factory: types.TestFactory):
+        """Incremental summary is the same as recomputed one."""
+        file_factory.create_batch(3, upload=faker.binary(5))
+        expected = call_action("files_storage_stats", group_by=["storage", "owner_type", "owner_id", "family"])
+
+        for stmt in StorageUsage.rebuild(shared.File.__table__, shared.Owner.__table__):
+            model.Session.execute(stmt)
+        model.Session.commit()
+
+        assert call_action("files_storage_stats", group_by=["storage", "owner_type", "owner_id", "family"]) == expected
+
+    def test_invalid_group(self):
+        """Only known dimensions can be used for grouping."""
+        with pytest.raises(tk.ValidationError):
+            call_action("files_storage_stats", group_by=["name"])
@@ -314,6 +314,85 @@ class TestOwnershipTransfer:
         )
 
 
+@pytest.mark.usefixtures("with_plugins", "clean_db")
+class TestOwnershipTransferMany:
+    def test_owner_is_allowed(
+        self,
+        user: dict[str, Any],
+        file_factory: types.TestFactory,
+        package_factory: types.TestFactory,
+    ):
+        """Owner can transfer own files and missing files are left to the action."""
+        package = package_factory(user=user)
+        files = file_factory.create_batch(3, user=user)
+        tk.check_access(
+            "files_transfer_ownership_many",
+            {"user": user["name"]},
+            {
+                "ids": [file["id"] for file in files] + ["not-a-real-id"],
+                "owner_id": package["id"],
+                "owner_type": "package",
+            },
+        )
+
+    def test_foreign_files_are_not_allowed(
+        self,
+        user: dict[str, Any],
+        file_factory: types.TestFactory,
+        package_factory: types.TestFactory,
+    ):
+        """Files of other owners cannot be transferred without permission."""
+        package = package_factory(user=user)
+        own = file_factory(user=user)
+        foreign = file_factory()
+        with pytest.raises(tk.NotAuthorized):
+            tk.check_access(
+                "files_transfer_ownership_many",
+                {"user": user["name"]},
+                {
+                    "ids": [own["id"], foreign["id"]],
+                    "owner_id": package["id"],
+                    "owner_type": "package",
+                },
+            )
+
+    def test_files_selected_by_owner(
+        self,
+        user_factory: types.TestFactory,
+        file_factory: types.TestFactory,
+        package_factory: types.TestFactory,
+    ):
+        """Files selected by owner pass the same checks as files selected by IDs."""
+        user = user_factory()
+        another = user_factory()
+        package = package_factory(user=user)
+        file_factory.create_batch(2, user=user)
+        file_factory(user=another)
+
+        tk.check_access(
+            "files_transfer_ownership_many",
+            {"user": user["name"]},
+            {
+                "source_owner_id": user["id"],
+                "source_owner_type": "user",
+                "owner_id": package["id"],
+                "owner_type": "package",
+            },
+        )
+
+        with pytest.raises(tk.NotAuthorized):
+            tk.check_access(
+                "files_transfer_ownership_many",
+                {"user": user["name"]},
+                {
+                    "source_owner_id": another["id"],
+                    "source_owner_type": "user",
+                    "owner_id": package["id"],
+                    "owner_type": "package",
+                },
+            )
+
+
 @pytest.mark.usefixtures(
     "with_plugins",
 )
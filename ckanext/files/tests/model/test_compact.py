@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+import sqlalchemy as sa
+from faker import Faker
+
+import ckan.plugins.toolkit as tk
+from ckan import model, types
+from ckan.tests.helpers import call_action  # pyright: ignore[reportUnknownVariableType]
+
+from ckanext.files import shared
+from ckanext.files.model import compact
+
+call_action: Any
+
+
+@pytest.fixture
+def compact_schema():
+    """Convert schema into compact form for the duration of the test."""
+    model.Session.remove()
+    with model.meta.engine.begin() as conn:  # pyright: ignore[reportOptionalMemberAccess]
+        compact.upgrade(conn)
+        compact.register_storages(conn, shared.config.storages())
+    compact.set_mode(True, True)
+
+    yield
+
+    model.Session.remove()
+    with model.meta.engine.begin() as conn:  # pyright: ignore[reportOptionalMemberAccess]
+        compact.downgrade(conn)
+    compact.set_mode(False, False)
+
+
+class TestFileId:
+    def test_text(self):
+        """Values are not modified when IDs are stored as text."""
+        assert compact.FileId().process_bind_param("not-uuid", None) == "not-uuid"
+
+    def test_native(self, monkeypatch: pytest.MonkeyPatch, faker: Faker):
+        """Invalid UUIDs match nothing and empty string is the lowest ID."""
+        monkeypatch.setattr(compact.state, "native_uuid", True)
+        file_id = faker.uuid4()
+        id_type = compact.FileId()
+
+        assert id_type.process_bind_param(file_id, None) == file_id
+        assert id_type.process_bind_param("not-uuid", None) is None
+        assert id_type.process_bind_param("", None) == compact.NIL_UUID
+
+    def test_cache_key(self, monkeypatch: pytest.MonkeyPatch):
+        """Cache key depends on the form of the schema."""
+        id_type = compact.FileId()
+        key = id_type._static_cache_key  # pyright: ignore[reportPrivateUsage]
+
+        monkeypatch.setattr(compact.state, "native_uuid", True)
+        assert id_type._static_cache_key != key  # pyright: ignore[reportPrivateUsage]
+
+
+@pytest.mark.usefixtures("with_plugins", "clean_db")
+class TestCompactSchema:
+    def test_detect(self):
+        """Schema created by migrations uses text columns."""
+        with model.meta.engine.connect() as conn:  # pyright: ignore[reportOptionalMemberAccess]
+            assert compact.detect(conn) == (False, False)
+
+    def test_roundtrip(self, faker: Faker, file_factory: types.TestFactory, user: dict[str, Any]):
+        """Files keep their IDs and storages after conversion and revert."""
+        file = file_factory(user=user["name"], upload=faker.binary(10))
+        model.Session.remove()
+
+        with model.meta.engine.begin() as conn:  # pyright: ignore[reportOptionalMemberAccess]
+            compact.upgrade(conn)
+            compact.register_storages(conn, shared.config.storages())
+            assert compact.detect(conn) == (True, True)
+
+            compact.downgrade(conn)
+            assert compact.detect(conn) == (False, False)
+
+        assert call_action("files_file_show", id=file["id"]) == file
+
+    @pytest.mark.usefixtures("compact_schema")
+    def test_actions(self, faker: Faker, file_factory: types.TestFactory, user: dict[str, Any]):
+        """API works with compact schema in the same way as with text columns."""
+        file = file_factory(user=user["name"], upload=faker.binary(10))
+        assert call_action("files_file_show", id=file["id"]) == file
+
+        result = call_action("files_file_search", filters={"storage": {"$like": file["storage"][:2] + "%"}})
+        assert [item["id"] for item in result["results"]] == [file["id"]]
+
+        result = call_action("files_file_search", filters={"id": {"$in": [file["id"], "not-uuid"]}})
+        assert [item["id"] for item in result["results"]] == [file["id"]]
+
+        with pytest.raises(tk.ObjectNotFound):
+            call_action("files_file_show", id="not-uuid")
+
+        result = call_action("files_file_delete_many", ids=[file["id"]])
+        assert result["deleted"] == [file["id"]]
+
+    @pytest.mark.usefixtures("compact_schema")
+    def test_estimated_count(self, file_factory: types.TestFactory):
+        """Estimated count passes compact values to EXPLAIN."""
+        file = file_factory()
+        result = call_action(
+            "files_file_search",
+            filters={"id": file["id"], "storage": file["storage"], "plugin_data": {"$contains": {"a": 1}}},
+            count="estimate",
+        )
+        assert result["count"] >= 0
+        assert result["results"] == []
+
+        result = call_action("files_file_search", filters={"id": file["id"]}, count="estimate")
+        assert result["count"] == 1
+        assert [item["id"] for item in result["results"]] == [file["id"]]
+
+    @pytest.mark.usefixtures("compact_schema")
+    def test_sort_by_storage(self, file_factory: types.TestFactory):
+        """Files are sorted by names of storages, not by references."""
+        first, second = file_factory.create_batch(2)
+        with model.meta.engine.begin() as conn:  # pyright: ignore[reportOptionalMemberAccess]
+            compact.register_storages(conn, ["aaa"])
+        compact.load_storages()
+
+        model.Session.execute(sa.update(shared.File).where(shared.File.id == second["id"]).values(storage="aaa"))
+        model.Session.commit()
+
+        result = call_action("files_file_search", sort="storage")
+        assert [item["id"] for item in result["results"]] == [second["id"], first["id"]]
+
+        result = call_action("files_file_search", sort="storage", cursor="")
+        assert [item["id"] for item in result["results"]] == [second["id"], first["id"]]
+
+    def test_engine_cache_is_kept(self):
+        """Switch of the schema form does not replace engine-wide cache."""
+        engine: Any = model.meta.engine
+        cache = engine._compiled_cache
+
+        compact.set_mode(True, False)
+        compact.set_mode(False, False)
+        assert engine._compiled_cache is cache
+
+    @pytest.mark.usefixtures("compact_schema")
+    @pytest.mark.ckan_config(f"{shared.config.STORAGE_PREFIX}another.type", "files:redis")
+    def test_storage_registered_on_demand(self, file_factory: types.TestFactory):
+        """Configured storage missing from the dictionary is registered on upload."""
+        with model.meta.engine.begin() as conn:  # pyright: ignore[reportOptionalMemberAccess]
+            conn.execute(sa.delete(compact.storage_table).where(compact.storage_table.c.name == "another"))
+        compact.load_storages()
+
+        file = file_factory(storage="another")
+        assert call_action("files_file_show", id=file["id"])["storage"] == "another"
+        assert "another" in compact.state.storage_ids
+
+        result = call_action("files_file_search", filters={"storage": "not-configured"})
+        assert result["results"] == []
+        assert "not-configured" not in compact.state.storage_ids
@@ -1,15 +1,35 @@
 from __future__ import annotations
 
+import copy
+import timeit
 from typing import Any
 
 import pytest
 from faker import Faker
+from sqlalchemy.orm import joinedload
 
-from ckan import model
+from ckan import model, types
+from ckan.lib.dictization import table_dictize
 
 from ckanext.files.model import File, Owner
 
 
+def _legacy_dictize(file: File, include_plugin_data: bool) -> dict[str, Any]:
+    """Dictization via table_dictize, used before precompiled dictizers."""
+    result = table_dictize(file, {})
+    result["storage_data"] = copy.deepcopy(result["storage_data"])
+    owner = file.owner
+    result["owner_type"] = owner.owner_type if owner else None
+    result["owner_id"] = owner.owner_id if owner else None
+    result["pinned"] = owner.pinned if owner else False
+
+    plugin_data = result.pop("plugin_data")
+    if include_plugin_data:
+        result["plugin_data"] = copy.deepcopy(plugin_data)
+
+    return result
+
+
 @pytest.mark.usefixtures("with_plugins", "clean_db")
 class TestFile:
     def test_cascade_owner(self, user: dict[str, Any], faker: Faker):
@@ -49,3 +69,83 @@ class TestFile:
         model.Session.delete(file)
         model.Session.commit()
         assert not model.Session.get(Owner, owner.file_id)
+
+    @pytest.mark.parametrize("include_plugin_data", [True, False])
+    def test_dictize_matches_table_dictize(
+        self,
+        file_factory: types.TestFactory,
+        user: dict[str, Any],
+        include_plugin_data: bool,
+    ):
+        """Precompiled dictizer produces the same result as table_dictize."""
+        info = file_factory(user=user["name"])
+        file = model.Session.get(File, info["id"])
+        assert file
+        file.storage_data = {"nested": {"list": [1, {"x": None}]}}
+        file.plugin_data = {"flag": True}
+
+        assert file.dictize(include_plugin_data) == _legacy_dictize(file, include_plugin_data)
+        assert file.owner
+        assert file.owner.dictize({}) == table_dictize(file.owner, {})
+
+    def test_dictize_copies_json(self, file_factory: types.TestFactory):
+        """Modification of dictized data does not affect the model."""
+        info = file_factory()
+        file = model.Session.get(File, info["id"])
+        assert file
+        file.storage_data = {"nested": {"value": 1}}
+        file.plugin_data = {"nested": {"value": 1}}
+
+        result = file.dictize(True)
+        result["storage_data"]["nested"]["value"] = 2
+        result["plugin_data"]["nested"]["value"] = 2
+
+        assert file.storage_data == {"nested": {"value": 1}}
+        assert file.plugin_data == {"nested": {"value": 1}}
+
+    def test_owner_is_not_joined_by_default(
+        self,
+        file_factory: types.TestFactory,
+        user: dict[str, Any],
+        sql_statements: list[str],
+    ):
+        """Owner is loaded only on access or when requested explicitly."""
+        info = file_factory(user=user["name"])
+        model.Session.expunge_all()
+
+        sql_statements.clear()
+        file = model.Session.get(File, info["id"])
+        assert file
+        assert len(sql_statements) == 1
+        assert "files_owner" not in sql_statements[0]
+
+        assert file.owner
+        assert len(sql_statements) == 2  # noqa: PLR2004
+
+        model.Session.expunge_all()
+        sql_statements.clear()
+        file = model.Session.get(File, info["id"], options=[joinedload(File.owner)])
+        assert file
+        assert file.owner
+        assert len(sql_statements) == 1
+
+
+@pytest.mark.benchmark
+@pytest.mark.usefixtures("with_plugins", "clean_db")
+def test_dictize_benchmark(file_factory: types.TestFactory, user: dict[str, Any]):
+    """Precompiled dictizer is faster than table_dictize.
+
+    Run with `pytest -m benchmark -s` to see the timing.
+    """
+    info = file_factory(user=user["name"])
+    file = model.Session.get(File, info["id"])
+    assert file
+    file.storage_data = {"meta": {f"key{i}": list(range(5)) for i in range(20)}}
+
+    number = 10_000
+    legacy = timeit.timeit(lambda: _legacy_dictize(file, False), number=number)
+    current = timeit.timeit(lambda: file.dictize(False), number=number)
+    print(f"table_dictize: {legacy:.3f}s, dictizer: {current:.3f}s, {number} calls")  # noqa: T201
+
+    assert file.dictize(False) == _legacy_dictize(file, False)
+    assert current < legacy
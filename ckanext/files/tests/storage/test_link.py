@@ -1,8 +1,17 @@
+from __future__ import annotations
+
+from typing import Any
+
 import pytest
 from faker import Faker
 from responses import RequestsMock
 
-from ckanext.files import shared
+from ckan import model
+from ckan.tests.helpers import call_action  # pyright: ignore[reportUnknownVariableType]
+
+from ckanext.files import jobs, shared
+
+call_action: Any
 
 
 @pytest.mark.usefixtures("with_plugins")
@@ -87,3 +96,77 @@ class TestStorage:
 
         assert data.location == location
         assert data.storage_data["url"] == url
+
+    def test_revalidate_not_modified(self, faker: Faker):
+        """Test that unchanged link is not updated.
+
+        Given a link with known ETag, when remote server confirms that
+        resource is not modified, then nothing is returned.
+        """
+        storage = shared.make_storage("test", {"type": "files:link"})
+
+        url = faker.url()
+        data = shared.FileData(shared.Location(faker.file_name()), hash='"abc"', storage_data={"url": url})
+
+        with RequestsMock() as rsps:
+            rsps.add("HEAD", url, status=304)
+            assert storage.revalidate(data) is None
+
+            assert rsps.calls[0].request.headers["If-None-Match"] == '"abc"'
+
+    def test_revalidate_modified(self, faker: Faker):
+        """Test that modified link produces fresh details.
+
+        Given a link with known ETag, when remote resource is changed, then
+        details of the link are updated.
+        """
+        storage = shared.make_storage("test", {"type": "files:link"})
+
+        url = faker.url()
+        data = shared.FileData(shared.Location(faker.file_name()), hash='"abc"', storage_data={"url": url})
+
+        with RequestsMock() as rsps:
+            rsps.add(
+                "HEAD",
+                url,
+                headers={"etag": '"xyz"', "content-length": "42", "content-type": "text/csv; charset=utf-8"},
+            )
+            result = storage.revalidate(data)
+
+        assert result
+        assert result.hash == '"xyz"'
+        assert result.size == 42
+        assert result.content_type == "text/csv"
+        assert result.storage_data["url"] == url
+
+
+@pytest.mark.usefixtures("with_plugins", "clean_db")
+@pytest.mark.ckan_config(f"{shared.config.STORAGE_PREFIX}link.type", "files:link")
+class TestRevalidationJob:
+    def test_bulk_update(self, faker: Faker):
+        """Only modified links are updated, unreachable links keep old details."""
+        urls = [faker.unique.url() for _ in range(3)]
+        headers = {"etag": '"v1"', "content-length": "1", "content-type": "text/plain"}
+
+        with RequestsMock() as rsps:
+            for url in urls:
+                rsps.add("HEAD", url, headers=headers)
+            unchanged, changed, failed = [
+                call_action("files_file_create", storage="link", name=f"{idx}.txt", upload=url)
+                for idx, url in enumerate(urls)
+            ]
+
+        with RequestsMock() as rsps:
+            rsps.add("HEAD", urls[0], status=304)
+            rsps.add("HEAD", urls[1], headers={"etag": '"v2"', "content-length": "2", "content-type": "text/csv"})
+            rsps.add("HEAD", urls[2], status=500)
+
+            assert list(jobs.iter_link_revalidation("link", workers=2)) == [(3, 1)]
+
+        model.Session.expire_all()
+        result = call_action("files_file_show", id=changed["id"])
+        assert (result["size"], result["content_type"], result["hash"]) == (2, "text/csv", '"v2"')
+
+        for info in [unchanged, failed]:
+            result = call_action("files_file_show", id=info["id"])
+            assert (result["size"], result["content_type"], result["hash"]) == (1, "text/plain", '"v1"')
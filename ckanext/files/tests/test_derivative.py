@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from io import BytesIO
+from typing import Any
+
+import pytest
+
+import ckan.plugins.toolkit as tk
+from ckan import types
+from ckan.tests import factories
+
+from ckanext.files import derivative, shared
+from ckanext.files.derivative import Preset, location
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _png(width: int, height: int) -> bytes:
+    buff = BytesIO()
+    Image.new("RGB", (width, height)).save(buff, format="png")
+    return buff.getvalue()
+
+
+class TestPreset:
+    def test_minimal(self):
+        """Format and quality have default values."""
+        assert Preset.parse("thumb:64x32") == Preset("thumb", 64, 32, "webp", 80)
+
+    def test_full(self):
+        """All parts of the preset can be specified."""
+        assert Preset.parse("big:800X600:JPG:95") == Preset("big", 800, 600, "jpeg", 95)
+
+    @pytest.mark.parametrize("value", ["thumb", "thumb:64", "thumb:axb", "thumb:64x64:png:best"])
+    def test_invalid(self, value: str):
+        """Wrong format produces ValueError."""
+        with pytest.raises(ValueError):  # noqa: PT011
+            Preset.parse(value)
+
+
+def test_location_depends_on_hash():
+    """Location changes together with the hash of the original."""
+    preset = Preset("thumb", 64, 64)
+    first = location(shared.FileData(shared.Location("a.png"), hash='"abc"'), preset)
+    second = location(shared.FileData(shared.Location("a.png"), hash="xyz"), preset)
+
+    assert first == "abc/thumb-64x64-q80.webp"
+    assert second == "xyz/thumb-64x64-q80.webp"
+
+
+def test_location_depends_on_preset():
+    """Location and version change together with parameters of the preset."""
+    data = shared.FileData(shared.Location("a.png"), hash="abc")
+    small = Preset("thumb", 64, 64)
+    big = Preset("thumb", 128, 128)
+
+    assert location(data, small) != location(data, big)
+    assert derivative.version("abc", small) != derivative.version("abc", big)
+
+
+@pytest.mark.usefixtures("with_plugins", "clean_db", "clean_redis")
+@pytest.mark.ckan_config(shared.config.DERIVATIVES_STORAGE, "test")
+@pytest.mark.ckan_config(shared.config.DERIVATIVES_PRESETS, "thumb:8x8:png")
+class TestDerivative:
+    def test_generate(self):
+        """Image is resized and uploaded into destination."""
+        storage = shared.get_storage()
+        source = storage.upload(shared.Location("original.png"), shared.make_upload(_png(32, 16)))
+        preset = derivative.presets()["thumb"]
+
+        data = derivative.generate(storage, source, storage, location(source, preset), preset)
+
+        with Image.open(BytesIO(storage.content(data))) as image:
+            assert image.size == (8, 4)
+
+    def test_corrupted(self):
+        """Invalid image produces ContentError."""
+        storage = shared.get_storage()
+        source = storage.upload(shared.Location("broken.png"), shared.make_upload(b"\x89PNG\r\n\x1a\nbroken"))
+        preset = derivative.presets()["thumb"]
+
+        with pytest.raises(shared.exc.ContentError):
+            derivative.generate(storage, source, storage, location(source, preset), preset)
+
+    def test_route(self, app: Any, file_factory: types.TestFactory):
+        """Derivative is served with long-term caching from versioned URL."""
+        file = file_factory(upload=_png(32, 32), name="image.png")
+        with app.flask_app.test_request_context():
+            url = tk.h.files_derivative_url(file, "thumb")
+            outdated = tk.url_for("files.derivative_download", file_id=file["id"], preset="thumb", v="outdated")
+
+        headers = {"Authorization": factories.SysadminWithToken()["token"]}
+        resp = app.get(url, headers=headers)
+        assert resp.status_code == 200
+        assert "immutable" in resp.headers["cache-control"]
+
+        resp = app.get(outdated, headers=headers, follow_redirects=False)
+        assert resp.status_code == 302
+        assert resp.headers["location"].endswith(url)
+
+    def test_route_corrupted(self, app: Any, file_factory: types.TestFactory):
+        """Broken image does not cause server error."""
+        file = file_factory(upload=b"\x89PNG\r\n\x1a\nbroken", name="image.png")
+        with app.flask_app.test_request_context():
+            url = tk.url_for(
+                "files.derivative_download",
+                file_id=file["id"],
+                preset="thumb",
+                v=derivative.version(file["hash"], derivative.presets()["thumb"]),
+            )
+
+        headers = {"Authorization": factories.SysadminWithToken()["token"]}
+        assert app.get(url, headers=headers).status_code == 422
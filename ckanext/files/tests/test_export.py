@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+import ckan.plugins.toolkit as tk
+from ckan import model, types
+
+from ckanext.files import export
+
+
+class TestSerialize:
+    def test_ndjson(self):
+        """Every record is a separate JSON line."""
+        created = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        chunks = list(export.serialize("ndjson", ["id", "created"], [("a", created), ("b", None)]))
+        assert [json.loads(chunk) for chunk in chunks] == [
+            {"id": "a", "created": created.isoformat()},
+            {"id": "b", "created": None},
+        ]
+
+    def test_csv(self):
+        """Header is added and nested values are serialized as JSON."""
+        result = "".join(export.serialize("csv", ["id", "storage_data"], [("a", {"x": 1})]))
+        assert result.splitlines() == ["id,storage_data", 'a,"{""x"": 1}"']
+
+    def test_csv_without_records(self):
+        """Header is produced even when nothing matches filters."""
+        assert "".join(export.serialize("csv", ["id"], [])).strip() == "id"
+
+    def test_unknown_format(self):
+        """Unsupported format produces ValidationError."""
+        with pytest.raises(tk.ValidationError):
+            export.serialize("xml", ["id"], [])
+
+
+@pytest.mark.usefixtures("with_plugins", "clean_db")
+class TestStatement:
+    def test_filters(self, file_factory: types.TestFactory):
+        """Export uses the same filters as search."""
+        file = file_factory(name="a.txt", user="")
+        file_factory(name="b.txt")
+
+        stmt = export.statement({"name": "a.txt"}, ["id", "name", "owner_id"])
+        assert list(export.rows(model.Session, stmt, 1)) == [(file["id"], "a.txt", None)]
+
+    def test_invalid_field(self):
+        """Unknown fields are rejected."""
+        with pytest.raises(tk.ValidationError):
+            export.statement({}, ["id", "not-a-field"])
+
+    def test_plugin_data_is_protected(self):
+        """plugin_data is exported only on explicit request."""
+        with pytest.raises(tk.ValidationError):
+            export.statement({}, ["plugin_data"])
+
+        assert export.statement({}, ["plugin_data"], True) is not None
+
+    def test_invalid_filter_value(self, file_factory: types.TestFactory):
+        """Filters rejected by DB produce ValidationError before streaming."""
+        fileobj = file_factory.model()
+        fileobj.plugin_data = {"count": "many"}
+        model.Session.commit()
+
+        stmt = export.statement({"plugin_data": {"count": {"$gt": 1}}}, ["id"], True)
+        with pytest.raises(tk.ValidationError):
+            export.rows(model.Session, stmt)
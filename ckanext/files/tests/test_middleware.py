@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from io import BytesIO
+from typing import Any
+
+import pytest
+from werkzeug.test import EnvironBuilder
+
+from ckanext.files import shared
+from ckanext.files.middleware import UploadGate
+
+
+def _app(environ: dict[str, Any], start_response: Any):
+    start_response("200 OK", [])
+    return [environ["wsgi.input"].read()]
+
+
+def _call(path: str, content: bytes, query: str = "", **fields: Any):
+    environ = EnvironBuilder(
+        path=path,
+        method="POST",
+        query_string=query,
+        data={**fields, "upload": (BytesIO(content), "file.bin")},
+    ).get_environ()
+    statuses: list[str] = []
+    body = b"".join(UploadGate(_app)(environ, lambda status, headers: statuses.append(status)))
+    return statuses[0], body
+
+
+@pytest.mark.usefixtures("with_plugins")
+class TestUploadGate:
+    def test_unrelated_route(self):
+        """Routes without uploads are not affected."""
+        status, _body = _call("/dataset/new", b"x" * 1024 * 1024)
+        assert status == "200 OK"
+
+    @pytest.mark.ckan_config(f"{shared.config.STORAGE_PREFIX}test.max_size", "10")
+    def test_oversized(self):
+        """Uploads that are significantly larger than the limit are rejected."""
+        status, body = _call("/api/action/files_file_create", b"x" * 1024 * 1024)
+        assert status.startswith("413")
+        assert b"Validation Error" in body
+
+    @pytest.mark.ckan_config(f"{shared.config.STORAGE_PREFIX}test.supported_types", "image")
+    def test_unsupported_type(self):
+        """Content type is detected from the beginning of the file."""
+        status, _body = _call("/api/3/action/files_file_create", b"hello world")
+        assert status.startswith("415")
+
+    @pytest.mark.ckan_config(f"{shared.config.STORAGE_PREFIX}test.supported_types", "text")
+    def test_body_is_preserved(self):
+        """Request body consumed during sniffing is available to the app."""
+        status, body = _call("/api/action/files_file_create", b"hello world")
+        assert status == "200 OK"
+        assert b"hello world" in body
+
+    @pytest.mark.ckan_config(f"{shared.config.STORAGE_PREFIX}test.max_size", "10")
+    @pytest.mark.ckan_config(f"{shared.config.STORAGE_PREFIX}another.type", "files:redis")
+    def test_storage_in_body(self):
+        """Storage from the body is unknown, so the most permissive limits are used."""
+        status, _body = _call("/api/action/files_file_create", b"x" * 1024 * 1024, storage="another")
+        assert status == "200 OK"
+
+    @pytest.mark.ckan_config(f"{shared.config.STORAGE_PREFIX}test.max_size", "10")
+    @pytest.mark.ckan_config(f"{shared.config.STORAGE_PREFIX}another.type", "files:redis")
+    @pytest.mark.ckan_config(f"{shared.config.STORAGE_PREFIX}another.max_size", "10")
+    def test_all_storages_restricted(self):
+        """Upload is rejected when no storage can accept it."""
+        status, _body = _call("/api/action/files_file_create", b"x" * 1024 * 1024, storage="another")
+        assert status.startswith("413")
+
+    @pytest.mark.usefixtures("clean_db", "clean_redis")
+    @pytest.mark.ckan_config(f"{shared.config.STORAGE_PREFIX}test.max_size", "10")
+    @pytest.mark.ckan_config(f"{shared.config.STORAGE_PREFIX}another.type", "files:redis")
+    def test_replace_uses_file_storage(self, file: dict[str, Any]):
+        """Storage from the query string does not affect replacement."""
+        status, _body = _call(
+            "/api/action/files_file_replace",
+            b"x" * 1024 * 1024,
+            f"id={file['id']}&storage=another",
+        )
+        assert status.startswith("413")
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+import sqlalchemy as sa
+
+import ckan.plugins.toolkit as tk
+from ckan import model, types
+from ckan.common import session
+from ckan.tests.helpers import call_action  # pyright: ignore[reportUnknownVariableType]
+
+from ckanext.files import replica, shared
+
+call_action: Any
+
+
+@pytest.fixture
+def with_replica(monkeypatch: pytest.MonkeyPatch, ckan_config: dict[str, Any]):
+    """Use primary DB as a replica."""
+    monkeypatch.setitem(ckan_config, shared.config.REPLICA_URL, tk.config["sqlalchemy.url"])
+    replica.install()
+    yield
+    replica.uninstall()
+
+
+@pytest.mark.usefixtures("with_plugins", "clean_db")
+class TestRoute:
+    def test_disabled(self, app: Any):
+        """Without replica reads use primary session."""
+        context: types.Context = {}
+        with app.flask_app.test_request_context():
+            assert replica.route(context) is context
+
+    @pytest.mark.usefixtures("with_replica")
+    def test_outside_of_request(self):
+        """CLI commands and jobs always read from primary."""
+        context: types.Context = {}
+        assert replica.route(context) is context
+
+    @pytest.mark.usefixtures("with_replica")
+    def test_routed(self, app: Any, file: dict[str, Any]):
+        """Read-only actions use replica session."""
+        with app.flask_app.test_request_context():
+            context = replica.route({})
+            assert context["session"] is not model.Session
+            assert call_action("files_file_show", id=file["id"]) == file
+
+    @pytest.mark.usefixtures("with_replica")
+    def test_custom_session(self, app: Any):
+        """Explicitly passed session is never replaced."""
+        context: types.Context = {"session": model.meta.create_local_session()}  # pyright: ignore[reportAttributeAccessIssue]
+        with app.flask_app.test_request_context():
+            assert replica.route(context) is context
+
+    @pytest.mark.usefixtures("with_replica")
+    def test_read_your_writes(self, app: Any, file_factory: types.TestFactory):
+        """Reads are pinned to primary after a write."""
+        with app.flask_app.test_request_context():
+            file_factory()
+            assert replica.get_session() is model.Session
+
+            session.pop(replica.PIN_KEY)
+            assert replica.get_session() is not model.Session
+
+    def test_listeners_without_replica(self):
+        """Writes are not tracked when replica is not configured."""
+        assert not sa.event.contains(model.Session, "after_commit", replica._pin_after_commit)  # pyright: ignore[reportPrivateUsage]
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import uuid
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+import ckan.plugins.toolkit as tk
+from ckan import types
+from ckan.tests.helpers import call_action  # pyright: ignore[reportUnknownVariableType]
+
+from ckanext.files import search_index
+
+
+class TestCompile:
+    def test_empty(self):
+        """Empty filters match everything."""
+        assert search_index._compile({}) == "*:*"  # pyright: ignore[reportPrivateUsage]
+
+    def test_values(self):
+        """Plain values and lists become exact matches."""
+        query = search_index._compile(  # pyright: ignore[reportPrivateUsage]
+            {"storage": "default", "family": ["image", "text"]},
+        )
+        assert query == '(files_storage:"default" AND files_family:("image" OR "text"))'
+
+    def test_operators(self):
+        """Comparison operators become ranges and negations."""
+        query = search_index._compile(  # pyright: ignore[reportPrivateUsage]
+            {"$or": [{"owner_id": None}, {"created": {"$gte": "2024-01-01T00:00:00+02:00"}}]},
+        )
+        assert query == ('((((*:* -files_owner_id:[* TO *])) OR (metadata_created:["2023-12-31T22:00:00Z" TO *])))')
+
+    @pytest.mark.parametrize(
+        "filters",
+        [{"size": 10}, {"plugin_data": {"a": 1}}, {"name": {"$like": "a%"}}, {"created": "yesterday"}],
+    )
+    def test_unsupported(self, filters: dict[str, object]):
+        """Filters that cannot be served by index produce ValidationError."""
+        with pytest.raises(tk.ValidationError):
+            search_index._compile(filters)  # pyright: ignore[reportPrivateUsage]
+
+
+@pytest.mark.usefixtures("with_plugins", "clean_db")
+class TestDocument:
+    def test_document(self, file_factory: types.TestFactory):
+        """Documents contain indexed fields and never match package search."""
+        fileobj = file_factory.model(user="")
+        doc = search_index.as_document(fileobj)
+
+        assert doc["id"] == fileobj.id
+        assert doc["entity_type"] == doc["state"] == "file"
+        assert doc["files_family"] == fileobj.content_type.split("/")[0]
+        assert "files_owner_id" not in doc
+
+    def test_disabled_backend(self):
+        """Index backend cannot be used when index is disabled."""
+        with pytest.raises(tk.ValidationError):
+            call_action("files_file_search", backend="index")
+
+
+class FakeConnection:
+    """Solr connection that records search params and returns given IDs."""
+
+    def __init__(self, ids: list[str]):
+        self.ids = ids
+        self.params: dict[str, Any] = {}
+
+    def add(self, **kwargs: Any):
+        pass
+
+    def delete(self, **kwargs: Any):
+        pass
+
+    def search(self, q: str, **params: Any):
+        self.params = params
+        return SimpleNamespace(
+            docs=[{"id": file_id} for file_id in self.ids],
+            hits=len(self.ids),
+            facets={"facet_fields": {"files_storage": ["default", len(self.ids)]}},
+        )
+
+
+@pytest.mark.usefixtures("with_plugins", "clean_db")
+@pytest.mark.ckan_config("ckanext.files.search_index.enabled", True)
+class TestIndexBackend:
+    def test_search(self, file_factory: types.TestFactory, monkeypatch: pytest.MonkeyPatch):
+        """Files found by index are loaded from DB in the order of index."""
+        first = file_factory()
+        second = file_factory()
+
+        conn = FakeConnection([second["id"], str(uuid.uuid4()), first["id"]])
+        monkeypatch.setattr(search_index, "make_connection", lambda: conn)
+
+        result = call_action(
+            "files_file_search",
+            backend="index",
+            filters={"storage": "default"},
+            facets=["storage"],
+        )
+
+        assert [item["id"] for item in result["results"]] == [second["id"], first["id"]]
+        assert result["count"] == 3
+        assert result["facets"] == {"storage": {"default": 3}}
+        assert 'files_storage:"default"' in conn.params["fq"][-1]
+
+    def test_unavailable(self, monkeypatch: pytest.MonkeyPatch):
+        """Errors of Solr are reported as validation errors."""
+
+        def make_connection():
+            raise ConnectionError
+
+        monkeypatch.setattr(search_index, "make_connection", make_connection)
+
+        with pytest.raises(tk.ValidationError):
+            call_action("files_file_search", backend="index")
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+
+from ckan import model
+from ckan.tests.helpers import call_action  # pyright: ignore[reportUnknownVariableType]
+
+from ckanext.files import shared
+from ckanext.files.transfer import Checkpoint, TransferEngine
+
+call_action: Any
+
+
+class TestCheckpoint:
+    def test_missing_file(self, tmp_path: Any):
+        """Missing checkpoint file produces empty checkpoint."""
+        checkpoint = Checkpoint.load(str(tmp_path / "checkpoint.json"))
+        assert checkpoint.last_id == ""
+        assert checkpoint.failed == {}
+
+    def test_roundtrip(self, tmp_path: Any):
+        """Saved checkpoint can be restored."""
+        path = str(tmp_path / "checkpoint.json")
+        Checkpoint(path, "xxx", {"yyy": "error"}).save()
+
+        checkpoint = Checkpoint.load(path)
+        assert checkpoint.last_id == "xxx"
+        assert checkpoint.failed == {"yyy": "error"}
+
+    def test_storages(self, tmp_path: Any):
+        """Checkpoint cannot be reused for transfer between other storages."""
+        path = str(tmp_path / "checkpoint.json")
+        checkpoint = Checkpoint(path)
+        checkpoint.bind("a", "b")
+        checkpoint.save()
+
+        checkpoint = Checkpoint.load(path)
+        checkpoint.bind("a", "b")
+        with pytest.raises(ValueError):  # noqa: PT011
+            checkpoint.bind("a", "c")
+
+
+@pytest.mark.usefixtures("with_plugins", "clean_db", "clean_redis")
+@pytest.mark.ckan_config(f"{shared.config.STORAGE_PREFIX}another.type", "files:redis")
+@pytest.mark.ckan_config(f"{shared.config.STORAGE_PREFIX}another.path", "another")
+class TestTransferEngine:
+    def test_transfer(self, file_factory: Any, tmp_path: Any):
+        """Files are moved into destination and progress is recorded."""
+        files = [file_factory() for _ in range(3)]
+        path = str(tmp_path / "checkpoint.json")
+
+        engine = TransferEngine("test", "another", remove=True, batch_size=2, checkpoint=Checkpoint.load(path))
+        assert engine.count() == 3
+
+        reports = list(engine.run())
+        assert len(reports) == 2
+        assert reports[-1].transferred == 3
+
+        for info in files:
+            fileobj = model.Session.get(shared.File, info["id"])
+            assert fileobj
+            assert fileobj.storage == "another"
+            assert shared.get_storage("another").content(shared.FileData.from_object(fileobj))
+
+        assert Checkpoint.load(path).last_id == max(info["id"] for info in files)
+
+    def test_resume(self, file_factory: Any):
+        """Files before the checkpoint are skipped."""
+        first, second = sorted((file_factory() for _ in range(2)), key=lambda info: info["id"])
+
+        engine = TransferEngine("test", "another", checkpoint=Checkpoint(last_id=first["id"]))
+        assert engine.count() == 1
+        list(engine.run())
+
+        assert call_action("files_file_show", id=first["id"])["storage"] == "test"
+        assert call_action("files_file_show", id=second["id"])["storage"] == "another"
+
+    def test_retry_failed(self, file_factory: Any):
+        """Failed files are processed only when retry is requested."""
+        info = file_factory()
+        engine = TransferEngine("test", "another", checkpoint=Checkpoint(last_id=info["id"], failed={info["id"]: ""}))
+
+        assert engine.count() == 0
+        assert engine.count(retry_failed=True) == 1
+
+        list(engine.run(retry_failed=True))
+        assert call_action("files_file_show", id=info["id"])["storage"] == "another"
+        assert not engine.checkpoint.failed
+
+    def test_synthetic(self):
+        """Storages without own implementation of copy_from use synthetic transfer."""
+        engine = TransferEngine("test", "another")
+        assert not engine.server_side
+        assert engine.is_supported()
+
+    def test_source_removal_error(self, file_factory: Any, monkeypatch: pytest.MonkeyPatch):
+        """Copied file that cannot be removed from source is still transferred."""
+        info = file_factory()
+        engine = TransferEngine("test", "another", remove=True)
+        monkeypatch.setattr(engine, "server_side", True)
+        monkeypatch.setattr(engine.dest, "copy_from", lambda location, data, source: data)
+
+        def remove(data: shared.FileData):
+            msg = "denied"
+            raise RuntimeError(msg)
+
+        monkeypatch.setattr(engine.src, "remove", remove)
+
+        reports = list(engine.run())
+        assert reports[-1].transferred == 1
+        assert engine.checkpoint.leftovers == {info["id"]: "denied"}
+        assert not engine.checkpoint.failed
+        assert call_action("files_file_show", id=info["id"])["storage"] == "another"
+
+    def test_storage_usage(self, faker: Any, file_factory: Any):
+        """Usage summary follows transferred files."""
+        file_factory(upload=faker.binary(10))
+        list(TransferEngine("test", "another").run())
+
+        stats = call_action("files_storage_stats", storage="test")
+        assert (stats["count"], stats["size"]) == (0, 0)
+
+        stats = call_action("files_storage_stats", storage="another")
+        assert (stats["count"], stats["size"]) == (1, 10)
+
+    @pytest.mark.ckan_config(shared.config.SOFT_DELETE, True)
+    def test_deleted(self, file_factory: Any):
+        """Soft-deleted files are not transferred."""
+        info = file_factory()
+        call_action("files_file_delete", id=info["id"])
+
+        engine = TransferEngine("test", "another")
+        assert engine.count() == 0
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import base64
 from collections.abc import Iterable
 
 import pytest
@@ -21,3 +22,22 @@ from ckanext.files import utils
 )
 def test_is_supported_type(type: str, supported: Iterable[str], outcome: bool):
     assert utils.is_supported_type(type, supported) is outcome
+
+
+class TestDecodeDataUrl:
+    @pytest.mark.ckan_config("ckanext.files.upload.spool_threshold", 10)
+    def test_large_payload(self, monkeypatch: pytest.MonkeyPatch):
+        """Payload is decoded in chunks and moved to disk over the threshold."""
+        content = b"hello world" * 100_000
+        monkeypatch.setattr(utils, "BASE64_CHUNK_SIZE", 1024)
+
+        spool = utils.decode_data_url("data:text/plain;base64," + base64.b64encode(content).decode())
+
+        assert spool.read() == content
+        assert spool._rolled  # pyright: ignore[reportAttributeAccessIssue]
+
+    @pytest.mark.parametrize("value", ["data:text/plain,hello", "hello", "data:text/plain;base64,!!!!"])
+    def test_invalid(self, value: str):
+        """Only valid base64-encoded data URLs are accepted."""
+        with pytest.raises(ValueError):  # noqa: PT011
+            utils.decode_data_url(value)
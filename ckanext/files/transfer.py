@@ -0,0 +1,378 @@
+"""Transfer of files between storages.
+
+Files are processed in batches ordered by ID. Storage operations for the items
+of the batch run concurrently, while DB changes are applied from the main
+thread and committed once per batch. After every batch the progress is
+recorded in the checkpoint, so that interrupted transfer can be resumed
+without re-processing completed files.
+
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import json
+import logging
+import os
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import sqlalchemy as sa
+from sqlalchemy.orm import selectinload
+
+from ckan import model
+
+from ckanext.files import search_index, shared
+from ckanext.files.base import Storage
+from ckanext.files.model import StorageUsage
+
+log = logging.getLogger(__name__)
+
+# storage, owner type, owner ID and family of the storage usage group
+_UsageKey = tuple[str, str, str, str]
+
+
+@dataclasses.dataclass
+class Checkpoint:
+    """Progress of the transfer.
+
+    When `path` is set, checkpoint is persisted into JSON file after every
+    batch. Otherwise, it exists only in memory during the transfer.
+    """
+
+    path: str | None = None
+    last_id: str = ""
+    """ID of the last processed file."""
+
+    failed: dict[str, str] = dataclasses.field(default_factory=dict)
+    """Files that were not transferred, mapped to the error message."""
+
+    src: str = ""
+    """Name of the source storage."""
+
+    dest: str = ""
+    """Name of the destination storage."""
+
+    leftovers: dict[str, str] = dataclasses.field(default_factory=dict)
+    """Transferred files that remain in the source storage, mapped to the error message."""
+
+    @classmethod
+    def load(cls, path: str | None) -> Checkpoint:
+        """Restore checkpoint from the file.
+
+        Missing file produces an empty checkpoint.
+        """
+        if not path or not os.path.exists(path):
+            return cls(path)
+
+        with open(path) as src:
+            data: dict[str, Any] = json.load(src)
+
+        return cls(
+            path,
+            data.get("last_id", ""),
+            data.get("failed", {}),
+            data.get("src", ""),
+            data.get("dest", ""),
+            data.get("leftovers", {}),
+        )
+
+    def bind(self, src: str, dest: str):
+        """Associate checkpoint with the pair of storages.
+
+        Raises:
+            ValueError: checkpoint belongs to the transfer between other storages
+        """
+        if (self.src or self.dest) and (self.src, self.dest) != (src, dest):
+            msg = f"Checkpoint belongs to the transfer from {self.src} to {self.dest}"
+            raise ValueError(msg)
+
+        self.src = src
+        self.dest = dest
+
+    def save(self):
+        """Persist the checkpoint.
+
+        Content is written into temporary file, that replaces the checkpoint
+        only when it's completely written.
+        """
+        if not self.path:
+            return
+
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as dest:
+            json.dump(
+                {
+                    "last_id": self.last_id,
+                    "failed": self.failed,
+                    "src": self.src,
+                    "dest": self.dest,
+                    "leftovers": self.leftovers,
+                },
+                dest,
+            )
+
+        os.replace(tmp, self.path)
+
+
+@dataclasses.dataclass
+class TransferStats:
+    """Progress report of the transfer."""
+
+    total: int
+    transferred: int = 0
+    failed: int = 0
+    bytes: int = 0
+    started: float = dataclasses.field(default_factory=time.monotonic)
+
+    @property
+    def processed(self) -> int:
+        return self.transferred + self.failed
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self) -> float:
+        """Number of files processed per second."""
+        elapsed = self.elapsed
+        return self.processed / elapsed if elapsed else 0
+
+    @property
+    def eta(self) -> float | None:
+        """Expected number of seconds until transfer is complete."""
+        rate = self.rate
+        if not rate:
+            return None
+
+        return max(self.total - self.processed, 0) / rate
+
+
+class SourceRemovalError(Exception):
+    """File is copied into destination, but cannot be removed from source."""
+
+    def __init__(self, data: shared.FileData, error: Exception):
+        super().__init__(str(error))
+        self.data = data
+
+
+class TransferEngine:
+    """Move or copy files between storages.
+
+    If both storages use the same adapter, engine attempts backend-side copy
+    via `Storage.copy_from` and switches to synthetic copy/move when it's not
+    supported.
+
+    Args:
+        src: name of the source storage
+        dest: name of the destination storage
+        remove: remove files from the source storage after transfer
+        workers: number of concurrent storage operations
+        batch_size: number of files committed at once
+        checkpoint: progress of the previous transfer
+
+    Raises:
+        ValueError: checkpoint belongs to the transfer between other storages
+
+    Example:
+        ```python
+        engine = TransferEngine("local", "s3", checkpoint=Checkpoint.load("/tmp/transfer.json"))
+        for stats in engine.run():
+            print(f"{stats.processed}/{stats.total}")
+        ```
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        src: str,
+        dest: str,
+        *,
+        remove: bool = False,
+        workers: int = 4,
+        batch_size: int = 100,
+        checkpoint: Checkpoint | None = None,
+    ):
+        self.src_name = src
+        self.dest_name = dest
+        self.src = shared.get_storage(src)
+        self.dest = shared.get_storage(dest)
+        self.remove = remove
+        self.workers = workers
+        self.batch_size = batch_size
+        self.checkpoint = checkpoint or Checkpoint()
+        self.checkpoint.bind(src, dest)
+
+        # base implementation of `copy_from` always fails, so server-side
+        # copy is possible only when the adapter overrides it
+        copy_from = getattr(type(self.dest), "copy_from", None)
+        self.server_side = type(self.src) is type(self.dest) and copy_from not in (None, Storage.copy_from)
+
+    def is_supported(self) -> bool:
+        """Check if source storage can transfer files into destination."""
+        if self.server_side:
+            return True
+
+        capability = shared.Capability.MOVE if self.remove else shared.Capability.COPY
+        return self.src.supports_synthetic(capability, self.dest)
+
+    def transfer(self, data: shared.FileData) -> shared.FileData:
+        """Transfer a single file.
+
+        This method does not modify DB and can be called from worker threads.
+        When server-side copy of the file is not supported, it's transferred
+        via synthetic copy/move.
+
+        Raises:
+            SourceRemovalError: file was copied, but cannot be removed from source
+        """
+        if self.server_side:
+            try:
+                result = self.dest.copy_from(data.location, data, self.src)  # pyright: ignore[reportAttributeAccessIssue]
+            except shared.exc.UnsupportedOperationError:
+                log.debug("Server-side copy of %s is not supported", data.location)
+            else:
+                if self.remove:
+                    try:
+                        self.src.remove(data)
+                    # copy already exists in destination, so the file must be
+                    # recorded as transferred, otherwise retries will fail
+                    except Exception as err:  # noqa: BLE001
+                        raise SourceRemovalError(result, err) from err
+                return result
+
+        if self.remove:
+            return self.src.move_synthetic(data.location, data, self.dest)
+
+        return self.src.copy_synthetic(data.location, data, self.dest)
+
+    def count(self, ids: Iterable[str] = (), retry_failed: bool = False) -> int:
+        """Count files that will be processed by the transfer."""
+        stmt = sa.select(sa.func.count(shared.File.id)).where(self._pending(ids, retry_failed))
+        return model.Session.scalar(stmt) or 0
+
+    def run(self, ids: Iterable[str] = (), retry_failed: bool = False) -> Iterator[TransferStats]:
+        """Transfer files, reporting progress after every batch.
+
+        Files that failed during previous runs are skipped, unless
+        `retry_failed` flag is enabled.
+
+        Args:
+            ids: transfer only files with the given IDs
+            retry_failed: include failed files from the checkpoint
+
+        Yields:
+            transfer stats
+        """
+        ids = list(ids)
+        stats = TransferStats(self.count(ids, retry_failed))
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            if retry_failed:
+                failed = [id for id in self.checkpoint.failed if not ids or id in ids]
+                for start in range(0, len(failed), self.batch_size):
+                    stmt = (
+                        sa.select(shared.File)
+                        .where(
+                            shared.File.storage == self.src_name,
+                            shared.File.deleted_at.is_(None),
+                            shared.File.id.in_(failed[start : start + self.batch_size]),
+                        )
+                        .options(selectinload(shared.File.owner))
+                        .order_by(shared.File.id)
+                    )
+                    self._process(pool, model.Session.scalars(stmt).all(), stats)
+                    yield stats
+
+            stmt = (
+                sa.select(shared.File)
+                .where(self._pending(ids))
+                .options(selectinload(shared.File.owner))
+                .order_by(shared.File.id)
+                .limit(self.batch_size)
+            )
+            while items := model.Session.scalars(stmt.where(shared.File.id > self.checkpoint.last_id)).all():
+                self._process(pool, items, stats)
+                self.checkpoint.last_id = items[-1].id
+                self.checkpoint.save()
+                yield stats
+
+        log.info(
+            "Transferred %d files from %s to %s in %.2f seconds. Failed: %d",
+            stats.transferred,
+            self.src_name,
+            self.dest_name,
+            stats.elapsed,
+            stats.failed,
+        )
+
+    def _pending(self, ids: Iterable[str] = (), retry_failed: bool = False) -> Any:
+        """Build filter for files that are not processed yet."""
+        ids = list(ids)
+        clause = shared.File.id > self.checkpoint.last_id
+        if retry_failed and self.checkpoint.failed:
+            clause = clause | shared.File.id.in_(list(self.checkpoint.failed))
+
+        clause = sa.and_(shared.File.storage == self.src_name, shared.File.deleted_at.is_(None), clause)
+        if ids:
+            clause = sa.and_(clause, shared.File.id.in_(ids))
+
+        return clause
+
+    def _process(self, pool: ThreadPoolExecutor, items: list[shared.File], stats: TransferStats):
+        """Transfer a batch of files and commit changes.
+
+        Storage usage summary is updated in the same transaction and moved
+        files are re-indexed after commit.
+        """
+        futures = [pool.submit(self.transfer, shared.FileData.from_object(item)) for item in items]
+        usage: dict[_UsageKey, list[int]] = {}
+        moved: list[str] = []
+
+        for item, future in zip(items, futures):
+            try:
+                data = future.result()
+            except SourceRemovalError as err:
+                log.warning("File %s is transferred, but not removed from source: %s", item.id, err)
+                self.checkpoint.leftovers[item.id] = str(err)
+                data = err.data
+            # storage adapters raise own errors(boto, redis, OS), so any error
+            # is recorded to keep processing the rest of files
+            except Exception as err:  # noqa: BLE001
+                log.warning("Cannot transfer file %s: %s", item.id, err)
+                self.checkpoint.failed[item.id] = str(err)
+                stats.failed += 1
+                continue
+
+            owner = item.owner
+            group = (
+                owner.owner_type if owner else "",
+                owner.owner_id if owner else "",
+                StorageUsage.family_of(item.content_type or ""),
+            )
+            _add_usage(usage, (self.src_name, *group), -1, -(item.size or 0))
+
+            data.into_object(item)
+            item.storage = self.dest_name
+            _add_usage(usage, (self.dest_name, *group), 1, item.size or 0)
+
+            moved.append(item.id)
+            self.checkpoint.failed.pop(item.id, None)
+            stats.transferred += 1
+            stats.bytes += data.size
+
+        for key, (count, size) in usage.items():
+            model.Session.execute(StorageUsage.change(*key, count, size))
+
+        model.Session.commit()
+        self.checkpoint.save()
+        search_index.safe_index_many(moved)
+
+
+def _add_usage(usage: dict[_UsageKey, list[int]], key: _UsageKey, count: int, size: int):
+    """Accumulate change of storage usage for the group."""
+    delta = usage.setdefault(key, [0, 0])
+    delta[0] += count
+    delta[1] += size
@@ -8,7 +8,9 @@ are stored here, to avoid import cycles.
 
 from __future__ import annotations
 
+import base64
 import logging
+import tempfile
 from collections.abc import Iterable
 from typing import Any, Callable, TypeVar, cast
 
@@ -20,7 +22,7 @@ import ckan.plugins.toolkit as tk
 from ckan import model
 from ckan.lib.api_token import _get_algorithm, _get_secret  # pyright: ignore[reportPrivateUsage]
 
-from ckanext.files import types
+from ckanext.files import config, types
 
 log = logging.getLogger(__name__)
 
@@ -28,6 +30,9 @@ T = TypeVar("T")
 
 SAMPLE_SIZE = 1024 * 2
 
+# size of the base64 fragment decoded at once. Must be divisible by 4
+BASE64_CHUNK_SIZE = 256 * 1024
+
 
 owner_getters = fk.Registry[Callable[[str], Any]]({})
 owner_getters.register("user", model.User.get)
@@ -44,6 +49,45 @@ def is_supported_type(content_type: str, supported: Iterable[str]) -> bool:
     return any(st in desired for st in supported)
 
 
+def spooled_file() -> tempfile.SpooledTemporaryFile[bytes]:
+    """Temporary file that keeps small content in memory.
+
+    Content is moved to disk when it exceeds
+    `ckanext.files.upload.spool_threshold`.
+    """
+    return tempfile.SpooledTemporaryFile(config.spool_threshold(), dir=config.spool_dir())
+
+
+def spool_bytes(value: bytes) -> tempfile.SpooledTemporaryFile[bytes]:
+    """Move bytes into a temporary file."""
+    spool = spooled_file()
+    spool.write(value)
+    spool.seek(0)
+    return spool
+
+
+def decode_data_url(value: str) -> tempfile.SpooledTemporaryFile[bytes]:
+    """Decode base64-encoded data URL into a temporary file.
+
+    Payload is decoded in chunks, so that decoded content is never kept in
+    memory completely.
+
+    Raises:
+        ValueError: value is not a base64-encoded data URL
+    """
+    header, sep, payload = value.partition(",")
+    if not sep or not header.startswith("data:") or not header.endswith(";base64"):
+        msg = "only base64-encoded data URLs are supported"
+        raise ValueError(msg)
+
+    spool = spooled_file()
+    for start in range(0, len(payload), BASE64_CHUNK_SIZE):
+        spool.write(base64.b64decode(payload[start : start + BASE64_CHUNK_SIZE], validate=True))
+
+    spool.seek(0)
+    return spool
+
+
 def get_owner(owner_type: str, owner_id: str):
     if getter := owner_getters.get(owner_type):
         return getter(owner_id)
@@ -122,6 +166,13 @@ class ContextCache:
 
         return bucket[id]
 
-    def get_model(self, type: str, id: str, model_class: type[T]) -> T | None:
-        """Retrieve a model instance from the cache or the session."""
-        return self.get(type, id, lambda: self.session.get(model_class, id))
+    def get_model(self, type: str, id: str, model_class: type[T], options: Iterable[Any] = ()) -> T | None:
+        """Retrieve a model instance from the cache or the session.
+
+        Args:
+            type: The type of the cached item.
+            id: The identifier of the model.
+            model_class: The class of the model.
+            options: Loader options, e.g. eager loading of relationships.
+        """
+        return self.get(type, id, lambda: self.session.get(model_class, id, options=list(options)))
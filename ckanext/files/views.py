@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import json
 import logging
 from functools import partial
+from http import HTTPStatus
 from typing import Any
 
 import file_keeper as fk
@@ -16,7 +18,7 @@ from ckan.logic import parse_params
 from ckan.types import Response
 from ckan.views.resource import download
 
-from ckanext.files import shared, utils
+from ckanext.files import derivative, export, replica, shared, utils
 
 log = logging.getLogger(__name__)
 bp = Blueprint("files", __name__)
@@ -76,7 +78,7 @@ def _as_response(storage_name: str, data: shared.FileData):
 
     if isinstance(storage, shared.Storage):
         resp = storage.as_response(data)
-        if resp.status_code >= 400:
+        if resp.status_code >= HTTPStatus.BAD_REQUEST:
             return tk.abort(resp.status_code)
         return resp
 
@@ -91,6 +93,90 @@ def dispatch_download(file_id: str) -> Response:
     return _as_response(item["storage"], shared.FileData.from_dict(item))
 
 
+@bp.route("/files/derivative/<file_id>/<preset>")
+def derivative_download(file_id: str, preset: str) -> Response:
+    """Download resized version of the image.
+
+    Derivative is generated on the first request and cached in the
+    derivatives storage. URL of the derivative must contain `v` query
+    parameter produced by `files_derivative_url` helper, that changes when the
+    original file is replaced or the preset is modified. Because of it,
+    response can be cached for a long time. Requests with outdated or missing
+    `v` are redirected to the actual URL.
+    """
+    tk.check_access("files_permission_download_file", {}, {"id": file_id})
+    item: dict[str, Any] = tk.get_action("files_file_show")({}, {"id": file_id})
+
+    options = derivative.presets().get(preset)
+    if not options:
+        return tk.abort(404, "Unknown derivative preset")
+
+    storage = _derivative_source(item)
+    version = derivative.version(item["hash"], options)
+    if tk.request.args.get("v") != version:
+        return tk.redirect_to("files.derivative_download", file_id=file_id, preset=preset, v=version)
+
+    try:
+        data = derivative.ensure(storage, shared.FileData.from_dict(item), options)
+    except shared.exc.MissingFileError:
+        return tk.abort(404)
+    except shared.exc.FilesError as err:
+        log.warning("Cannot produce derivative %s of file %s: %s", preset, file_id, err)
+        return tk.abort(422, "Derivative is not available")
+
+    resp = derivative.get_storage().as_response(data, send_inline=True)
+    if resp.status_code >= HTTPStatus.BAD_REQUEST:
+        return tk.abort(resp.status_code)
+
+    visibility = "public" if storage.settings.public else "private"
+    resp.headers["cache-control"] = f"{visibility}, max-age={shared.config.derivatives_max_age()}, immutable"
+    return resp
+
+
+def _derivative_source(item: dict[str, Any]) -> shared.Storage:
+    """Get storage of the file that can be used as a source of derivative."""
+    if not derivative.is_enabled() or not item["hash"] or not derivative.is_supported(item["content_type"]):
+        tk.abort(422, "Derivative is not available")
+
+    storage = shared.get_storage(item["storage"])
+    if not isinstance(storage, shared.Storage):
+        tk.abort(422, "File is not downloadable")
+
+    return storage
+
+
+@bp.route("/files/export/<fmt>")
+def export_files(fmt: str) -> Response:
+    """Stream file records matching search filters as NDJSON or CSV.
+
+    Accepts `filters` as JSON object in the same format as
+    `files_file_search` and comma-separated list of `fields`.
+    """
+    tk.check_access("files_file_search", {}, {})
+
+    if fmt not in export.FORMATS:
+        return tk.abort(404, "Unknown export format")
+
+    fields = [f for f in tk.request.args.get("fields", "").split(",") if f] or list(export.DEFAULT_FIELDS)
+
+    try:
+        filters = json.loads(tk.request.args.get("filters") or "{}")
+    except ValueError:
+        return tk.abort(400, "Filters must be a JSON object")
+
+    if not isinstance(filters, dict):
+        return tk.abort(400, "Filters must be a JSON object")
+
+    try:
+        records = export.rows(model.Session, export.statement(filters, fields))
+    except tk.ValidationError as err:
+        return tk.abort(400, str(err.error_summary))
+
+    resp = streaming_response(export.serialize(fmt, fields, records), export.FORMATS[fmt], with_context=True)
+    resp.headers["content-disposition"] = f"attachment; filename=files.{fmt}"
+    return resp
+
+
 @bp.route("/files/public-download/<storage_name>/<path:location>")
 def public_download(storage_name: str, location: str) -> Response:
     """Download a public file by its storage name and location.
@@ -104,8 +190,8 @@ def public_download(storage_name: str, location: str) -> Response:
     as the normal download route.
 
     If the storage is not found or not public, a 404 or 403 error is returned
-    respectively. If the file is not found in the storage, a 404 error is
-    returned.
+    respectively. If the file is not found in the storage or it's tracked in
+    DB and marked as deleted, a 404 error is returned.
     """
     try:
         storage = shared.get_storage(storage_name)
@@ -116,6 +202,10 @@ def public_download(storage_name: str, location: str) -> Response:
         return tk.abort(403, "Storage is not public")
 
     location = shared.Location(location)
+    item = replica.get_session().scalar(shared.File.by_location(location, storage_name))
+    if item and item.is_deleted:
+        return tk.abort(404)
+
     try:
         data = shared.FileData(
             location,
@@ -161,14 +251,15 @@ def temporal_download(token: str) -> Response:
     if data.get("topic") != "download_file":
         raise tk.ObjectNotFound("file")
 
+    sess = replica.get_session()
     if "id" in data:
-        item = model.Session.get(shared.File, data["sub"])
+        item = sess.get(shared.File, data["sub"])
     elif "location" in data and "storage" in data:
-        item = model.Session.scalar(shared.File.by_location(data["location"], data["storage"]))
+        item = sess.scalar(shared.File.by_location(data["location"], data["storage"]))
     else:
         item = None
 
-    if not item:
+    if not item or item.is_deleted:
         raise tk.ObjectNotFound("file")
 
     storage = shared.get_storage(item.storage)
@@ -214,12 +305,12 @@ def list_files(owner_type: str, owner_id: str) -> str:
         "start": start,
         "owner_type": owner_type,
         "owner_id": owner_id,
-        "sort": params.get("sort", "created"),
-        "reverse": params.get("reverse", True),
+        "sort": [[params.get("sort", "created"), "desc" if tk.asbool(params.get("reverse", True)) else "asc"]],
+        "filters": {},
     }
 
     if "storage" in params:
-        search_dict["storage"] = params["storage"]
+        search_dict["filters"]["storage"] = params["storage"]
 
     result: dict[str, Any]
     try:
@@ -285,10 +376,13 @@ def autocomplete_own_files() -> Any:
 
     params.update(
         {
-            "owner_type": "user",
-            "owner_id": tk.current_user.is_authenticated and tk.current_user.id,  # type: ignore
-            "pinned": False,
-            "name": ["like", f"%{q}%"],
+            "filters": {
+                "owner_type": "user",
+                "owner_id": tk.current_user.is_authenticated and tk.current_user.id,  # type: ignore
+                "pinned": False,
+                "name": {"$search": q},
+            },
+            "count": "none",
         },
     )
 
@@ -326,11 +420,15 @@ def autocomplete_available_resource_files() -> Any:
     result = tk.get_action("files_file_search")(
         {"ignore_auth": True},
         {
-            "owner_type": "user",
-            "owner_id": tk.current_user.is_authenticated and tk.current_user.id,
-            "pinned": False,
-            "storage": shared.config.resources_storage(),
-            "name": ["like", f"%{q}%"],
+            "filters": {
+                "owner_type": "user",
+                "owner_id": tk.current_user.is_authenticated and tk.current_user.id,
+                "pinned": False,
+                "storage": shared.config.resources_storage(),
+                "name": {"$search": q or ""},
+            },
+            "count": "none",
+            "fields": ["id", "name", "content_type", "size"],
         },
     )
 
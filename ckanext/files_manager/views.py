@@ -43,24 +43,28 @@ class FilesManagerView(MethodView):
             tk.h.flash_error(tk._("The bulk action is not implemented"))
             return tk.redirect_to("files_manager.list")
 
-        for file_id in file_ids:
-            try:
-                action_func(file_id)
-            except tk.ValidationError as e:  # noqa: PERF203
-                tk.h.flash_error(str(e))
+        try:
+            action_func(file_ids)
+        except tk.ValidationError as e:
+            tk.h.flash_error(str(e))
 
         return tk.redirect_to("files_manager.list")
 
-    def _get_bulk_action(self, value: str) -> Callable[[str], None] | None:
+    def _get_bulk_action(self, value: str) -> Callable[[list[str]], None] | None:
         return {
-            "1": self._remove_file,
+            "1": self._remove_files,
         }.get(value)
 
-    def _remove_file(self, file_id: str):
-        tk.get_action("files_file_delete")(
+    def _remove_files(self, file_ids: list[str]):
+        if not file_ids:
+            return
+
+        result = tk.get_action("files_file_delete_many")(
             {"ignore_auth": True},
-            {"id": file_id},
+            {"ids": file_ids},
         )
+        for file_id, error in result["errors"].items():
+            tk.h.flash_error(f"{file_id}: {error}")
 
 
 class FilesManagerUploadView(MethodView):